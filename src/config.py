@@ -16,13 +16,136 @@ INITIAL_URL: str = urlparse(
     )
 ).geturl()
 
-# Number of retries if we fail to fetch a page and the time we should wait
-# to request the same page again
+# Number of attempts to fetch a page and the base time we wait before
+# requesting the same page again. The wait doubles after each failed attempt
+# up to RETRY_MAX_WAIT seconds, and a random fraction of up to RETRY_JITTER of
+# it is removed so retries don't arrive in bursts. No attempt is made after
+# REQUEST_DEADLINE seconds since the first one.
 ATTEMPTS = int(os.getenv("ATTEMPTS", "3"))
-ATTEMPT_WAIT = int(os.getenv("ATTEMPT_WAIT", "5"))
+ATTEMPT_WAIT = float(os.getenv("ATTEMPT_WAIT", "5"))
+RETRY_MAX_WAIT = float(os.getenv("RETRY_MAX_WAIT", "60"))
+RETRY_JITTER = float(os.getenv("RETRY_JITTER", "0.5"))
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "120"))
 
-# Delay between the request for each page
-DELAY = int(os.getenv("DELAY", "1"))
+# Extra delay between listing pages. The request scheduler already rate limits
+# every request, so it is disabled by default
+DELAY = int(os.getenv("DELAY", "0"))
+
+# Request scheduler: maximum number of requests in flight and a token bucket
+# per host allowing REQUESTS_PER_SECOND with bursts of up to REQUEST_BURST
+# requests. A REQUESTS_PER_SECOND <= 0 disables the rate limit.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "8"))
+REQUESTS_PER_SECOND = float(os.getenv("REQUESTS_PER_SECOND", "4"))
+REQUEST_BURST = int(os.getenv("REQUEST_BURST", "4"))
+
+# HTTP connection pool. With HTTP_KEEP_ALIVE connections to CNMV are reused
+# instead of paying a new TCP and TLS handshake per request. The pool holds up
+# to HTTP_POOL_SIZE connections, HTTP_CONNECTIONS_PER_HOST of them to the same
+# host, and idle connections are closed after HTTP_KEEP_ALIVE_TIMEOUT seconds.
+# DNS lookups are cached for HTTP_DNS_CACHE_TTL seconds and the timeouts are
+# expressed in seconds as well.
+HTTP_KEEP_ALIVE = os.getenv("HTTP_KEEP_ALIVE", "true").lower() == "true"
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_CONNECTIONS_PER_HOST", "8"))
+HTTP_KEEP_ALIVE_TIMEOUT = float(os.getenv("HTTP_KEEP_ALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+# On-disk HTTP cache for the entry pages, used to send conditional requests.
+# Least recently used pages are evicted once the cache exceeds
+# HTTP_CACHE_MAX_MB megabytes.
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "256"))
+
+# HTML parser backend for listing and entry pages: html.parser, lxml or
+# selectolax. lxml and selectolax are installed with the optional parsers
+# poetry group (poetry install --with parsers), html.parser is used when they
+# are not available.
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "html.parser")
+
+# Parse only the elements we extract from each page (the name and data table
+# of entry pages and the main content of listing pages) instead of the whole
+# page.
+PARTIAL_PARSE = os.getenv("PARTIAL_PARSE", "true").lower() == "true"
+
+# Number of processes parsing and transforming entry pages. With 0 the pages
+# are parsed in the event loop. PARSE_WORKERS should be at least as large so
+# every process is kept busy.
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", "0"))
+
+# Number of workers and maximum queue size of each stage of the crawling
+# pipeline (listing discovery -> detail fetch -> parse/transform). A queue
+# size of 0 means the queue is unbounded. Listing pages are fetched
+# concurrently once the range of the pagination is known.
+LISTING_WORKERS = int(os.getenv("LISTING_WORKERS", "4"))
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+FETCH_QUEUE_SIZE = int(os.getenv("FETCH_QUEUE_SIZE", "200"))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", "50"))
+
+# Transformed results wait in a sink of up to PERSIST_QUEUE_SIZE results and
+# are written in batches of PERSIST_BATCH_SIZE, or whatever arrived in
+# PERSIST_FLUSH_SECONDS seconds, with PERSIST_WORKERS batches written at the
+# same time. The parse stage waits while the sink is full.
+PERSIST_WORKERS = int(os.getenv("PERSIST_WORKERS", "4"))
+PERSIST_QUEUE_SIZE = int(os.getenv("PERSIST_QUEUE_SIZE", "100"))
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "50"))
+PERSIST_FLUSH_SECONDS = float(os.getenv("PERSIST_FLUSH_SECONDS", "1"))
+
+# Crawl runs are checkpointed in mongo so an interrupted run can be resumed.
+# Completed entry pages are written in batches of CHECKPOINT_BATCH urls, or
+# after CHECKPOINT_INTERVAL seconds, instead of once per page.
+CHECKPOINT_BATCH = int(os.getenv("CHECKPOINT_BATCH", "100"))
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "30"))
+
+# Crawl mode: full or incremental. Incremental crawls only fetch the entry
+# pages of new SICAVs and a rotating slice of the known ones, so every known
+# page is refreshed once every INCREMENTAL_SLICES days. A full crawl is run
+# instead when the last one is older than FULL_REFRESH_DAYS days.
+CRAWL_MODE = os.getenv("CRAWL_MODE", "full")
+INCREMENTAL_SLICES = int(os.getenv("INCREMENTAL_SLICES", "7"))
+FULL_REFRESH_DAYS = int(os.getenv("FULL_REFRESH_DAYS", "30"))
+
+# Priority crawls fetch the new entry pages and the known ones most likely to
+# have changed. Pages are scored by the dates in their change history, each
+# change losing half its weight every CHANGE_HALF_LIFE_DAYS days. Up to
+# PRIORITY_BUDGET known pages are fetched per run, starting with the ones not
+# fetched in MAX_PAGE_AGE_DAYS days. The budget grows when needed so every
+# page is fetched within MAX_PAGE_AGE_DAYS days.
+PRIORITY_BUDGET = int(os.getenv("PRIORITY_BUDGET", "300"))
+MAX_PAGE_AGE_DAYS = float(os.getenv("MAX_PAGE_AGE_DAYS", "14"))
+CHANGE_HALF_LIFE_DAYS = float(os.getenv("CHANGE_HALF_LIFE_DAYS", "90"))
+
+# Distributed crawls: a coordinator seeds a work queue in mongo and
+# CRAWL_PROCESSES workers claim its listing and entry pages. Each worker
+# processes up to QUEUE_CONCURRENCY items at once and leases them for
+# QUEUE_LEASE_SECONDS, extended every QUEUE_HEARTBEAT_SECONDS. Items whose
+# lease expired are queued again and failed items are retried up to
+# QUEUE_MAX_ATTEMPTS times. Idle processes poll the queue every
+# QUEUE_POLL_SECONDS. The request rate is shared by the workers.
+CRAWL_PROCESSES = int(os.getenv("CRAWL_PROCESSES", "1"))
+QUEUE_CONCURRENCY = int(os.getenv("QUEUE_CONCURRENCY", "8"))
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "120"))
+QUEUE_HEARTBEAT_SECONDS = float(os.getenv("QUEUE_HEARTBEAT_SECONDS", "30"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "2"))
+
+# Metrics of the crawl runs: counters and latency histograms written at the
+# end of every run to METRICS_DIR, as a Prometheus text file and a JSON
+# summary. An empty METRICS_DIR disables them.
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+
+# Maximum number of entries written to mongo with a single bulk write, and
+# how the existing entries are compared with the new data: read for every
+# batch (read), loaded once per run in a snapshot (snapshot), or compared by
+# mongo itself with aggregation pipeline updates (pipeline, MongoDB 4.2+).
+# The pipeline mode appends the changes to the history after overwriting the
+# entries, so if that append fails the previous values are only kept in the
+# logs, use read or snapshot when the history must be complete.
+BULK_WRITE_SIZE = int(os.getenv("BULK_WRITE_SIZE", "500"))
+WRITE_MODE = os.getenv("WRITE_MODE", "snapshot")
 
 # Mongo connection information
 MONGO_HOST = os.getenv("MONGO_HOST", "localhost")
@@ -3,7 +3,8 @@ Initialiser for the crawler folder
 """
 
 from .cnmv import CNMVCrawler
+from .http_cache import HttpCache
 from .pipelines import MAPPING
 from .pipelines import MongoDataPipeLine as DataPipeline
 
-__all__ = ["CNMVCrawler", "DataPipeline", "MAPPING"]
+__all__ = ["CNMVCrawler", "DataPipeline", "HttpCache", "MAPPING"]
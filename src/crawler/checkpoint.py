@@ -0,0 +1,160 @@
+"""
+Checkpoints of a crawl run, so a run interrupted halfway through the
+pagination can be resumed without fetching everything again
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Set
+
+from config import CHECKPOINT_BATCH, CHECKPOINT_INTERVAL
+from data_classes import CrawlRunType
+from mongo import RunsClient
+
+from .incremental import FULL
+
+
+class CrawlCheckpoint:
+    """
+    Track the progress of a crawl run and write it in batches. The listing
+    cursor is the oldest listing page with entry pages still in progress,
+    so resuming from it never misses an entry page
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        runs_client: RunsClient,
+        run: CrawlRunType,
+        batch_size: int = CHECKPOINT_BATCH,
+        interval: float = CHECKPOINT_INTERVAL,
+    ) -> None:
+        """Initialise the checkpoint of the run"""
+        self.runs_client = runs_client
+        self.run_id = run["run_id"]
+        self.mode = run.get("mode", FULL)
+        self.started = run["started"]
+        self.batch_size = batch_size
+        self.interval = interval
+        # Entry pages completed in this run, including the previous attempts
+        self.completed: Set[str] = set(run["completed"])
+        # Entry pages in progress, grouped by the listing page they come from
+        # in pagination order, and the listing page of each entry page
+        self.pending: Dict[str, Set[str]] = {}
+        self.origin: Dict[str, str] = {}
+        self.last_listing = run["listing_url"]
+        # Completed entry pages not written yet
+        self.batch: List[str] = []
+        self.last_flush = time.monotonic()
+        self.lock = asyncio.Lock()
+
+        self.log = logging.getLogger(__name__)
+
+    @classmethod
+    async def open(
+        cls,
+        runs_client: RunsClient,
+        listing_url: str,
+        resume: bool = False,
+        mode: str = FULL,
+    ) -> "CrawlCheckpoint":
+        """
+        Resume the last unfinished run, keeping its mode, or start a new one
+        from the listing page if there is none or we don't resume
+        """
+        if resume:
+            run = await runs_client.find_unfinished_run()
+            if run is not None:
+                logging.getLogger(__name__).info(
+                    "Resuming crawl run %s from %s with %s completed pages",
+                    run["run_id"],
+                    run["listing_url"],
+                    len(run["completed"]),
+                )
+                return cls(runs_client, run)
+            logging.getLogger(__name__).info("No crawl run to resume")
+        return cls(runs_client, await runs_client.start_run(listing_url, mode))
+
+    @property
+    def complete(self) -> bool:
+        """Check whether every listing page and entry page was done"""
+        return not any(self.pending.values())
+
+    @property
+    def cursor(self) -> str:
+        """Listing page to resume the run from"""
+        for listing_url, urls in self.pending.items():
+            if urls:
+                return listing_url
+        return self.last_listing
+
+    def expect(self, listing_urls: List[str]) -> None:
+        """
+        Register listing pages scheduled but not listed yet, in pagination
+        order, so the cursor doesn't move past them while they are fetched
+        """
+        for listing_url in listing_urls:
+            self.pending.setdefault(listing_url, {listing_url})
+
+    def failed(self, listing_url: str) -> None:
+        """
+        Keep a listing page that couldn't be fetched in progress, so the
+        cursor doesn't move past it and the run isn't finished
+        """
+        self.pending.setdefault(listing_url, set()).add(listing_url)
+
+    def listed(self, listing_url: str, urls: List[str]) -> List[str]:
+        """
+        Register the entry pages found in a listing page, returning the ones
+        that still need to be crawled
+        """
+        remaining = [url for url in urls if url not in self.completed]
+        self.pending[listing_url] = set(remaining)
+        for url in remaining:
+            self.origin[url] = listing_url
+        # Listing pages fetched concurrently may be listed out of order
+        if next(reversed(self.pending)) == listing_url:
+            self.last_listing = listing_url
+        # Listing pages done are only kept while an older one is in progress
+        while self.pending:
+            oldest = next(iter(self.pending))
+            if self.pending[oldest] or oldest == listing_url:
+                break
+            del self.pending[oldest]
+        return remaining
+
+    async def done(self, url: str, completed: bool = True) -> None:
+        """
+        Mark an entry page as done. Pages that failed are not completed, so a
+        resumed run tries them again
+        """
+        async with self.lock:
+            listing_url = self.origin.pop(url, None)
+            if listing_url is not None:
+                self.pending.get(listing_url, set()).discard(url)
+            if completed:
+                self.completed.add(url)
+                self.batch.append(url)
+            if (
+                len(self.batch) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.interval
+            ):
+                await self._write()
+
+    async def flush(self) -> None:
+        """Write the cursor and the completed pages not written yet"""
+        async with self.lock:
+            await self._write()
+
+    async def _write(self) -> None:
+        """Write the checkpoint, the lock must be held"""
+        batch, self.batch = self.batch, []
+        self.last_flush = time.monotonic()
+        await self.runs_client.save_checkpoint(self.run_id, self.cursor, batch)
+        self.log.debug("Checkpoint of %s pages at %s", len(batch), self.cursor)
+
+    async def finish(self, stats: Dict[str, int]) -> None:
+        """Write the last checkpoint and mark the run as finished"""
+        await self.flush()
+        await self.runs_client.finish_run(self.run_id, stats)
@@ -4,79 +4,217 @@ CNMV crawler class with all the methods we need to crawl the CNMV listing page
 
 import asyncio
 import logging
-from typing import List, Optional, Tuple, Union
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from functools import partial
+from typing import (
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 from urllib.parse import urljoin, urlparse
 
 import aiohttp
-from bs4 import BeautifulSoup
 from bs4.element import Tag
 
-from config import ATTEMPT_WAIT, ATTEMPTS, DELAY, INITIAL_URL
-from data_classes import ContentTypes, DataTypes
-from mongo import DataClient
+from config import (
+    CRAWL_MODE,
+    DELAY,
+    FETCH_QUEUE_SIZE,
+    FETCH_WORKERS,
+    FULL_REFRESH_DAYS,
+    INITIAL_URL,
+    LISTING_WORKERS,
+    METRICS_DIR,
+    PARSE_QUEUE_SIZE,
+    PARSE_WORKERS,
+    PARSER_BACKEND,
+    PARTIAL_PARSE,
+)
+from data_classes import ContentTypes, DataTypes, PageResponse, PageSource
+from metrics import METRICS
+from mongo import DataClient, RunsClient
 
+from .checkpoint import CrawlCheckpoint
+from .fragments import LISTING_ELEMENTS, content_hash
+from .http_cache import HttpCache
+from .incremental import (
+    FULL,
+    INCREMENTAL,
+    PRIORITY,
+    IncrementalSelector,
+    UrlSelector,
+    validate_mode,
+)
+from .pagination import page_index, page_range, parse_page_info
+from .parse_pool import ParsePool
+from .parsers import (
+    HtmlNode,
+    as_node,
+    parse_html,
+    parse_partial,
+    resolve_backend,
+)
 from .pipelines import MongoDataPipeLine
+from .priority import PrioritySelector
+from .retry import RetryPolicy
+from .scheduler import RequestScheduler
+from .session import build_session
+from .sink import ResultSink
+from .stages import Emit, Stage, StagedPipeline
 
 
 class CNMVCrawler:
     """CNMV crawler class"""
 
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
     def __init__(
         self,
         mongo_client: DataClient,
         data_pipeline: MongoDataPipeLine,
         url: Optional[str] = INITIAL_URL,
+        *,
+        scheduler: Optional[RequestScheduler] = None,
+        http_cache: Optional[HttpCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        parser: str = PARSER_BACKEND,
+        partial_parse: bool = PARTIAL_PARSE,
+        runs_client: Optional[RunsClient] = None,
     ) -> None:
         """Initialise the class variables"""
         self.url = url
+        # HTML parser backend for the listing pages and whether only their
+        # main content is parsed
+        self.parser = resolve_backend(parser)
+        self.partial_parse = partial_parse
         self.mongo_client = mongo_client
         self.data_pipeline = data_pipeline
+        # Entry pages are parsed and transformed in the pool
+        self.parse_pool = ParsePool(data_pipeline)
+        # Every request to CNMV goes through the same scheduler
+        self.scheduler = (
+            scheduler if scheduler is not None else RequestScheduler()
+        )
+        self.retry_policy = (
+            retry_policy if retry_policy is not None else RetryPolicy()
+        )
+        # Optional on-disk cache to perform conditional requests
+        self.http_cache = http_cache
+        # Content hash of the pages already stored, keyed by url
+        self.content_hashes: Dict[str, str] = {}
+        # Counters of the crawl run, and the metrics exported at its end
+        self.stats: Counter[str] = Counter()
+        self.metrics = METRICS
+        # Optional checkpoints of the crawl runs, to resume them
+        self.runs_client = runs_client
+        self.checkpoint: Optional[CrawlCheckpoint] = None
+        # Selection of the entry pages fetched by incremental and priority
+        # crawls, and the unchanged pages whose last fetch is not written yet
+        self.selector: Optional[UrlSelector] = None
+        self.seen_urls: List[str] = []
+        # Listing pages already scheduled in the run, each one is fetched once
+        self.listing_pages: Set[str] = set()
 
         self.log = logging.getLogger(__name__)
 
+    async def _request(
+        self,
+        url: str,
+        session: aiohttp.ClientSession,
+        attempts: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Optional[PageResponse]:
+        """
+        Request a page following the retry policy. Returns the response for
+        200 and 304 statuses, or None if every attempt failed or the failure
+        is not worth retrying
+        """
+        policy = self.retry_policy
+        attempts = attempts if attempts is not None else policy.attempts
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.deadline
+        attempt = 1
+        while True:
+            retry_after: Optional[str] = None
+            try:
+                async with self.scheduler.slot(url), session.get(
+                    url,
+                    headers=headers,
+                    timeout=policy.timeout(
+                        session.timeout, deadline - loop.time()
+                    ),
+                ) as response:
+                    # Check the response status first
+                    if response.status == 304:
+                        return PageResponse(304, "", response.headers)
+                    if response.status == 200:
+                        html = await response.text()
+                        return PageResponse(200, html, response.headers)
+                    msg = f"Failed request to {url} with code {response.status}"
+                    self.log.warning(msg)
+                    if not policy.is_retryable_status(response.status):
+                        return None
+                    retry_after = response.headers.get("Retry-After")
+            # pylint: disable=broad-exception-caught
+            except Exception as err:
+                if not policy.is_retryable_error(err):
+                    raise
+                self.log.warning(
+                    "Failed request to %s with error: %r", url, err
+                )
+
+            # Retry once the scheduler slot is released
+            wait = policy.backoff(attempt, retry_after)
+            if attempt >= attempts or loop.time() + wait >= deadline:
+                break
+            attempt += 1
+            self.stats["retries"] += 1
+            self.metrics.inc("retries")
+            await asyncio.sleep(wait)
+        self.log.error(
+            "Tried %s times to fetch %s with no success", attempt, url
+        )
+        return None
+
     async def _get_list_content(
         self,
         url: str,
         session: aiohttp.ClientSession,
-        attempts: int = ATTEMPTS,
-    ) -> ContentTypes:
+        attempts: Optional[int] = None,
+    ) -> Optional[ContentTypes]:
         """
         Getting the pagination and list of needed urls that are going to be
-        crawled all the elements.
+        crawled all the elements. Returns None if the page couldn't be
+        fetched
         """
         self.log.info("Crawling pagination page: %s", url)
-        async with session.get(url) as response:
-            attempt = 1
-            while attempt < attempts:
-                # Check the response status first
-                if response.status != 200:
-                    msg = f"Failed request to {url} with code {response.status}"
-                    self.log.warning(msg)
-                    attempt += 1
-                    await asyncio.sleep(ATTEMPT_WAIT)
-                    continue
-
-                # Get the html content and create a soup parser
-                html = await response.text()
-                soup = BeautifulSoup(html, "html.parser")
-
-                # Extract the next page and all urls
-                next_page = self._get_next_page(soup)
-                urls = self._get_all_urls(soup)
-                return ContentTypes(next_page, urls)
-        if attempt == attempts:
-            self.log.error(
-                "Tried %s times to fetch %s with no success", attempts, url
-            )
-        return ContentTypes()
+        page = await self._request(url, session, attempts)
+        if page is None or page.status != 200:
+            return None
+
+        # Parse the page and extract the next page and all urls
+        if self.partial_parse:
+            root = parse_partial(page.text, LISTING_ELEMENTS, self.parser)
+        else:
+            root = parse_html(page.text, self.parser)
+        next_page = self._get_next_page(root)
+        urls = self._get_all_urls(root)
+        pages = self._get_page_range(root, url)
+        return ContentTypes(next_page, urls, pages)
 
-    def _get_next_page(self, soup: BeautifulSoup) -> str:
+    def _get_next_page(self, soup: Union[HtmlNode, Tag]) -> str:
         """
         Get the next page from the current soup
         """
         # Get the content table
-        content_table = soup.find("section", {"id": "maincontent"})
-        if not isinstance(content_table, Tag):
+        content_table = as_node(soup).find("section", {"id": "maincontent"})
+        if content_table is None:
             msg = (
                 "Couldn't find Tag for content table, found"
                 f" {type(content_table)} instead. Ignoring this page."
@@ -86,7 +224,7 @@ class CNMVCrawler:
 
         # Get the pagination element
         pagination = content_table.find("ul", {"class": "pagination"})
-        if not isinstance(pagination, Tag):
+        if pagination is None:
             msg = (
                 "Couldn't find Tag for pagination, found"
                 f" {type(pagination)} instead. Ignoring this page."
@@ -96,7 +234,7 @@ class CNMVCrawler:
 
         # Get the current page
         current_page = pagination.find("span", {"class": "active"})
-        if not isinstance(current_page, Tag) or current_page.parent is None:
+        if current_page is None or current_page.parent is None:
             msg = (
                 "Couldn't find Tag for current page value or current page"
                 f" parent is None. found {type(current_page)} instead. Ignoring"
@@ -106,19 +244,58 @@ class CNMVCrawler:
             return ""
 
         # Find the next element and validate the url on it
-        next_page = current_page.parent.findNext("a")
-        if next_page is not None and isinstance(next_page, Tag):
+        next_page = current_page.parent.find_next("a")
+        if next_page is not None:
             return self._validate_next_page_url(next_page)
 
         return ""
 
-    def _get_all_urls(self, soup: BeautifulSoup) -> List[str]:
+    def _get_page_range(
+        self, soup: Union[HtmlNode, Tag], url: str
+    ) -> List[str]:
+        """
+        Get the listing pages after the current one. The last page comes from
+        the link to the last page or from the text below the pagination, and
+        an empty list is returned if the range can't be determined
+        """
+        content_table = as_node(soup).find("section", {"id": "maincontent"})
+        if content_table is None:
+            return []
+
+        # Links to other listing pages, the one to the last page gives the
+        # index of the last page
+        template = url
+        last: Optional[int] = None
+        for link in content_table.select("ul.pagination a"):
+            href = link.get("href")
+            if href is None or page_index(urljoin(url, href)) is None:
+                continue
+            template = urljoin(url, href)
+            title = link.get("title")
+            if title is not None and "Ir a la última página" in title:
+                last = page_index(template)
+
+        # The text below the pagination, e.g. "Page 1 out of 28"
+        current = page_index(url)
+        info = content_table.find("span", {"class": "PagActivaTXT"})
+        pages = parse_page_info(info.text) if info is not None else None
+        if pages is not None:
+            current = pages[0] - 1
+            last = last if last is not None else pages[1] - 1
+        if current is None or last is None:
+            self.log.info(
+                "Couldn't find the range of the pagination in %s", url
+            )
+            return []
+        return page_range(template, current, last)
+
+    def _get_all_urls(self, soup: Union[HtmlNode, Tag]) -> List[str]:
         """
         Get all the urls to be crawled in the page
         """
         # Get the content table
-        content_table = soup.find("section", {"id": "maincontent"})
-        if not isinstance(content_table, Tag):
+        content_table = as_node(soup).find("section", {"id": "maincontent"})
+        if content_table is None:
             msg = (
                 "Couldn't find Tag for content table, found"
                 f" {type(content_table)} instead. Ignoring this page."
@@ -130,7 +307,7 @@ class CNMVCrawler:
         element_list = content_table.find(
             "ul", {"id": "listaElementosPrimernivel"}
         )
-        if not isinstance(element_list, Tag):
+        if element_list is None:
             msg = (
                 "Couldn't find Tag for element list, found"
                 f" {type(element_list)} instead. Ignoring this page."
@@ -147,21 +324,21 @@ class CNMVCrawler:
             return []
         return self._validate_url_elements(url_elements)
 
-    def _validate_next_page_url(self, element: Tag) -> str:
+    def _validate_next_page_url(self, element: Union[HtmlNode, Tag]) -> str:
         """
         Validate the url for the next page.
         We ignore if the title indicates that we reached the last page.
         """
+        node = as_node(element)
         # Checks if we reached the last page
-        if isinstance(element, Tag):
-            title: Optional[Union[str, List[str]]] = element.get("title")
-            if title is not None and "Ir a la última página" in title:
-                self.log.info("Reached the last page")
-                return ""
+        title = node.get("title")
+        if title is not None and "Ir a la última página" in title:
+            self.log.info("Reached the last page")
+            return ""
 
         # Validate the url element
         try:
-            element_url = element.get("href")
+            element_url = node.get("href")
             if isinstance(element_url, str):
                 url = urlparse(element_url)
                 return url.geturl()
@@ -171,18 +348,18 @@ class CNMVCrawler:
 
         # pylint: disable=broad-exception-caught
         except Exception as err:
-            msg = (
-                f"Could not parse URL: {element.get('href')} with error: {err}"
-            )
+            msg = f"Could not parse URL: {node.get('href')} with error: {err}"
             self.log.error(msg)
             return ""
 
-    def _validate_url_elements(self, url_elements: List[Tag]) -> List[str]:
+    def _validate_url_elements(
+        self, url_elements: Sequence[Union[HtmlNode, Tag]]
+    ) -> List[str]:
         """Validate each url element and return all the valid ones"""
         # Create a list of valid urls to be crawled
         validated: List[str] = []
         for element in url_elements:
-            elem_url = element.get("href")
+            elem_url = as_node(element).get("href")
             if not isinstance(elem_url, str):
                 msg = f"Expected str, got {type(elem_url)} for the URL element"
                 self.log.warning(msg)
@@ -192,84 +369,287 @@ class CNMVCrawler:
                 validated.append(url)
         return validated
 
-    async def _get_transformed_results(
-        self, urls: List[str], session: aiohttp.ClientSession
-    ) -> List[DataTypes]:
-        """
-        Get the transformed results of each url
-        """
-        coros = [
-            asyncio.create_task(self._crawl_process_page(url, session))
-            for url in urls
-        ]
-        results = await asyncio.gather(*coros)
-
-        return [result for result in results if result is not None]
-
-    async def _crawl_process_page(
+    async def _fetch_page(
         self,
         url: str,
         session: aiohttp.ClientSession,
-        attempts: int = ATTEMPTS,
-    ) -> Optional[DataTypes]:
+        attempts: Optional[int] = None,
+    ) -> Optional[str]:
         """
-        Crawl the process getting the required data
+        Fetch the html content of a page containing an entry. Pages answered
+        with a 304, or whose body is the cached one, are served from the cache
         """
         self.log.debug("Crawling: %s", url)
-        attempt = 1
-        while attempt < attempts:
-            async with session.get(url) as response:
-                # Check the response status first and retry
-                if response.status != 200:
-                    msg = f"Failed request to {url} with code {response.status}"
-                    self.log.warning(msg)
-                    attempt += 1
-                    await asyncio.sleep(ATTEMPT_WAIT)
-                    continue
+        entry = await self.http_cache.get(url) if self.http_cache else None
+        headers = (
+            self.http_cache.conditional_headers(entry)
+            if self.http_cache
+            else None
+        )
+        with self.metrics.timer("fetch"):
+            page = await self._request(url, session, attempts, headers)
+        if page is None:
+            return None
+        self.metrics.inc("pages_fetched")
+        if page.status == 304:
+            # The cached page is still valid
+            if self.http_cache is not None and entry is not None:
+                self.metrics.inc("pages_not_modified")
+                return self.http_cache.revalidated(entry)
+            self.log.error("Unexpected 304 for %s without a cached page", url)
+            return None
+        if self.http_cache is not None:
+            unchanged = await self.http_cache.store(
+                url, page.text, page.headers, entry
+            )
+            if unchanged and entry is not None:
+                # The server ignored the validators, the page is served from
+                # the cache as if it answered 304
+                self.metrics.inc("pages_not_modified")
+                return entry.body
+        return page.text
+
+    async def _transform_page(self, url: str, html: str) -> Optional[DataTypes]:
+        """
+        Parse the html content and extract and transform the results with
+        the data pipeline in the parse pool
+        """
+        return await self.parse_pool.transform(url, html)
+
+    def _build_stages(self, session: aiohttp.ClientSession) -> List[Stage]:
+        """
+        Build the stages of the crawling pipeline:
+        listing discovery -> detail fetch -> parse/transform. The results
+        of the last stage go to the result sink
+        """
+        return [
+            # The listing stage feeds its own queue with the listing pages,
+            # so the queue is unbounded, its items are only urls
+            Stage(
+                "listing",
+                partial(self._listing_stage, session),
+                LISTING_WORKERS,
+            ),
+            Stage(
+                "fetch",
+                partial(self._fetch_stage, session),
+                FETCH_WORKERS,
+                FETCH_QUEUE_SIZE,
+            ),
+            Stage("parse", self._parse_stage, PARSE_WORKERS, PARSE_QUEUE_SIZE),
+        ]
+
+    async def _listing_stage(
+        self, session: aiohttp.ClientSession, url: str, emit: Emit
+    ) -> bool:
+        """
+        Emit the urls found in a listing page and schedule the next listing
+        pages: every page of the pagination when its range is known, so they
+        are fetched concurrently, or else the next page. Returns False if
+        the listing page couldn't be fetched
+        """
+        content = await self._get_list_content(url, session)
+        if content is None:
+            self.stats["listing_failures"] += 1
+            # The page stays in progress, so a resumed run fetches it again
+            if self.checkpoint is not None:
+                self.checkpoint.failed(url)
+            return False
+        urls = content.urls
+        if self.selector is not None:
+            selected = self.selector.select(urls)
+            if len(selected) < len(urls):
+                self.stats["skipped"] += len(urls) - len(selected)
+            urls = selected
+        if self.checkpoint is not None:
+            urls = self.checkpoint.listed(url, urls)
+        for page_url in urls:
+            await emit(page_url, None)
 
-                # Get the html content and create a soup parser
-                html = await response.text()
-                soup = BeautifulSoup(html, "html.parser")
+        next_pages = [
+            listing_url
+            for listing_url in content.pages or [content.next_page]
+            if listing_url and listing_url not in self.listing_pages
+        ]
+        self.listing_pages.update(next_pages)
+        if self.checkpoint is not None:
+            self.checkpoint.expect(next_pages)
+        if next_pages and DELAY > 0:
+            await asyncio.sleep(DELAY)
+        for listing_url in next_pages:
+            await emit(listing_url, "listing")
+        return True
+
+    async def _fetch_stage(
+        self, session: aiohttp.ClientSession, url: str, emit: Emit
+    ) -> None:
+        """Fetch an entry page and emit its html content"""
+        html = await self._fetch_page(url, session)
+        if html is None:
+            await self._page_done(url, completed=False)
+            return
+        await emit((url, html), None)
 
-                # Extract and trasform the results with the data pipeline
-                return await self.data_pipeline.extract_and_transform(url, soup)
-        if attempt == attempts:
+    async def _parse_stage(self, page: Tuple[str, str], emit: Emit) -> bool:
+        """
+        Extract and transform the html content of an entry page. Pages whose
+        relevant content didn't change since they were stored are only
+        counted as seen. Returns False if the page couldn't be transformed
+        """
+        url, html = page
+        page_hash = content_hash(html)
+        if page_hash is not None and self.content_hashes.get(url) == page_hash:
+            self.stats["seen"] += 1
+            self.metrics.inc("unchanged")
+            self.seen_urls.append(url)
+            await self._page_done(url)
+            return True
+        result = await self._transform_page(url, html)
+        if result is None:
+            self.stats["parse_failures"] += 1
+            self.metrics.inc("parse_failures")
+            await self._page_done(url, completed=False)
+            return False
+        source = PageSource(url, page_hash) if page_hash is not None else None
+        await emit((url, result, source), None)
+        return True
+
+    async def _write_results(
+        self, items: List[Tuple[str, DataTypes, Optional[PageSource]]]
+    ) -> bool:
+        """
+        Save a batch of transformed results in the database. Pages whose
+        result wasn't saved are not completed, so a resumed run tries them
+        again. Returns whether every result was saved
+        """
+        try:
+            outcomes = await self.mongo_client.set_data_bulk(
+                [result for _, result, _ in items],
+                [source for _, _, source in items],
+            )
+        # pylint: disable=broad-exception-caught
+        except Exception as err:
             self.log.error(
-                "Tried %s times to fetch %s with no success", attempts, url
+                "Failed to save %s results with error: %s", len(items), err
             )
-        return None
+            outcomes = [False] * len(items)
+        for (url, _, _), saved in zip(items, outcomes):
+            self.stats["saved" if saved else "save_failures"] += 1
+            await self._page_done(url, completed=saved)
+        return all(outcomes)
 
-    async def crawl_and_save(self) -> None:
+    async def _page_done(self, url: str, completed: bool = True) -> None:
+        """Record an entry page in the checkpoint of the run, if any"""
+        if self.checkpoint is not None:
+            await self.checkpoint.done(url, completed)
+
+    async def _refresh_mode(self, mode: str) -> str:
         """
-        Crawl and save all the results in the database
+        Run a full crawl instead of an incremental one when the last full
+        crawl is older than FULL_REFRESH_DAYS
         """
-        connector = aiohttp.TCPConnector(force_close=True)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            next_page = INITIAL_URL
-            while True:
-                results, content = await self.crawl_and_transform(
-                    next_page, session
+        if mode != INCREMENTAL or self.runs_client is None:
+            return mode
+        last_full = await self.runs_client.find_last_finished_run(FULL)
+        if last_full is None or datetime.now() - last_full["started"] >= (
+            timedelta(days=FULL_REFRESH_DAYS)
+        ):
+            self.log.info(
+                "No full crawl in the last %s days, crawling every page",
+                FULL_REFRESH_DAYS,
+            )
+            return FULL
+        return mode
+
+    async def crawl_and_save(
+        self, resume: bool = False, mode: str = CRAWL_MODE
+    ) -> None:
+        """
+        Crawl and save all the results in the database. Listing pages, entry
+        pages and transformations run concurrently in a staged pipeline whose
+        results stream into a bounded sink written in batches, so the slowest
+        stage, or the database, sets the pace of the crawl. With a
+        runs client the progress is checkpointed, and with resume the last
+        unfinished run continues from its checkpoint. Incremental crawls
+        only fetch new entry pages and a rotating slice of the known ones.
+        The entries are diffed against a snapshot of the registry loaded at
+        the start of the run, in the snapshot write mode
+        """
+        mode = validate_mode(mode)
+        async with self.run_context("cnmv_crawler") as session:
+            start_url = self.url if self.url is not None else INITIAL_URL
+            started = datetime.now()
+            if self.runs_client is not None:
+                self.checkpoint = await CrawlCheckpoint.open(
+                    self.runs_client,
+                    start_url,
+                    resume,
+                    await self._refresh_mode(mode),
+                )
+                start_url = self.checkpoint.cursor
+                mode = self.checkpoint.mode
+                started = self.checkpoint.started
+            if mode == INCREMENTAL:
+                # The slice refreshed rotates every day
+                self.selector = IncrementalSelector(
+                    set(self.content_hashes), started.toordinal()
                 )
-                await self.save_results(results)
-                next_page = content.next_page
-                if not next_page:
-                    break
-                await asyncio.sleep(DELAY)
+            elif mode == PRIORITY:
+                self.selector = PrioritySelector(
+                    await self.mongo_client.find_refresh_history()
+                )
+            self.listing_pages = {start_url}
+            async with ResultSink(self._write_results) as sink:
+                pipeline = StagedPipeline(self._build_stages(session), sink.put)
+                await pipeline.run([start_url])
+        self.log.info("Crawl finished: %s", dict(self.stats))
 
-    async def crawl_and_transform(
-        self, url: str, session: aiohttp.ClientSession
-    ) -> Tuple[List[DataTypes], ContentTypes]:
+    @asynccontextmanager
+    async def run_context(
+        self, name: str
+    ) -> AsyncIterator[aiohttp.ClientSession]:
         """
-        Crawl a listing page in the pagination extracting and transforming the
-        data
+        Context of a crawl run, standalone or of a queue worker, yielding its
+        session. The state of the previous run is reset and the content
+        hashes and the snapshot of the stored entries are loaded. On exit the
+        last fetch of the unchanged pages seen is written, the checkpoint of
+        the run, if any, is finished when the run completed or flushed
+        otherwise, and the metrics are written with the name
         """
-        content = await self._get_list_content(url, session)
-        transformed = await self._get_transformed_results(content.urls, session)
-        return transformed, content
+        self.stats.clear()
+        self.metrics.reset()
+        self.content_hashes = await self.mongo_client.find_content_hashes()
+        await self.mongo_client.load_snapshot()
+        self.checkpoint = None
+        self.selector = None
+        self.seen_urls = []
+        self.listing_pages = set()
+        finished = False
+        try:
+            async with build_session() as session:
+                yield session
+            finished = True
+        finally:
+            self.parse_pool.shutdown()
+            self.mongo_client.clear_snapshot()
+            await self.mongo_client.set_last_fetched(self.seen_urls)
+            if self.checkpoint is not None:
+                if finished and self.checkpoint.complete:
+                    await self.checkpoint.finish(dict(self.stats))
+                else:
+                    # Keep the progress so far, the run can be resumed from
+                    # it and retry the listing pages that failed
+                    await self.checkpoint.flush()
+            self.write_metrics(name)
 
-    async def save_results(self, results: List[DataTypes]) -> bool:
+    def write_metrics(self, name: str) -> None:
         """
-        Save the results using the mongo client
+        Write the metrics of the run to METRICS_DIR, failing to write them
+        doesn't fail the run
         """
-        coros = [self.mongo_client.set_data(result) for result in results]
-        return all(await asyncio.gather(*coros))
+        if not METRICS_DIR:
+            return
+        try:
+            self.metrics.write(METRICS_DIR, name)
+        except OSError as err:
+            self.log.error("Couldn't write the metrics: %s", err)
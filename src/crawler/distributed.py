@@ -0,0 +1,228 @@
+"""
+Distributed crawls: listing and entry pages become work items of a queue in
+mongo, so several crawler processes, in the same host or in different
+containers, can share a crawl. A coordinator seeds the queue and waits for it
+to drain while the workers claim, process and complete its items
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+import aiohttp
+
+from config import (
+    INITIAL_URL,
+    QUEUE_CONCURRENCY,
+    QUEUE_HEARTBEAT_SECONDS,
+    QUEUE_LEASE_SECONDS,
+    QUEUE_MAX_ATTEMPTS,
+    QUEUE_POLL_SECONDS,
+)
+from data_classes import QueueItemType
+from mongo import QueueClient
+from mongo.mongo_queue import LEASED, QUEUED
+
+from .cnmv import CNMVCrawler
+
+LISTING = "listing"
+ENTRY = "entry"
+# Listing pages are claimed first so the pagination keeps feeding the queue
+PRIORITIES = {LISTING: 0, ENTRY: 1}
+
+
+class QueueCoordinator:
+    # pylint: disable=too-few-public-methods
+    """Seed the work queue and wait until every item is processed"""
+
+    def __init__(
+        self,
+        queue_client: QueueClient,
+        url: str = INITIAL_URL,
+        poll_seconds: float = QUEUE_POLL_SECONDS,
+    ) -> None:
+        """Initialise the coordinator of the queue"""
+        self.queue_client = queue_client
+        self.url = url
+        self.poll_seconds = poll_seconds
+
+        self.log = logging.getLogger(__name__)
+
+    async def run(self) -> Dict[str, int]:
+        """
+        Start a new generation of the queue with the first listing page and
+        wait for it to drain, queueing again the items of workers that died
+        """
+        await self.queue_client.start()
+        await self.queue_client.enqueue(
+            LISTING, [self.url], PRIORITIES[LISTING]
+        )
+        # Workers only join the generation once it is seeded
+        await self.queue_client.activate()
+        self.log.info("Queue seeded with %s", self.url)
+        try:
+            while True:
+                await self.queue_client.requeue_expired()
+                counts = await self.queue_client.count_by_status()
+                if not counts[QUEUED] and not counts[LEASED]:
+                    break
+                self.log.info("Queue status: %s", counts)
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            await self.queue_client.activate(False)
+        self.log.info("Distributed crawl finished: %s", counts)
+        return counts
+
+
+class QueueWorker:
+    # pylint: disable=too-few-public-methods
+    """Claim and process the items of the work queue with a crawler"""
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(
+        self,
+        crawler: CNMVCrawler,
+        queue_client: QueueClient,
+        worker_id: Optional[str] = None,
+        *,
+        concurrency: int = QUEUE_CONCURRENCY,
+        lease_seconds: float = QUEUE_LEASE_SECONDS,
+        heartbeat_seconds: float = QUEUE_HEARTBEAT_SECONDS,
+        max_attempts: int = QUEUE_MAX_ATTEMPTS,
+        poll_seconds: float = QUEUE_POLL_SECONDS,
+    ) -> None:
+        """Initialise the worker, identified by its host and process"""
+        self.crawler = crawler
+        self.queue_client = queue_client
+        self.worker_id = (
+            worker_id
+            if worker_id is not None
+            else f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        # Items leased by this worker that are being processed
+        self.in_progress: Set[str] = set()
+
+        self.log = logging.getLogger(__name__)
+
+    async def run(self) -> None:
+        """
+        Wait for a crawl to start and process the items of its generation of
+        the queue until they are drained
+        """
+        while await self.queue_client.join() is None:
+            self.log.info("Worker %s waiting for a crawl", self.worker_id)
+            await asyncio.sleep(self.poll_seconds)
+        self.log.info(
+            "Worker %s joined generation %s of the queue",
+            self.worker_id,
+            self.queue_client.generation,
+        )
+        # The queue keeps the progress of the crawl, not a checkpoint
+        async with self.crawler.run_context(
+            f"cnmv_worker_{self.worker_id}"
+        ) as session:
+            heartbeat = asyncio.create_task(self._heartbeat())
+            try:
+                await asyncio.gather(
+                    *[self._work(session) for _ in range(self.concurrency)]
+                )
+            finally:
+                heartbeat.cancel()
+        self.log.info(
+            "Worker %s finished: %s", self.worker_id, dict(self.crawler.stats)
+        )
+
+    async def _heartbeat(self) -> None:
+        """Extend the leases of the items in progress periodically"""
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self.queue_client.heartbeat(
+                    self.worker_id, list(self.in_progress), self.lease_seconds
+                )
+            # pylint: disable=broad-exception-caught
+            except Exception as err:
+                self.log.warning("Heartbeat failed: %s", err)
+
+    async def _drained(self) -> bool:
+        """
+        Check whether the crawl finished: nothing of its generation is queued
+        or leased. Generations are seeded before workers can join them
+        """
+        await self.queue_client.requeue_expired(self.max_attempts)
+        counts = await self.queue_client.count_by_status()
+        return not counts[QUEUED] and not counts[LEASED]
+
+    async def _work(self, session: aiohttp.ClientSession) -> None:
+        """Claim and process items one at a time"""
+        while True:
+            item = await self.queue_client.claim(
+                self.worker_id, self.lease_seconds
+            )
+            if item is None:
+                if await self._drained():
+                    return
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            url = item["url"]
+            self.in_progress.add(url)
+            try:
+                success = await self._process(session, item)
+            # pylint: disable=broad-exception-caught
+            except Exception as err:
+                self.log.error("Failed to process %s: %s", url, err)
+                success = False
+            finally:
+                self.in_progress.discard(url)
+            if success:
+                await self.queue_client.complete(self.worker_id, url)
+            else:
+                await self.queue_client.fail(
+                    self.worker_id, url, self.max_attempts
+                )
+
+    async def _process(
+        self, session: aiohttp.ClientSession, item: QueueItemType
+    ) -> bool:
+        """
+        Process an item with the stages of the crawler, queueing the pages
+        found in listing pages instead of passing them to the next stage.
+        Returns False if the page couldn't be fetched, transformed or saved,
+        so the item is retried
+        """
+        # pylint: disable=protected-access
+        if item["kind"] == LISTING:
+            found: Dict[str, List[str]] = {LISTING: [], ENTRY: []}
+
+            async def queue(url: Any, stage_name: Optional[str] = None) -> None:
+                found[LISTING if stage_name == LISTING else ENTRY].append(url)
+
+            if not await self.crawler._listing_stage(
+                session, item["url"], queue
+            ):
+                return False
+            for kind, urls in found.items():
+                await self.queue_client.enqueue(kind, urls, PRIORITIES[kind])
+            return True
+
+        html = await self.crawler._fetch_page(item["url"], session)
+        if html is None:
+            return False
+        saved: List[bool] = []
+
+        async def persist(entry: Any, stage_name: Optional[str] = None) -> None:
+            # pylint: disable=unused-argument
+            # Persist the transformed entry page right away
+            saved.append(await self.crawler._write_results([entry]))
+
+        if not await self.crawler._parse_stage((item["url"], html), persist):
+            return False
+        return all(saved)
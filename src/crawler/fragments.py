@@ -0,0 +1,86 @@
+"""
+Extract the html fragments we care about from a page without building its DOM.
+Elements are located with regular expressions and their end is found by
+balancing the opening and closing tags of the same name
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import List, Optional, Pattern, Tuple
+
+# Elements holding the fields of an entry page: (tag, attribute, value)
+ENTRY_ELEMENTS = [("p", "class", "titcont"), ("div", "class", "div_tablaDatos")]
+
+# Element holding the pagination and the urls of a listing page
+LISTING_ELEMENTS = [("section", "id", "maincontent")]
+
+
+@lru_cache(maxsize=None)
+def _opening_pattern(tag: str, attribute: str, value: str) -> Pattern[str]:
+    """Pattern of an opening tag whose attribute contains the value"""
+    return re.compile(
+        rf"<{tag}\b[^>]*?\s{attribute}\s*=\s*(['\"])"
+        rf"(?:[^'\"]*\s)?{re.escape(value)}(?:\s[^'\"]*)?\1[^>]*>",
+        re.IGNORECASE,
+    )
+
+
+@lru_cache(maxsize=None)
+def _tag_pattern(tag: str) -> Pattern[str]:
+    """Pattern of any opening or closing tag with the given name"""
+    return re.compile(rf"<(/?){tag}\b[^>]*?(/?)>", re.IGNORECASE)
+
+
+def find_element(
+    html: str, tag: str, attribute: str, value: str, start: int = 0
+) -> Optional[Tuple[int, int]]:
+    """
+    Find the start and end offsets of the first element matching the tag and
+    attribute value. An element that is never closed ends with the document
+    """
+    opening = _opening_pattern(tag, attribute, value).search(html, start)
+    if opening is None:
+        return None
+    depth = 1
+    for match in _tag_pattern(tag).finditer(html, opening.end()):
+        if match.group(1):
+            depth -= 1
+        elif not match.group(2):
+            depth += 1
+        if depth == 0:
+            return opening.start(), match.end()
+    return opening.start(), len(html)
+
+
+def extract_fragments(
+    html: str, elements: List[Tuple[str, str, str]]
+) -> Optional[List[str]]:
+    """
+    Extract the fragments of the elements, in order. Returns None if any of
+    them is missing
+    """
+    fragments: List[str] = []
+    for tag, attribute, value in elements:
+        offsets = find_element(html, tag, attribute, value)
+        if offsets is None:
+            return None
+        fragments.append(html[offsets[0] : offsets[1]])
+    return fragments
+
+
+def content_hash(
+    html: str, elements: Optional[List[Tuple[str, str, str]]] = None
+) -> Optional[str]:
+    """
+    Stable hash of the relevant fragments of a page. Whitespace is collapsed
+    so formatting changes don't modify the hash. Returns None if the
+    fragments can't be found
+    """
+    fragments = extract_fragments(
+        html, ENTRY_ELEMENTS if elements is None else elements
+    )
+    if fragments is None:
+        return None
+    normalised = " ".join(" ".join(fragments).split())
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
@@ -0,0 +1,188 @@
+"""
+On-disk HTTP cache for the entry pages. It keeps the validators (ETag and
+Last-Modified) and the body of each page to perform conditional requests.
+Files are read and written in threads so the event loop isn't blocked
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB
+
+
+class CacheEntry(NamedTuple):
+    """Named tuple for a cached page"""
+
+    url: str
+    body: str
+    body_hash: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def hash_body(body: str) -> str:
+    """Stable hash of a page body"""
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """
+    Cache entry pages on disk, one file per url, evicting the least recently
+    used pages once the cache grows over its maximum size
+    """
+
+    def __init__(
+        self,
+        folder: Union[str, Path] = HTTP_CACHE_DIR,
+        max_bytes: int = HTTP_CACHE_MAX_MB * 1024 * 1024,
+    ) -> None:
+        """Initialise the cache folder and index the pages already cached"""
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Counters of 304 answers, unchanged and changed bodies and misses
+        self.stats: Counter[str] = Counter()
+
+        self.log = logging.getLogger(__name__)
+
+        # Index of the cached files with their size and last use
+        self.index: Dict[str, Tuple[int, float]] = {}
+        for path in self.folder.glob("*.json"):
+            stat = path.stat()
+            self.index[path.stem] = (stat.st_size, stat.st_mtime)
+        self.size = sum(size for size, _ in self.index.values())
+        self.log.info(
+            "HTTP cache in %s with %s pages and %s bytes",
+            self.folder,
+            len(self.index),
+            self.size,
+        )
+
+    def _key(self, url: str) -> str:
+        """Get the file name for the url"""
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        """Get the path of the file for a key"""
+        return self.folder / f"{key}.json"
+
+    def _read(self, key: str) -> CacheEntry:
+        """Read an entry from disk"""
+        with open(self._path(key), "r", encoding="utf-8") as cache_file:
+            return CacheEntry(**json.load(cache_file))
+
+    async def get(self, url: str) -> Optional[CacheEntry]:
+        """Get the cached entry for the url, if any"""
+        key = self._key(url)
+        if key not in self.index:
+            return None
+        try:
+            entry = await asyncio.to_thread(self._read, key)
+        except (OSError, ValueError, TypeError) as err:
+            self.log.warning("Dropping unreadable cache entry %s: %s", url, err)
+            await self._remove(key)
+            return None
+        await self._touch(key)
+        return entry
+
+    def conditional_headers(
+        self, entry: Optional[CacheEntry]
+    ) -> Dict[str, str]:
+        """Headers to revalidate the cached entry with the server"""
+        headers: Dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def revalidated(self, entry: CacheEntry) -> str:
+        """The server answered 304, the cached body is still valid"""
+        self.stats["not_modified"] += 1
+        return entry.body
+
+    async def store(
+        self,
+        url: str,
+        body: str,
+        headers: Mapping[str, str],
+        entry: Optional[CacheEntry] = None,
+    ) -> bool:
+        """
+        Store the page received with status 200. Returns whether the body is
+        unchanged regarding the cached entry, which covers servers that ignore
+        the validators
+        """
+        body_hash = hash_body(body)
+        unchanged = entry is not None and entry.body_hash == body_hash
+        if entry is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["unchanged" if unchanged else "changed"] += 1
+
+        new_entry = CacheEntry(
+            url,
+            body,
+            body_hash,
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+        )
+        if unchanged and entry == new_entry:
+            await self._touch(self._key(url))
+            return unchanged
+        await self._write(self._key(url), new_entry)
+        return unchanged
+
+    async def _write(self, key: str, entry: CacheEntry) -> None:
+        """Write an entry on disk and evict pages if needed"""
+        data = json.dumps(entry._asdict()).encode("utf-8")
+        try:
+            await asyncio.to_thread(self._path(key).write_bytes, data)
+        except OSError as err:
+            self.log.warning("Couldn't cache %s: %s", entry.url, err)
+            return
+        previous_size, _ = self.index.get(key, (0, 0.0))
+        self.index[key] = (len(data), time.time())
+        self.size += len(data) - previous_size
+        await self.evict()
+
+    async def _touch(self, key: str) -> None:
+        """Mark an entry as recently used"""
+        size, _ = self.index[key]
+        now = time.time()
+        self.index[key] = (size, now)
+        try:
+            await asyncio.to_thread(os.utime, self._path(key), (now, now))
+        except OSError:
+            pass
+
+    async def _remove(self, key: str) -> None:
+        """Remove an entry from disk and from the index"""
+        size, _ = self.index.pop(key, (0, 0.0))
+        self.size -= size
+        try:
+            await asyncio.to_thread(self._path(key).unlink)
+        except OSError:
+            pass
+
+    async def evict(self) -> List[str]:
+        """Evict the least recently used entries until the size fits"""
+        evicted: List[str] = []
+        if self.size <= self.max_bytes:
+            return evicted
+        for key, _ in sorted(self.index.items(), key=lambda item: item[1][1]):
+            if self.size <= self.max_bytes:
+                break
+            await self._remove(key)
+            evicted.append(key)
+        self.log.debug("Evicted %s pages from the HTTP cache", len(evicted))
+        return evicted
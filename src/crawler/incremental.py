@@ -0,0 +1,79 @@
+"""
+Incremental crawls: the listing pages are compared with the entry pages we
+already know, and only the new ones plus a selection of the known ones are
+fetched. Incremental crawls refresh a rotating slice of the known pages and
+priority crawls the ones most likely to have changed
+"""
+
+import logging
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Set
+
+from config import INCREMENTAL_SLICES
+
+FULL = "full"
+INCREMENTAL = "incremental"
+PRIORITY = "priority"
+CRAWL_MODES = (FULL, INCREMENTAL, PRIORITY)
+
+
+def validate_mode(mode: str) -> str:
+    """Validate the crawl mode"""
+    if mode not in CRAWL_MODES:
+        msg = f"Unknown crawl mode {mode}, expected one of {CRAWL_MODES}"
+        logging.getLogger(__name__).error(msg)
+        raise ValueError(msg)
+    return mode
+
+
+def url_slice(url: str, slices: int) -> int:
+    """Slice of a url, stable between runs and processes"""
+    return zlib.crc32(url.encode("utf-8")) % slices
+
+
+class UrlSelector(ABC):
+    # pylint: disable=too-few-public-methods
+    """Select the entry pages of a listing page fetched by a crawl"""
+
+    @abstractmethod
+    def select(self, urls: List[str]) -> List[str]:
+        """Entry pages to fetch, in the order they should be fetched"""
+
+
+class IncrementalSelector(UrlSelector):
+    # pylint: disable=too-few-public-methods
+    """Select the entry pages fetched by an incremental crawl"""
+
+    def __init__(
+        self,
+        known_urls: Set[str],
+        slice_index: int,
+        slices: int = INCREMENTAL_SLICES,
+    ) -> None:
+        """
+        Initialise the selector with the entry pages already stored and the
+        slice of them refreshed in this run
+        """
+        if slices < 1:
+            raise ValueError(f"Expected slices >= 1, got {slices}")
+        self.known_urls = known_urls
+        self.slices = slices
+        self.slice_index = slice_index % slices
+
+        self.log = logging.getLogger(__name__)
+        self.log.info(
+            "Incremental crawl of %s known pages, refreshing slice %s of %s",
+            len(known_urls),
+            self.slice_index,
+            slices,
+        )
+
+    def select(self, urls: List[str]) -> List[str]:
+        """Keep the new entry pages and the known ones in the slice"""
+        return [
+            url
+            for url in urls
+            if url not in self.known_urls
+            or url_slice(url, self.slices) == self.slice_index
+        ]
@@ -0,0 +1,78 @@
+"""
+Normalise the raw values of the CNMV pages without depending on the process
+locale. Values repeat a lot between pages, so the results are memoised
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+# Number of distinct raw values remembered by each normaliser
+CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_number(value: str) -> float:
+    """
+    Parse a number written with English (2,400,000.00) or Spanish
+    (2.400.000,00) separators. When both separators appear the last one is
+    the decimal separator. A separator repeated is a thousands separator, and
+    a single comma is one too unless it isn't followed by three digits.
+    A single dot is always the decimal separator
+    """
+    number = value.strip()
+    comma = number.rfind(",")
+    dot = number.rfind(".")
+    if comma >= 0 and dot >= 0:
+        if comma > dot:
+            number = number.replace(".", "").replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif comma >= 0:
+        decimals = len(number) - comma - 1
+        if number.count(",") == 1 and decimals != 3:
+            number = number.replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif number.count(".") > 1:
+        number = number.replace(".", "")
+    return float(number)
+
+
+def _days_in_month(year: int, month: int) -> int:
+    """Number of days of the month in the gregorian calendar"""
+    if month == 2:
+        leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+        return 29 if leap else 28
+    return 30 if month in (4, 6, 9, 11) else 31
+
+
+def _is_padded_date(date: str) -> bool:
+    """Check whether the date is written as DD/MM/YYYY with ASCII digits"""
+    return (
+        len(date) == 10
+        and date[2] == "/"
+        and date[5] == "/"
+        and date[:2].isdigit()
+        and date[3:5].isdigit()
+        and date[6:].isdigit()
+        and date.isascii()
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_date(date: str) -> str:
+    """
+    Convert a date from the CNMV format (DD/MM/YYYY) to ISO 8601. The usual
+    zero-padded dates from year 1000 onwards are validated and reordered by
+    slicing, any other input goes through strptime, which raises ValueError
+    if it is invalid
+    """
+    if _is_padded_date(date):
+        day, month, year = int(date[:2]), int(date[3:5]), int(date[6:])
+        if (
+            year >= 1000
+            and 1 <= month <= 12
+            and 1 <= day <= _days_in_month(year, month)
+        ):
+            return f"{date[6:]}-{date[3:5]}-{date[:2]}"
+    return datetime.strptime(date, r"%d/%m/%Y").strftime("%Y-%m-%d")
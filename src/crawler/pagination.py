@@ -0,0 +1,54 @@
+"""
+Range of the pagination of the listing pages. Listing pages only differ in
+their page query parameter, counted from 0, so once the last page is known
+every listing page can be requested at once
+"""
+
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Query parameter with the index of a listing page, the first one is 0
+PAGE_PARAMETER = "page"
+
+# Text below the pagination, e.g. "Page 1 out of 28" or "Página 1 de 28"
+PAGE_INFO = re.compile(r"(\d+)\s+(?:out\s+of|de)\s+(\d+)", re.IGNORECASE)
+
+
+def page_index(url: str) -> Optional[int]:
+    """Index of the listing page of a url, None if it has no valid index"""
+    for key, value in parse_qsl(urlparse(url).query):
+        if key == PAGE_PARAMETER:
+            return int(value) if value.isdigit() else None
+    return None
+
+
+def page_url(url: str, index: int) -> str:
+    """Url of the listing page with the given index"""
+    parsed = urlparse(url)
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parsed.query)
+        if key != PAGE_PARAMETER
+    ]
+    query.append((PAGE_PARAMETER, str(index)))
+    return parsed._replace(query=urlencode(query)).geturl()
+
+
+def parse_page_info(text: str) -> Optional[Tuple[int, int]]:
+    """
+    Current page and number of pages, both counted from 1, of the text below
+    the pagination. Returns None if the text doesn't have them
+    """
+    match = PAGE_INFO.search(text)
+    if match is None:
+        return None
+    current, total = int(match.group(1)), int(match.group(2))
+    if not 1 <= current <= total:
+        return None
+    return current, total
+
+
+def page_range(template: str, current: int, last: int) -> List[str]:
+    """Urls of the listing pages after the current one up to the last one"""
+    return [page_url(template, index) for index in range(current + 1, last + 1)]
@@ -0,0 +1,78 @@
+"""
+Pool of worker processes parsing entry pages, so parsing doesn't block the
+event loop and uses every core of the host
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from config import PARSE_PROCESSES
+from data_classes import DataTypes
+
+from .pipelines import MongoDataPipeLine
+
+# Pipeline of the current worker process, set by the pool initialiser
+_WORKER_PIPELINE: Optional[MongoDataPipeLine] = None
+
+
+def _initialise_worker(pipeline: MongoDataPipeLine) -> None:
+    """Keep the pipeline received once per worker process"""
+    global _WORKER_PIPELINE  # pylint: disable=global-statement
+    _WORKER_PIPELINE = pipeline
+
+
+def _transform_html(url: str, html: str) -> Optional[DataTypes]:
+    """Parse and transform an entry page in a worker process"""
+    assert _WORKER_PIPELINE is not None
+    return _WORKER_PIPELINE.transform_html(url, html)
+
+
+class ParsePool:
+    """
+    Run the transformation of the entry pages in a process pool. With zero
+    processes the pages are transformed in the event loop
+    """
+
+    def __init__(
+        self, pipeline: MongoDataPipeLine, processes: int = PARSE_PROCESSES
+    ) -> None:
+        """Initialise the pool, worker processes are started on first use"""
+        self.pipeline = pipeline
+        self.processes = max(processes, 0)
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+        self.log = logging.getLogger(__name__)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Get the executor, starting it if needed"""
+        if self.executor is None:
+            self.log.info("Starting %s parsing processes", self.processes)
+            # Spawned processes don't inherit the threads of the mongo client
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialise_worker,
+                initargs=(self.pipeline,),
+            )
+        return self.executor
+
+    async def transform(self, url: str, html: str) -> Optional[DataTypes]:
+        """Parse and transform an entry page"""
+        if self.processes == 0:
+            return self.pipeline.transform_html(url, html)
+        loop = asyncio.get_running_loop()
+        # Metrics recorded in the worker processes are lost, so the parse is
+        # timed here
+        with self.pipeline.metrics.timer("parse"):
+            return await loop.run_in_executor(
+                self._get_executor(), _transform_html, url, html
+            )
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,221 @@
+"""
+Interchangeable HTML parser backends. Pages are parsed into nodes sharing a
+minimal interface, so the extraction code doesn't depend on the parser used:
+
+- html.parser: BeautifulSoup with the python standard library parser
+- lxml: BeautifulSoup with the lxml parser
+- selectolax: selectolax with the lexbor engine, a C-based css selector
+  engine and the fastest option
+
+lxml and selectolax are optional dependencies, installed with the parsers
+poetry group. If the configured backend is not installed we fall back to
+html.parser.
+
+Pages can also be parsed partially: only the fragments holding the elements
+we extract are given to the backend, skipping the navigation, footer and
+scripts of the CNMV pages.
+"""
+
+import importlib.util
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+
+from config import PARSER_BACKEND
+
+from .fragments import extract_fragments
+
+HTML_PARSER = "html.parser"
+LXML = "lxml"
+SELECTOLAX = "selectolax"
+PARSER_BACKENDS = {HTML_PARSER: None, LXML: "lxml", SELECTOLAX: "selectolax"}
+
+log = logging.getLogger(__name__)
+
+
+class HtmlNode(ABC):
+    """Minimal interface of an element of a parsed page"""
+
+    @abstractmethod
+    def find(
+        self, tag: str, attrs: Optional[Dict[str, str]] = None
+    ) -> Optional["HtmlNode"]:
+        """
+        First descendant with the tag and attributes. Class attributes match
+        any of the classes of the element, other attributes match exactly
+        """
+
+    @abstractmethod
+    def select(self, selector: str) -> List["HtmlNode"]:
+        """Descendants matching the css selector"""
+
+    @abstractmethod
+    def find_next(self, tag: str) -> Optional["HtmlNode"]:
+        """First element with the tag after this one in document order"""
+
+    @abstractmethod
+    def get(self, attribute: str) -> Optional[str]:
+        """Value of an attribute of the element"""
+
+    @property
+    @abstractmethod
+    def text(self) -> str:
+        """Text of the element and all its descendants"""
+
+    @property
+    @abstractmethod
+    def parent(self) -> Optional["HtmlNode"]:
+        """Parent element"""
+
+    def select_one(self, selector: str) -> Optional["HtmlNode"]:
+        """First descendant matching the css selector"""
+        nodes = self.select(selector)
+        return nodes[0] if nodes else None
+
+
+class SoupNode(HtmlNode):
+    """Node backed by a BeautifulSoup tag (html.parser and lxml backends)"""
+
+    def __init__(self, tag: Tag) -> None:
+        """Wrap the tag"""
+        self.tag = tag
+
+    def find(
+        self, tag: str, attrs: Optional[Dict[str, str]] = None
+    ) -> Optional[HtmlNode]:
+        element = self.tag.find(tag, attrs if attrs is not None else {})
+        return SoupNode(element) if isinstance(element, Tag) else None
+
+    def select(self, selector: str) -> List[HtmlNode]:
+        return [SoupNode(element) for element in self.tag.select(selector)]
+
+    def find_next(self, tag: str) -> Optional[HtmlNode]:
+        element = self.tag.find_next(tag)
+        return SoupNode(element) if isinstance(element, Tag) else None
+
+    def get(self, attribute: str) -> Optional[str]:
+        value = self.tag.get(attribute)
+        if isinstance(value, list):
+            return " ".join(value)
+        return value
+
+    @property
+    def text(self) -> str:
+        return self.tag.text
+
+    @property
+    def parent(self) -> Optional[HtmlNode]:
+        return SoupNode(self.tag.parent) if self.tag.parent else None
+
+
+class LexborNode(HtmlNode):
+    """Node backed by a selectolax lexbor node (selectolax backend)"""
+
+    def __init__(self, node: Any) -> None:
+        """Wrap the node"""
+        self.node = node
+
+    def find(
+        self, tag: str, attrs: Optional[Dict[str, str]] = None
+    ) -> Optional[HtmlNode]:
+        selector = tag
+        for attribute, value in (attrs or {}).items():
+            value = value.replace("\\", "\\\\").replace('"', '\\"')
+            operator = "~=" if attribute == "class" else "="
+            selector += f'[{attribute}{operator}"{value}"]'
+        element = self.node.css_first(selector)
+        return LexborNode(element) if element is not None else None
+
+    def select(self, selector: str) -> List[HtmlNode]:
+        return [LexborNode(element) for element in self.node.css(selector)]
+
+    def find_next(self, tag: str) -> Optional[HtmlNode]:
+        # Descendants come first in document order, then the following
+        # siblings of this node and of each of its ancestors
+        for element in self.node.traverse(include_text=False):
+            if element is not self.node and element.tag == tag:
+                return LexborNode(element)
+        current = self.node
+        while current is not None:
+            sibling = current.next
+            while sibling is not None:
+                for element in sibling.traverse(include_text=False):
+                    if element.tag == tag:
+                        return LexborNode(element)
+                sibling = sibling.next
+            current = current.parent
+        return None
+
+    def get(self, attribute: str) -> Optional[str]:
+        value: Optional[str] = self.node.attributes.get(attribute)
+        return value
+
+    @property
+    def text(self) -> str:
+        text: str = self.node.text(deep=True)
+        return text
+
+    @property
+    def parent(self) -> Optional[HtmlNode]:
+        parent = self.node.parent
+        return LexborNode(parent) if parent is not None else None
+
+
+def resolve_backend(backend: str = PARSER_BACKEND) -> str:
+    """
+    Validate the backend name, falling back to html.parser if the backend
+    is not installed
+    """
+    if backend not in PARSER_BACKENDS:
+        msg = (
+            f"Unknown parser backend {backend}, expected one of"
+            f" {list(PARSER_BACKENDS)}"
+        )
+        log.error(msg)
+        raise ValueError(msg)
+    module = PARSER_BACKENDS[backend]
+    if module is not None and importlib.util.find_spec(module) is None:
+        log.warning(
+            "Parser backend %s is not installed, using %s instead",
+            backend,
+            HTML_PARSER,
+        )
+        return HTML_PARSER
+    return backend
+
+
+def parse_html(html: str, backend: str = HTML_PARSER) -> HtmlNode:
+    """Parse the html with the backend, which must be already resolved"""
+    if backend == SELECTOLAX:
+        # pylint: disable=import-outside-toplevel,no-name-in-module
+        from selectolax.lexbor import LexborHTMLParser
+
+        return LexborNode(LexborHTMLParser(html).root)
+    return SoupNode(BeautifulSoup(html, backend))
+
+
+def parse_partial(
+    html: str,
+    elements: List[Tuple[str, str, str]],
+    backend: str = HTML_PARSER,
+) -> HtmlNode:
+    """
+    Parse only the fragments of the elements, found without building the DOM
+    of the page. The whole page is parsed if any of them is missing, so the
+    extraction reports the same errors
+    """
+    fragments = extract_fragments(html, elements)
+    if fragments is None:
+        log.debug("Fragments not found, parsing the whole page")
+        return parse_html(html, backend)
+    return parse_html("".join(fragments), backend)
+
+
+def as_node(element: Union[HtmlNode, Tag]) -> HtmlNode:
+    """Wrap BeautifulSoup elements so they can be used as nodes"""
+    if isinstance(element, HtmlNode):
+        return element
+    return SoupNode(element)
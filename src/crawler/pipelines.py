@@ -2,15 +2,24 @@
 Pipelines to transform the raw data found into mongoDB types
 """
 
-import locale
 import logging
-from datetime import datetime
 from typing import Callable, Dict, Optional, Union
 
-from bs4 import BeautifulSoup
 from bs4.element import Tag
 
+from config import PARSER_BACKEND, PARTIAL_PARSE
 from data_classes import DataTypes
+from metrics import METRICS
+
+from .fragments import ENTRY_ELEMENTS
+from .normalizers import normalize_date, parse_number
+from .parsers import (
+    HtmlNode,
+    as_node,
+    parse_html,
+    parse_partial,
+    resolve_backend,
+)
 
 THS = {
     "numero_registro": "Nº Registro oficial",
@@ -22,32 +31,35 @@ THS = {
     "fecha_ultimo_folleto": "Fecha último folleto",
 }
 
+# Fields identifying an entry, pages missing any of them are ignored
+KEY_FIELDS = frozenset({"nombre", "numero_registro", "fecha_registro", "isin"})
+
 
 def process_capital(capital: str) -> float:
     """
-    Try different locales to process the capital field
+    Process the capital field, written with either English or Spanish
+    separators
+    """
+    return parse_number(capital)
+
+
+def process_date(date: str) -> str:
+    """
+    Convert the dates from the CNMV format (DD/MM/YYYY) to ISO 8601
     """
-    try:
-        locale.setlocale(locale.LC_NUMERIC, "en_US.utf8")
-        return locale.atof(capital)
-    except ValueError:
-        locale.setlocale(locale.LC_NUMERIC, "es_ES.utf8")
-        return locale.atof(capital)
+    return normalize_date(date)
 
 
+# Module level functions only, so the pipeline can be sent to worker processes
 MAPPING: Dict[str, Callable[[str], Union[str, float]]] = {
     "nombre": str,
     "numero_registro": str,
-    "fecha_registro": lambda x: datetime.strptime(x, r"%d/%m/%Y").strftime(
-        "%Y-%m-%d"
-    ),
+    "fecha_registro": process_date,
     "isin": str,
     "domicilio": str,
     "capital_inicial": process_capital,
     "capital_maximo": process_capital,
-    "fecha_ultimo_folleto": lambda x: datetime.strptime(
-        x, r"%d/%m/%Y"
-    ).strftime("%Y-%m-%d"),
+    "fecha_ultimo_folleto": process_date,
 }
 
 
@@ -57,24 +69,58 @@ class MongoDataPipeLine:
     def __init__(
         self,
         mapping_functions: Dict[str, Callable[[str], Union[str, float]]],
+        parser: str = PARSER_BACKEND,
+        partial_parse: bool = PARTIAL_PARSE,
     ) -> None:
         """Initialising the variables in our pipeline"""
         self.mapping_functions = mapping_functions
+        # HTML parser backend for the entry pages and whether only the name
+        # and data table are parsed
+        self.parser = resolve_backend(parser)
+        self.partial_parse = partial_parse
+        self.metrics = METRICS
 
         self.log = logging.getLogger(__name__)
 
+    def parse(self, html: str) -> HtmlNode:
+        """Parse an entry page with the parser backend of the pipeline"""
+        if self.partial_parse:
+            return parse_partial(html, ENTRY_ELEMENTS, self.parser)
+        return parse_html(html, self.parser)
+
+    def transform_html(self, url: str, html: str) -> Optional[DataTypes]:
+        """
+        Parse an entry page and extract and transform its data. Pages missing
+        a key field are ignored
+        """
+        with self.metrics.timer("parse"):
+            try:
+                return self.extract(url, self.parse(html))
+            except ValueError:
+                return None
+
     async def extract_and_transform(
-        self, url: str, soup: BeautifulSoup
+        self, url: str, soup: Union[HtmlNode, Tag]
     ) -> Optional[DataTypes]:
         """
         Extract and transform the data from the soup element
         """
+        return self.extract(url, soup)
+
+    def extract(
+        self, url: str, soup: Union[HtmlNode, Tag]
+    ) -> Optional[DataTypes]:
+        """
+        Extract and transform the data from the soup element without awaiting,
+        so it can run in a worker process
+        """
+        root = as_node(soup)
         # Get the nombre SICAV
         self.log.debug("Getting nombre in %s", url)
-        result = {"nombre": self.get_nombre(url, soup)}
+        result = {"nombre": self.get_nombre(url, root)}
         # Get the data table
-        data_table = soup.find("div", {"class": "div_tablaDatos"})
-        if not isinstance(data_table, Tag):
+        data_table = root.find("div", {"class": "div_tablaDatos"})
+        if data_table is None:
             msg = (
                 "Couldn't find Tag for data table, found"
                 f" {type(data_table)} instead. Ignoring this page."
@@ -89,14 +135,14 @@ class MongoDataPipeLine:
         result.update(self.get_data_table_elements(url, data_table))  # type: ignore
         return DataTypes(**result)  # type: ignore
 
-    def get_nombre(self, url: str, soup: BeautifulSoup) -> str:
+    def get_nombre(self, url: str, soup: Union[HtmlNode, Tag]) -> str:
         """
         Get the nombre SICAV which is in a separate element regarding the
         rest of the fields
         """
         # Get the nombre element
-        nombre_element = soup.find("p", {"class": "titcont"})
-        if not isinstance(nombre_element, Tag):
+        nombre_element = as_node(soup).find("p", {"class": "titcont"})
+        if nombre_element is None:
             msg = (
                 f"Couldn't find Tag for nombre element in {url}, found"
                 f" {type(nombre_element)} instead. Ignoring this page."
@@ -105,7 +151,7 @@ class MongoDataPipeLine:
             raise ValueError(msg)
         # Get the span with the text containing nombre
         nombre = nombre_element.select_one("span")
-        if not isinstance(nombre, Tag):
+        if nombre is None:
             msg = (
                 f"Couldn't find Tag for nombre in {url}, found"
                 f" {type(nombre)} instead. Ignoring this page."
@@ -115,37 +161,47 @@ class MongoDataPipeLine:
 
         return nombre.text
 
+    def get_data_table_cells(
+        self, data_table: Union[HtmlNode, Tag]
+    ) -> Dict[str, HtmlNode]:
+        """
+        Map the label of every td[data-th] cell of the data table to the
+        cell, walking the table only once. The first cell of each label wins
+        """
+        cells: Dict[str, HtmlNode] = {}
+        for cell in as_node(data_table).select("td[data-th]"):
+            label = cell.get("data-th")
+            if label is not None and label not in cells:
+                cells[label] = cell
+        return cells
+
     def get_data_table_elements(
-        self, url: str, data_table: Tag
+        self, url: str, data_table: Union[HtmlNode, Tag]
     ) -> Dict[str, Optional[Union[str, float]]]:
         """Get all elements in the data table"""
+        cells = self.get_data_table_cells(data_table)
         result: Dict[str, Optional[Union[str, float]]] = {}
         for field, th_class in THS.items():
             # Get the current element in the table
-            element = data_table.find("td", {"data-th": th_class})
-            if not isinstance(element, Tag):
+            element = cells.get(th_class)
+            if element is None:
                 msg = (
                     f"Couldn't find Tag for {field} for {url}, found"
                     f" {type(element)} instead."
                 )
-                if field not in [
-                    "nombre",
-                    "numero_registro",
-                    "fecha_registro",
-                    "isin",
-                ]:
+                if field not in KEY_FIELDS:
                     msg += "Using None value instead."
                     self.log.warning(msg)
                     result[field] = None
-                else:
-                    msg += "Key field cannot be None"
-                    self.log.error(msg)
-                    raise ValueError(msg)
+                    continue
+                msg += "Key field cannot be None"
+                self.log.error(msg)
+                raise ValueError(msg)
 
             # ISIN has a different structure, we check it first
-            if field == "isin" and isinstance(element, Tag):
+            if field == "isin":
                 isin = element.select_one("a")
-                if not isinstance(isin, Tag):
+                if isin is None:
                     msg = (
                         "Couldn't find Tag for ISIN for {url}, found"
                         f" {type(isin)} instead. Ignoring this page."
@@ -155,6 +211,5 @@ class MongoDataPipeLine:
                 result[field] = self.mapping_functions[field](isin.text)
                 continue
             # Process elements
-            if element is not None:
-                result[field] = self.mapping_functions[field](element.text)
+            result[field] = self.mapping_functions[field](element.text)
         return result
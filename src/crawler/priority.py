@@ -0,0 +1,120 @@
+"""
+Priority crawls: the known entry pages are scored by how often and how
+recently their data changed, and a per-run budget of them is refreshed,
+the most volatile first. Pages not fetched for too long always go first, so
+every page is refreshed within a maximum age
+"""
+
+import logging
+import math
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set
+
+from config import CHANGE_HALF_LIFE_DAYS, MAX_PAGE_AGE_DAYS, PRIORITY_BUDGET
+from data_classes import DocumentType
+
+from .incremental import UrlSelector
+
+
+def change_dates(document: DocumentType) -> List[date]:
+    """
+    Dates the data of the entry changed, from the changes joined to its
+    document. Fields changed on the same date count as a single change
+    """
+    dates: Set[str] = {
+        change["observed_date"] for change in document.get("changes", [])
+    }
+    changes: List[date] = []
+    for value in sorted(dates):
+        try:
+            changes.append(date.fromisoformat(value))
+        except ValueError:
+            continue
+    return changes
+
+
+def change_score(
+    document: DocumentType,
+    today: date,
+    half_life_days: float = CHANGE_HALF_LIFE_DAYS,
+) -> float:
+    """
+    Likelihood of the entry changing again: the number of changes, each one
+    losing half its weight every half_life_days
+    """
+    return sum(
+        math.pow(0.5, max((today - changed).days, 0) / half_life_days)
+        for changed in change_dates(document)
+    )
+
+
+class PrioritySelector(UrlSelector):
+    # pylint: disable=too-few-public-methods
+    """Select the entry pages fetched by a priority crawl"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        documents: List[DocumentType],
+        budget: int = PRIORITY_BUDGET,
+        max_age_days: float = MAX_PAGE_AGE_DAYS,
+        half_life_days: float = CHANGE_HALF_LIFE_DAYS,
+        now: Optional[datetime] = None,
+    ) -> None:
+        """
+        Rank the known entry pages, given the documents extracted from them,
+        and keep the ones fitting in the budget
+        """
+        self.log = logging.getLogger(__name__)
+        now = now if now is not None else datetime.now()
+        last_fetched: Dict[str, datetime] = {}
+        scores: Dict[str, float] = {}
+        for document in documents:
+            url = document.get("source_url")
+            if url is None:
+                continue
+            last_fetched[url] = document.get("last_fetched", datetime.min)
+            scores[url] = change_score(document, now.date(), half_life_days)
+        self.known_urls = set(scores)
+
+        # The budget must allow fetching every page within the maximum age
+        self.budget = max(
+            budget, math.ceil(len(self.known_urls) / max(max_age_days, 1))
+        )
+        due = sorted(
+            (
+                url
+                for url in self.known_urls
+                if (now - last_fetched[url]).total_seconds()
+                >= max_age_days * 86400
+            ),
+            key=lambda url: last_fetched[url],
+        )
+        if len(due) > self.budget:
+            self.log.warning(
+                "%s pages are older than %s days, over the budget of %s",
+                len(due),
+                max_age_days,
+                self.budget,
+            )
+        due_urls = set(due)
+        volatile = sorted(
+            (url for url in self.known_urls if url not in due_urls),
+            key=lambda url: (-scores[url], last_fetched[url]),
+        )
+        chosen = (due + volatile)[: self.budget]
+        self.rank = {url: index for index, url in enumerate(chosen)}
+        self.log.info(
+            "Priority crawl of %s known pages: refreshing %s, %s of them due",
+            len(self.known_urls),
+            len(chosen),
+            min(len(due), len(chosen)),
+        )
+
+    def select(self, urls: List[str]) -> List[str]:
+        """Keep the new entry pages and the known ones in the budget"""
+        new = [url for url in urls if url not in self.known_urls]
+        chosen = sorted(
+            (url for url in urls if url in self.rank), key=self.rank.__getitem__
+        )
+        return new + chosen
@@ -0,0 +1,114 @@
+"""
+Retry policy shared by every request of the crawler: which failures are
+retried and how long we wait before the next attempt
+"""
+
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import FrozenSet, Optional, Tuple, Type
+
+import aiohttp
+
+from config import (
+    ATTEMPT_WAIT,
+    ATTEMPTS,
+    REQUEST_DEADLINE,
+    RETRY_JITTER,
+    RETRY_MAX_WAIT,
+)
+
+# Statuses worth retrying, any other status different from 200 is final
+RETRYABLE_STATUSES: FrozenSet[int] = frozenset(
+    {408, 425, 429, 500, 502, 503, 504}
+)
+
+# Timeouts, connection resets and truncated payloads are worth retrying
+RETRYABLE_EXCEPTIONS: Tuple[Type[BaseException], ...] = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the Retry-After header, given either in seconds or as an HTTP date
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max((retry_date - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter bounded by a per-request deadline"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        attempts: int = ATTEMPTS,
+        base_wait: float = ATTEMPT_WAIT,
+        max_wait: float = RETRY_MAX_WAIT,
+        jitter: float = RETRY_JITTER,
+        deadline: float = REQUEST_DEADLINE,
+    ) -> None:
+        """
+        Initialise the policy. The wait before the n-th retry is
+        base_wait * 2 ** (n - 1), capped at max_wait, and a random fraction
+        of up to jitter of it is removed
+        """
+        if attempts < 1:
+            raise ValueError(f"Expected attempts >= 1, got {attempts}")
+        if not 0 <= jitter <= 1:
+            raise ValueError(f"Expected jitter between 0 and 1, got {jitter}")
+        self.attempts = attempts
+        self.base_wait = base_wait
+        self.max_wait = max_wait
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def is_retryable_status(self, status: int) -> bool:
+        """Check whether a response status is worth retrying"""
+        return status in RETRYABLE_STATUSES or 500 <= status < 600
+
+    def is_retryable_error(self, err: BaseException) -> bool:
+        """Check whether an exception is worth retrying"""
+        return isinstance(err, RETRYABLE_EXCEPTIONS)
+
+    def timeout(
+        self, base: aiohttp.ClientTimeout, remaining: float
+    ) -> aiohttp.ClientTimeout:
+        """
+        Timeout of an attempt: the timeouts of the session, with the total
+        capped at the time remaining before the deadline. Only the fields
+        every supported aiohttp version has are kept
+        """
+        total = remaining if base.total is None else min(base.total, remaining)
+        return aiohttp.ClientTimeout(
+            total=total,
+            connect=base.connect,
+            sock_read=base.sock_read,
+            sock_connect=base.sock_connect,
+        )
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Time to wait after the given failed attempt. A Retry-After header
+        sent by the server is honoured up to max_wait
+        """
+        wait = min(self.max_wait, self.base_wait * 2.0 ** (attempt - 1))
+        wait -= wait * self.jitter * random.random()
+        server_wait = parse_retry_after(retry_after)
+        if server_wait is not None:
+            wait = max(wait, min(server_wait, self.max_wait))
+        return wait
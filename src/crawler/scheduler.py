@@ -0,0 +1,103 @@
+"""
+Request scheduler shared by every request the crawler performs. It bounds the
+number of requests in flight and rate limits each host with a token bucket
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+from config import MAX_CONCURRENT_REQUESTS, REQUEST_BURST, REQUESTS_PER_SECOND
+
+
+class TokenBucket:
+    # pylint: disable=too-few-public-methods
+    """
+    Token bucket refilled at a constant rate up to its burst size. Waiters are
+    served in arrival order
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialise the bucket full"""
+        if rate <= 0:
+            raise ValueError(f"Expected a positive rate, got {rate}")
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated: Optional[float] = None
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accumulated since the last update"""
+        if self.updated is not None:
+            elapsed = now - self.updated
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            self._refill(loop.time())
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill(loop.time())
+            self.tokens -= 1
+
+
+class RequestScheduler:
+    # pylint: disable=too-few-public-methods
+    """Global concurrency cap plus a per-host token bucket"""
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        requests_per_second: float = REQUESTS_PER_SECOND,
+        burst: int = REQUEST_BURST,
+    ) -> None:
+        """
+        Initialise the scheduler. A requests_per_second <= 0 disables the
+        rate limit and only the concurrency cap is applied
+        """
+        if max_concurrency < 1:
+            raise ValueError(
+                f"Expected max_concurrency >= 1, got {max_concurrency}"
+            )
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.buckets: Dict[str, TokenBucket] = {}
+
+        self.log = logging.getLogger(__name__)
+        self.log.info(
+            "Request scheduler with %s concurrent requests and %s requests"
+            " per second per host",
+            max_concurrency,
+            requests_per_second,
+        )
+
+    def _get_bucket(self, url: str) -> Optional[TokenBucket]:
+        """Get the token bucket for the host of the url"""
+        if self.requests_per_second <= 0:
+            return None
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(
+                self.requests_per_second, self.burst
+            )
+        return self.buckets[host]
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """
+        Wait for a free concurrency slot and a token for the host of the url
+        and hold the slot while the request is performed
+        """
+        async with self.semaphore:
+            bucket = self._get_bucket(url)
+            if bucket is not None:
+                await bucket.acquire()
+            yield
@@ -0,0 +1,69 @@
+"""
+Factory for the HTTP session used by the crawler and its connection pool
+"""
+
+import logging
+from typing import NamedTuple, Optional
+
+import aiohttp
+
+from config import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_CONNECTIONS_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEP_ALIVE,
+    HTTP_KEEP_ALIVE_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+)
+
+log = logging.getLogger(__name__)
+
+
+class PoolConfig(NamedTuple):
+    """Named tuple with the connection pool configuration"""
+
+    keep_alive: bool = HTTP_KEEP_ALIVE
+    pool_size: int = HTTP_POOL_SIZE
+    connections_per_host: int = HTTP_CONNECTIONS_PER_HOST
+    keep_alive_timeout: float = HTTP_KEEP_ALIVE_TIMEOUT
+    dns_cache_ttl: int = HTTP_DNS_CACHE_TTL
+    connect_timeout: float = HTTP_CONNECT_TIMEOUT
+    read_timeout: float = HTTP_READ_TIMEOUT
+
+
+def build_connector(pool: PoolConfig) -> aiohttp.TCPConnector:
+    """
+    Create the TCP connector. Without keep-alive every connection is closed
+    after its response, as the crawler originally did
+    """
+    if not pool.keep_alive:
+        return aiohttp.TCPConnector(
+            force_close=True,
+            limit=pool.pool_size,
+            limit_per_host=pool.connections_per_host,
+            ttl_dns_cache=pool.dns_cache_ttl,
+        )
+    return aiohttp.TCPConnector(
+        limit=pool.pool_size,
+        limit_per_host=pool.connections_per_host,
+        ttl_dns_cache=pool.dns_cache_ttl,
+        keepalive_timeout=pool.keep_alive_timeout,
+    )
+
+
+def build_session(pool: Optional[PoolConfig] = None) -> aiohttp.ClientSession:
+    """Create a client session using the connection pool configuration"""
+    if pool is None:
+        pool = PoolConfig()
+    log.info(
+        "Creating HTTP session with keep-alive %s, %s connections per host",
+        pool.keep_alive,
+        pool.connections_per_host,
+    )
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=pool.connect_timeout, sock_read=pool.read_timeout
+    )
+    return aiohttp.ClientSession(
+        connector=build_connector(pool), timeout=timeout
+    )
@@ -0,0 +1,119 @@
+"""
+Bounded sink of the transformed results. Results are written in batches once
+a batch is full or its time window expires, and producers wait while the sink
+is full, so a slow database slows down the crawl instead of piling results up
+in memory
+"""
+
+import asyncio
+import logging
+from types import TracebackType
+from typing import Any, Awaitable, Callable, List, Optional, Type
+
+from config import (
+    PERSIST_BATCH_SIZE,
+    PERSIST_FLUSH_SECONDS,
+    PERSIST_QUEUE_SIZE,
+    PERSIST_WORKERS,
+)
+
+# Write a batch of items, whatever it returns is ignored
+BatchWriter = Callable[[List[Any]], Awaitable[Any]]
+
+# Item telling a writer to flush its batch and stop
+_CLOSE = object()
+
+
+class ResultSink:
+    """Queue of results consumed by writers flushing them in batches"""
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        write: BatchWriter,
+        batch_size: int = PERSIST_BATCH_SIZE,
+        flush_seconds: float = PERSIST_FLUSH_SECONDS,
+        queue_size: int = PERSIST_QUEUE_SIZE,
+        writers: int = PERSIST_WORKERS,
+    ) -> None:
+        """
+        Initialise the sink. Up to queue_size results wait to be written
+        (0 is unbounded) and writers batches are written at the same time
+        """
+        self.write = write
+        self.batch_size = max(batch_size, 1)
+        self.flush_seconds = flush_seconds
+        self.queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=queue_size)
+        self.writers = max(writers, 1)
+        self.tasks: List["asyncio.Task[None]"] = []
+
+        self.log = logging.getLogger(__name__)
+
+    async def __aenter__(self) -> "ResultSink":
+        """Start the writers"""
+        self.tasks = [
+            asyncio.create_task(self._writer()) for _ in range(self.writers)
+        ]
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Write the results still in the sink and stop the writers"""
+        await self.close()
+
+    async def put(self, item: Any) -> None:
+        """Add a result, waiting while the sink is full"""
+        await self.queue.put(item)
+
+    async def close(self) -> None:
+        """Write the results still in the sink and stop the writers"""
+        if not self.tasks:
+            return
+        for _ in self.tasks:
+            await self.queue.put(_CLOSE)
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _next_batch(self) -> List[Any]:
+        """
+        Wait for a result and gather the ones arriving until the batch is
+        full or its time window expires
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.flush_seconds
+        while batch[-1] is not _CLOSE and len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _writer(self) -> None:
+        """Write batches of results until the sink is closed"""
+        while True:
+            batch = await self._next_batch()
+            closed = batch[-1] is _CLOSE
+            items = batch[:-1] if closed else batch
+            try:
+                if items:
+                    await self.write(items)
+            # pylint: disable=broad-exception-caught
+            except Exception as err:
+                self.log.error(
+                    "Failed to write a batch of %s results with error: %s",
+                    len(items),
+                    err,
+                )
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if closed:
+                return
@@ -0,0 +1,123 @@
+"""
+Staged pipeline built on asyncio queues. Every stage owns a bounded queue and
+a pool of workers, and the workers of a stage emit items to the next stage or,
+from the last stage, to an optional sink
+"""
+
+import asyncio
+import logging
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+# Emit an item to the next stage, or to the stage named in the second argument
+Emit = Callable[[Any, Optional[str]], Awaitable[None]]
+# Process an item of a stage, whatever it returns is ignored
+Handler = Callable[[Any, Emit], Awaitable[Any]]
+# Receive the items emitted by the last stage
+Sink = Callable[[Any], Awaitable[None]]
+
+
+class Stage(NamedTuple):
+    """
+    Named tuple describing a stage: its handler, the number of workers
+    consuming its queue and the maximum size of that queue (0 is unbounded)
+    """
+
+    name: str
+    handler: Handler
+    workers: int = 1
+    queue_size: int = 0
+
+
+class StagedPipeline:
+    """Run items through a chain of stages connected by bounded queues"""
+
+    def __init__(
+        self, stages: List[Stage], sink: Optional[Sink] = None
+    ) -> None:
+        """Initialise the stages of the pipeline and the sink of its items"""
+        if not stages:
+            raise ValueError("The pipeline needs at least one stage")
+        self.stages = stages
+        self.sink = sink
+        self.queues: Dict[str, "asyncio.Queue[Any]"] = {}
+
+        self.log = logging.getLogger(__name__)
+
+    async def submit(self, stage_name: str, item: Any) -> None:
+        """Put an item in the queue of a given stage"""
+        await self.queues[stage_name].put(item)
+
+    async def run(self, items: Iterable[Any]) -> None:
+        """
+        Feed the items to the first stage and wait until every stage drained
+        its queue
+        """
+        self.queues = {
+            stage.name: asyncio.Queue(maxsize=stage.queue_size)
+            for stage in self.stages
+        }
+        workers = [
+            asyncio.create_task(self._worker(index, stage))
+            for index, stage in enumerate(self.stages)
+            for _ in range(max(stage.workers, 1))
+        ]
+        try:
+            for item in items:
+                await self.submit(self.stages[0].name, item)
+            # Items of a stage are emitted before the previous stage marks
+            # its own item as done, so joining the queues in order is enough
+            for stage in self.stages:
+                await self.queues[stage.name].join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _emitter(self, index: int) -> Emit:
+        """
+        Create the emit callable used by the handlers of a stage. Items
+        emitted by the last stage go to the sink, or are discarded without
+        one, unless a stage is named
+        """
+        next_stage = (
+            self.stages[index + 1].name
+            if index + 1 < len(self.stages)
+            else None
+        )
+
+        async def emit(item: Any, stage_name: Optional[str] = None) -> None:
+            target = stage_name if stage_name is not None else next_stage
+            if target is not None:
+                await self.submit(target, item)
+            elif self.sink is not None:
+                await self.sink(item)
+
+        return emit
+
+    async def _worker(self, index: int, stage: Stage) -> None:
+        """Consume the queue of a stage until the worker is cancelled"""
+        queue = self.queues[stage.name]
+        emit = self._emitter(index)
+        while True:
+            item = await queue.get()
+            try:
+                await stage.handler(item, emit)
+            # pylint: disable=broad-exception-caught
+            except Exception as err:
+                self.log.error(
+                    "Stage %s failed processing %s with error: %s",
+                    stage.name,
+                    str(item)[:120],
+                    err,
+                )
+            finally:
+                queue.task_done()
@@ -1,17 +1,27 @@
 """Initialise data classes"""
 
 from .data_models import (
+    ChangeDocumentType,
     ContentTypes,
+    CrawlRunType,
     DataTypes,
     DocumentType,
     KeyDocumentType,
+    PageResponse,
+    PageSource,
     QueryDict,
+    QueueItemType,
 )
 
 __all__ = [
+    "ChangeDocumentType",
     "ContentTypes",
+    "CrawlRunType",
     "DataTypes",
     "DocumentType",
     "KeyDocumentType",
+    "PageResponse",
+    "PageSource",
     "QueryDict",
+    "QueueItemType",
 ]
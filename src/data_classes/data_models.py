@@ -1,7 +1,16 @@
 """File containing all the model data classes we need"""
 
 from datetime import datetime
-from typing import Dict, List, NamedTuple, Optional, TypeAlias, TypedDict, Union
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    TypeAlias,
+    TypedDict,
+    Union,
+)
 
 QueryDict: TypeAlias = Dict[str, Union[str, List[str], Dict[str, str]]]
 
@@ -11,8 +20,22 @@ class ContentTypes(NamedTuple):
     Named tuple for the content of each pagination
     """
 
+    # The default lists are never modified
+    # pylint: disable=dangerous-default-value
     next_page: str = ""
     urls: List[str] = []
+    # Listing pages after this one, when the range of the pagination is known
+    pages: List[str] = []
+
+
+class PageResponse(NamedTuple):
+    """
+    Named tuple for a successful response (200 or 304) to a page request
+    """
+
+    status: int
+    text: str
+    headers: Mapping[str, str]
 
 
 class DataTypes(NamedTuple):
@@ -28,7 +51,38 @@ class DataTypes(NamedTuple):
     fecha_ultimo_folleto: Optional[str] = None
 
 
-class DocumentType(TypedDict):
+class PageSource(NamedTuple):
+    """NamedTuple for the page an entry was extracted from"""
+
+    url: str
+    content_hash: str
+
+
+class ChangeDocumentType(TypedDict):
+    """
+    Change of a field of an entry, observed on the date it was crawled
+    """
+
+    isin: str
+    field: str
+    observed_date: str
+    old_value: Optional[Union[str, float]]
+    new_value: Optional[Union[str, float]]
+
+
+class SourceDocumentType(TypedDict, total=False):
+    """
+    Optional fields of a document entry identifying the page it comes from,
+    and its changes when they are requested along with it
+    """
+
+    source_url: str
+    content_hash: str
+    last_fetched: datetime
+    changes: List[ChangeDocumentType]
+
+
+class DocumentType(SourceDocumentType):
     """
     Document entry type for the database
     """
@@ -43,7 +97,6 @@ class DocumentType(TypedDict):
     fecha_ultimo_folleto: str
     last_update: str
     write_date: datetime
-    updates: Dict[str, Dict[str, Union[str, float]]]
 
 
 class KeyDocumentType(TypedDict):
@@ -55,3 +108,34 @@ class KeyDocumentType(TypedDict):
     numero_registro: str
     fecha_registro: str
     isin: str
+
+
+class QueueItemType(TypedDict):
+    """
+    Work item of the queue shared by the crawler processes
+    """
+
+    url: str
+    generation: int
+    kind: str
+    priority: int
+    status: str
+    owner: Optional[str]
+    lease_expires: Optional[datetime]
+    attempts: int
+    created: datetime
+
+
+class CrawlRunType(TypedDict):
+    """
+    Crawl run record, checkpointed so an interrupted run can be resumed
+    """
+
+    run_id: str
+    mode: str
+    status: str
+    started: datetime
+    updated: datetime
+    listing_url: str
+    completed: List[str]
+    stats: Dict[str, int]
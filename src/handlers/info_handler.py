@@ -38,4 +38,10 @@ class InfoHandler(HTTPMethodView):
         query: QueryDict = {"isin": isin}
         msg = f"Listing ISIN {isin} data"
         self.log.info(msg)
-        return (await self.mongo_client.find_entries(query))[0]
+        entries = await self.mongo_client.find_entries(query)
+        if not entries:
+            self.log.error("No entry found with ISIN %s", isin)
+            return None
+        entry = entries[0]
+        entry["changes"] = await self.mongo_client.changes.find_changes(isin)
+        return entry
@@ -0,0 +1,5 @@
+"""Initialise the metrics of the crawler"""
+
+from .registry import METRICS, Histogram, MetricsRegistry
+
+__all__ = ["Histogram", "METRICS", "MetricsRegistry"]
@@ -0,0 +1,188 @@
+"""
+Counters and latency histograms of the crawl runs, written as a Prometheus
+text file and a JSON summary
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Prefix of the metric names
+NAMESPACE = "cnmv"
+
+# Upper bounds in seconds of the latency buckets
+BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Description of the metrics we record
+DESCRIPTIONS = {
+    "pages_fetched": "Entry pages fetched, including the ones not modified",
+    "pages_not_modified": "Entry pages served from the HTTP cache",
+    "retries": "Requests retried",
+    "parse_failures": "Entry pages that couldn't be parsed",
+    "inserts": "Entries inserted in the database",
+    "updates": "Entries whose data changed",
+    "unchanged": "Entries whose data didn't change",
+    "fetch": "Seconds fetching an entry page, retries included",
+    "parse": "Seconds parsing and transforming an entry page",
+    "diff": "Seconds reading entries and comparing them with the new data",
+    "write": "Seconds writing an entry, or a batch of them, in the database",
+}
+
+
+class Histogram:
+    """Latency histogram with fixed buckets"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS) -> None:
+        """Initialise an empty histogram"""
+        self.buckets = buckets
+        # Observations in each bucket, the last one is above every bound
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add an observation"""
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimate a quantile with the upper bound of its bucket, or the
+        maximum for the last bucket
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts[:-1]):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[index], self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Summary of the observations"""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """Counters and histograms shared by the components of the crawler"""
+
+    def __init__(self, namespace: str = NAMESPACE) -> None:
+        """Initialise an empty registry"""
+        self.namespace = namespace
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+        self.log = logging.getLogger(__name__)
+
+    def reset(self) -> None:
+        """Remove every metric, at the start of a run"""
+        self.counters.clear()
+        self.histograms.clear()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increase a counter"""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Add an observation to a histogram"""
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Observe the time spent in the block, even if it fails"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def to_prometheus(self) -> str:
+        """Metrics in the Prometheus text format"""
+        lines: List[str] = []
+        for name, value in sorted(self.counters.items()):
+            metric = f"{self.namespace}_{name}_total"
+            lines.append(f"# HELP {metric} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value:g}")
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{self.namespace}_{name}_seconds"
+            lines.append(f"# HELP {metric} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.sum:.6f}")
+            lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict[str, Any]:
+        """Summary of the metrics"""
+        return {
+            "generated": datetime.now().isoformat(timespec="seconds"),
+            "counters": dict(sorted(self.counters.items())),
+            "histograms": {
+                name: histogram.summary()
+                for name, histogram in sorted(self.histograms.items())
+            },
+        }
+
+    def write(self, directory: str, name: str) -> None:
+        """
+        Write the metrics to <name>.prom and <name>.json in the directory.
+        Files are replaced at once, so readers never see them half written
+        """
+        folder = Path(directory)
+        folder.mkdir(parents=True, exist_ok=True)
+        contents = {
+            f"{name}.prom": self.to_prometheus(),
+            f"{name}.json": json.dumps(self.to_json(), indent=2) + "\n",
+        }
+        for filename, content in contents.items():
+            path = folder / filename
+            temporary = folder / f".{filename}.tmp"
+            temporary.write_text(content, encoding="utf-8")
+            os.replace(temporary, path)
+        self.log.info("Metrics written to %s", folder / name)
+
+
+# Registry shared by the crawler, the data pipeline and the data client
+METRICS = MetricsRegistry()
@@ -1,5 +1,8 @@
 """Initialise mongo clients"""
 
+from .mongo_changes import MongoChangesClient as ChangesClient
 from .mongo_data import MongoDataClient as DataClient
+from .mongo_queue import MongoQueueClient as QueueClient
+from .mongo_runs import MongoRunsClient as RunsClient
 
-__all__ = ["DataClient"]
+__all__ = ["ChangesClient", "DataClient", "QueueClient", "RunsClient"]
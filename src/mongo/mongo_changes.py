@@ -0,0 +1,88 @@
+"""Mongo Client used to read and write the change history of the entries"""
+
+import logging
+from typing import Any, Dict, List, Unpack
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.operations import IndexModel
+
+from data_classes import ChangeDocumentType
+
+from .mongo_client_base import ClientParams, MongoClientBase
+
+
+def legacy_changes(document: Dict[str, Any]) -> List[ChangeDocumentType]:
+    """
+    Changes of an entry stored in its nested updates dict. Each previous
+    value is keyed by the last_update it had when it was replaced, so it was
+    replaced on the next date the entry was written
+    """
+    updates: Dict[str, Dict[str, Any]] = document.get("updates") or {}
+    written = {document["last_update"]}
+    for history in updates.values():
+        written.update(history)
+    dates = sorted(written)
+    changes: List[ChangeDocumentType] = []
+    for field, history in updates.items():
+        since = sorted(history)
+        values = [history[date] for date in since] + [document.get(field)]
+        for position, date in enumerate(since):
+            later = [observed for observed in dates if observed > date]
+            changes.append({
+                "isin": document["isin"],
+                "field": field,
+                "observed_date": later[0] if later else date,
+                "old_value": values[position],
+                "new_value": values[position + 1],
+            })
+    return sorted(changes, key=lambda change: change["observed_date"])
+
+
+class MongoChangesClient(MongoClientBase):
+    """
+    Append-only history of the changes of the entries, one document per
+    changed field, so the entries only keep their current values
+    """
+
+    def __init__(self, **kwargs: Unpack[ClientParams]) -> None:
+        """Initialise a mongo change history client"""
+        super().__init__(**kwargs)
+        if self.collection is None:
+            self.collection = "sicav_changes"  # Set a default
+        self.log = logging.getLogger(__name__)
+
+    async def set_index(self) -> List[str]:
+        """Set indexes in mongo collection"""
+        index = IndexModel([("isin", ASCENDING), ("observed_date", ASCENDING)])
+        result = await self.get_collection().create_indexes([index])
+        if isinstance(result, list):
+            self.log.debug("Set indexes")
+            return result
+        msg = f"Couldn't set indexes, got the following result: {result}"
+        self.log.error(msg)
+        raise ValueError(msg)
+
+    async def add_changes(self, changes: List[ChangeDocumentType]) -> int:
+        """
+        Append changes to the history. A change is identified by all its
+        fields, so adding it again doesn't duplicate it and failed writes can
+        be retried. Returns the number of changes added
+        """
+        if not changes:
+            return 0
+        operations = [
+            UpdateOne(dict(change), {"$setOnInsert": dict(change)}, upsert=True)
+            for change in changes
+        ]
+        result = await self.get_collection().bulk_write(
+            operations, ordered=False
+        )
+        return int(result.upserted_count)
+
+    async def find_changes(self, isin: str) -> List[ChangeDocumentType]:
+        """Changes of an entry, oldest first"""
+        sort = [("observed_date", ASCENDING), ("_id", ASCENDING)]
+        cursor = self.get_collection().find(
+            {"isin": isin}, {"_id": 0}, sort=sort
+        )
+        return [change async for change in cursor]
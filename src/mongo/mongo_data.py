@@ -1,16 +1,47 @@
 """Mongo Client used to read and write data into the database"""
 
+import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Unpack
+from typing import Any, Dict, List, Optional, Set, Tuple, Union, Unpack
 
-from pymongo import ASCENDING
+from pymongo import ASCENDING, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from pymongo.operations import IndexModel
 
-from data_classes import DataTypes, DocumentType, QueryDict
+from config import BULK_WRITE_SIZE, WRITE_MODE
+from data_classes import (
+    ChangeDocumentType,
+    DataTypes,
+    DocumentType,
+    PageSource,
+    QueryDict,
+)
+from metrics import METRICS
 
+from .mongo_changes import MongoChangesClient, legacy_changes
 from .mongo_client_base import ClientParams, MongoClientBase
 
+# Write modes: set_data_bulk reads the existing entries of every batch, diffs
+# them against a snapshot of the registry loaded once, or leaves the diff to
+# mongo with aggregation pipeline updates
+READ = "read"
+SNAPSHOT = "snapshot"
+PIPELINE = "pipeline"
+WRITE_MODES = (READ, SNAPSHOT, PIPELINE)
+
+# Fields of the snapshot, the ones compared with the new data
+SNAPSHOT_FIELDS = (*DataTypes._fields, "last_update", "content_hash")
+
+# Fields of the entries used by the crawler to refresh them, not listed
+SOURCE_FIELDS = ("source_url", "content_hash", "last_fetched")
+
+# Position of a result among the ones written in bulk, the result and its
+# source page
+BulkEntry = Tuple[int, DataTypes, Optional[PageSource]]
+# Entries of the snapshot are keyed by numero_registro and isin
+SnapshotKey = Tuple[str, str]
+
 
 class MongoDataClient(MongoClientBase):
     """Read and write data into the database"""
@@ -20,7 +51,23 @@ class MongoDataClient(MongoClientBase):
         super().__init__(**kwargs)
         if self.collection is None:
             self.collection = "cnmv_data"  # Set a default
+        self.metrics = METRICS
         self.log = logging.getLogger(__name__)
+        if WRITE_MODE not in WRITE_MODES:
+            msg = (
+                f"Unknown write mode {WRITE_MODE}, expected one of"
+                f" {WRITE_MODES}"
+            )
+            self.log.error(msg)
+            raise ValueError(msg)
+        self.write_mode = WRITE_MODE
+        # Comparable fields of the entries, loaded in the snapshot mode
+        self.snapshot: Optional[Dict[SnapshotKey, DocumentType]] = None
+        # The entries only keep their current values, their changes are
+        # appended to the change history
+        self.changes = MongoChangesClient(
+            db_name=self.db_name, collection=None, connector=self.connector
+        )
         self.log.info(
             "Mongo client for db %s configured, using collection %s",
             self.db_name,
@@ -38,6 +85,7 @@ class MongoDataClient(MongoClientBase):
             ],
             background=True,
         )
+        await self.changes.set_index()
         result = await self.get_collection().create_indexes([index])
         if isinstance(result, list):
             self.log.debug("Set indexes")
@@ -46,6 +94,38 @@ class MongoDataClient(MongoClientBase):
         self.log.error(msg)
         raise ValueError(msg)
 
+    async def delete_docs(self, query: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Delete docs from the collection along with their change history
+
+        If query is unset, all documents will be deleted.
+        """
+        isins = await self.get_collection().distinct("isin", query or {})
+        deleted = await super().delete_docs(query)
+        await self.changes.delete_docs({"isin": {"$in": isins}})
+        return deleted
+
+    async def migrate_updates(self) -> int:
+        """
+        Move the nested updates dicts of the entries written by previous
+        versions to the change history. An interrupted migration can be run
+        again. Returns the number of entries moved
+        """
+        migrated = 0
+        query = {"updates": {"$exists": True}}
+        async for document in self.get_collection().find(query):
+            await self.changes.add_changes(legacy_changes(document))
+            await self.get_collection().update_one(
+                {"_id": document["_id"]}, {"$unset": {"updates": ""}}
+            )
+            migrated += 1
+        if migrated:
+            self.log.info(
+                "Moved the updates of %s entries to the change history",
+                migrated,
+            )
+        return migrated
+
     async def find_entry(self, query: Dict[str, str]) -> Optional[DocumentType]:
         """Find specific entry using the query provided"""
         proj = {"_id": 0}
@@ -55,8 +135,11 @@ class MongoDataClient(MongoClientBase):
         return document
 
     async def find_entries(self, query: QueryDict) -> List[DocumentType]:
-        """Find entries matching the desired query"""
-        proj = {"_id": 0}
+        """
+        Find entries matching the desired query, without the fields only
+        used by the crawler
+        """
+        proj = {"_id": 0, **{field: 0 for field in SOURCE_FIELDS}}
         results: List[DocumentType] = []
         sort = [(key, ASCENDING) for key in query.keys()]
         cursor = self.get_collection().find(query, proj, sort=sort)
@@ -66,9 +149,90 @@ class MongoDataClient(MongoClientBase):
                 results.append(document)
         return results
 
-    async def set_data(self, result: DataTypes) -> bool:
+    async def find_content_hashes(self) -> Dict[str, str]:
         """
-        Set the data for a particular entry
+        Get the content hash of the page each entry was extracted from, keyed
+        by the page url
+        """
+        query = {"content_hash": {"$exists": True}}
+        proj = {"_id": 0, "source_url": 1, "content_hash": 1}
+        hashes: Dict[str, str] = {}
+        async for document in self.get_collection().find(query, proj):
+            if "source_url" in document:
+                hashes[document["source_url"]] = document["content_hash"]
+        return hashes
+
+    async def find_refresh_history(self) -> List[DocumentType]:
+        """
+        Get the source page, the dates of the changes and the last fetch of
+        the entries extracted from a known page
+        """
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"source_url": {"$exists": True}}},
+            {
+                "$lookup": {
+                    "from": self.changes.collection,
+                    "localField": "isin",
+                    "foreignField": "isin",
+                    "as": "changes",
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "source_url": 1,
+                    "last_update": 1,
+                    "last_fetched": 1,
+                    "changes.observed_date": 1,
+                }
+            },
+        ]
+        return [
+            document
+            async for document in self.get_collection().aggregate(pipeline)
+        ]
+
+    async def set_last_fetched(
+        self, urls: List[str], fetched: Optional[datetime] = None
+    ) -> int:
+        """
+        Set when the pages of the entries were last fetched, for the pages
+        that weren't written because their content didn't change
+        """
+        if not urls:
+            return 0
+        fetched = fetched if fetched is not None else datetime.now()
+        result = await self.get_collection().update_many(
+            {"source_url": {"$in": urls}}, {"$set": {"last_fetched": fetched}}
+        )
+        return int(result.modified_count)
+
+    async def load_snapshot(self) -> int:
+        """
+        Load the comparable fields of every entry with a single query, so
+        set_data_bulk computes the differences in memory instead of reading
+        the entries of each batch. Only loaded in the snapshot write mode,
+        returns the number of entries loaded
+        """
+        if self.write_mode != SNAPSHOT:
+            return 0
+        proj = {"_id": 0, **{field: 1 for field in SNAPSHOT_FIELDS}}
+        self.snapshot = {}
+        async for document in self.get_collection().find({}, proj):
+            self.snapshot[self._snapshot_key(document)] = document
+        self.log.info("Loaded a snapshot of %s entries", len(self.snapshot))
+        return len(self.snapshot)
+
+    def clear_snapshot(self) -> None:
+        """Drop the snapshot, entries are read again from the database"""
+        self.snapshot = None
+
+    async def set_data(
+        self, result: DataTypes, source: Optional[PageSource] = None
+    ) -> bool:
+        """
+        Set the data for a particular entry. The source page and its content
+        hash are stored along with the data when provided
         """
         if not isinstance(result, DataTypes):
             msg = (
@@ -77,33 +241,455 @@ class MongoDataClient(MongoClientBase):
             )
             self.log.error(msg)
             return False
+        if self.write_mode == PIPELINE:
+            # The entry is compared and written by mongo at once
+            return (await self.set_data_bulk([result], [source]))[0]
 
-        query = {
-            "nombre": result.nombre,
-            "numero_registro": result.numero_registro,
-            "fecha_registro": result.fecha_registro,
-            "isin": result.isin,
-        }
-        # Find existing document first (if any)
-        document = await self.find_entry(query)
+        query = self._entry_query(result)
+        # Find existing document first (if any) and compare it
+        with self.metrics.timer("diff"):
+            document = await self.find_entry(query)
+            differences = (
+                self._get_differences(document, result)
+                if document is not None
+                else {}
+            )
         if document is None:
             # No record exists in the database for this particular entity.
             # Set up and save the data
-            return await self._set_new_entry(result)
-        return await self._update_existing_entry(query, document, result)
+            return await self._set_new_entry(result, source)
+        return await self._update_existing_entry(
+            query, document, result, differences, source
+        )
 
-    async def _set_new_entry(self, result: DataTypes) -> bool:
-        """Set a new entry in the database"""
+    async def set_data_bulk(
+        self,
+        results: List[DataTypes],
+        sources: Optional[List[Optional[PageSource]]] = None,
+        batch_size: int = BULK_WRITE_SIZE,
+    ) -> List[bool]:
+        """
+        Set the data for several entries like set_data does, with one read and
+        one unordered bulk write per batch of up to batch_size entries. With
+        a snapshot loaded the entries are not read, and the snapshot is kept
+        up to date with the writes. In the pipeline mode the entries are not
+        read either, mongo compares them. Returns whether each entry was
+        written
+        """
+        if sources is None:
+            sources = [None] * len(results)
+        outcomes = [False] * len(results)
+        write = (
+            self._set_pipeline_batch
+            if self.write_mode == PIPELINE
+            else self._set_data_batch
+        )
+        batch: Dict[Tuple[str, ...], BulkEntry] = {}
+        for index, (result, source) in enumerate(zip(results, sources)):
+            if not isinstance(result, DataTypes):
+                self.log.error(
+                    "Expected result to be DataTypes, found %s for %s",
+                    type(result),
+                    result,
+                )
+                continue
+            # The writes of a batch may be applied in any order, so an entry
+            # appearing twice goes to the next batch
+            key = tuple(self._entry_query(result).values())
+            if key in batch or len(batch) >= batch_size:
+                await write(list(batch.values()), outcomes)
+                batch = {}
+            batch[key] = (index, result, source)
+        if batch:
+            await write(list(batch.values()), outcomes)
+        return outcomes
+
+    async def _set_pipeline_batch(
+        self,
+        batch: List[BulkEntry],
+        outcomes: List[bool],
+    ) -> None:
+        """
+        Write the entries of a batch with aggregation pipeline updates, so
+        every entry is compared and written by mongo without reading it
+        first. The changes found in the previous documents the updates
+        return are appended to the change history afterwards, entries whose
+        changes couldn't be appended are logged and not counted as written.
+        The outcome of each result is set by its index
+        """
+        with self.metrics.timer("write"):
+            written = await asyncio.gather(
+                *[
+                    self._set_pipeline_entry(result, source)
+                    for _, result, source in batch
+                ],
+                return_exceptions=True,
+            )
+        changes: List[ChangeDocumentType] = []
+        changed: List[int] = []
+        for (index, result, _), entry_changes in zip(batch, written):
+            if isinstance(entry_changes, BaseException):
+                self.log.error(
+                    "Failed to write the entry with isin %s: %s",
+                    result.isin,
+                    entry_changes,
+                )
+                continue
+            outcomes[index] = True
+            if entry_changes:
+                changed.append(index)
+                changes.extend(entry_changes)
+        try:
+            await self.changes.add_changes(changes)
+        except PyMongoError as err:
+            self.log.error(
+                "Failed to append the changes of %s entries: %s, the changes"
+                " were: %s",
+                len(changed),
+                err,
+                changes,
+            )
+            for index in changed:
+                outcomes[index] = False
+        self.log.info(
+            "Data set for %s entries with pipeline updates", len(batch)
+        )
+
+    async def _set_pipeline_entry(
+        self, result: DataTypes, source: Optional[PageSource] = None
+    ) -> List[ChangeDocumentType]:
+        """
+        Write an entry with an aggregation pipeline update, in a single round
+        trip, and return its changes
+        """
+        write_date = datetime.now()
+        previous = await self.get_collection().find_one_and_update(
+            self._entry_query(result),
+            self._pipeline_update(result, write_date, source),
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is None:
+            self.metrics.inc("inserts")
+            return []
+        differences = self._get_differences(previous, result)
+        self.metrics.inc("updates" if differences else "unchanged")
+        return self._entry_changes(
+            result, differences, write_date.strftime("%Y-%m-%d")
+        )
+
+    def _pipeline_update(
+        self,
+        result: DataTypes,
+        write_date: datetime,
+        source: Optional[PageSource] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregation pipeline setting the data of an entry like set_data.
+        last_update and write_date only change for new entries or when some
+        field changed
+        """
+        data = result._asdict()
+        written = {
+            "$or": [
+                {"$eq": [{"$type": "$last_update"}, "missing"]},
+                *[
+                    {"$ne": [f"${field}", {"$literal": value}]}
+                    for field, value in data.items()
+                ],
+            ]
+        }
+        fields: Dict[str, Any] = {
+            **{field: {"$literal": value} for field, value in data.items()},
+            "last_update": {
+                "$cond": [
+                    written,
+                    write_date.strftime("%Y-%m-%d"),  # ISO 8601
+                    "$last_update",
+                ]
+            },
+            "write_date": {
+                "$cond": [written, {"$literal": write_date}, "$write_date"]
+            },
+        }
+        if source is not None:
+            page_changed = {
+                "$ne": ["$content_hash", {"$literal": source.content_hash}]
+            }
+            fields.update({
+                "source_url": {"$literal": source.url},
+                "content_hash": {"$literal": source.content_hash},
+                "last_fetched": {
+                    "$cond": [
+                        {"$or": [written, page_changed]},
+                        {"$literal": write_date},
+                        "$last_fetched",
+                    ]
+                },
+            })
+        # Every expression of the stage sees the previous values
+        return [{"$set": fields}]
+
+    async def _set_data_batch(
+        self,
+        batch: List[BulkEntry],
+        outcomes: List[bool],
+    ) -> None:
+        """
+        Find the existing entries of a batch, compare them with the results
+        and write the new and changed ones with a single bulk write. The
+        changes are appended to the change history first, so an entry is
+        only written once its changes are, and writing them again is
+        harmless. The outcome of each result is set by its index
+        """
+        # pylint: disable=too-many-locals
+        with self.metrics.timer("diff"):
+            queries = [self._entry_query(result) for _, result, _ in batch]
+            documents = await self._find_batch_entries(queries)
+        operations: List[Union[InsertOne[Dict[str, Any]], UpdateOne]] = []
+        indexes: List[int] = []
+        # Changes of the entries, by the position of their write
+        changes: Dict[int, List[ChangeDocumentType]] = {}
+        # Snapshot entries replaced by the writes, restored if they fail
+        previous: Dict[int, Tuple[SnapshotKey, Optional[DocumentType]]] = {}
+        for (index, result, source), query in zip(batch, queries):
+            document = documents.get(tuple(query.values()))
+            if document is None:
+                data = self._entry_data(result, source)
+                operations.append(InsertOne(data))
+                self.metrics.inc("inserts")
+            elif differences := self._get_differences(document, result):
+                data = self._entry_data(result, source)
+                changes[len(operations)] = self._entry_changes(
+                    result, differences, data["last_update"]
+                )
+                operations.append(UpdateOne(query, {"$set": data}, upsert=True))
+                self.metrics.inc("updates")
+            else:
+                self.metrics.inc("unchanged")
+                # Only keep the hash of a page that changed without changing
+                # the data
+                outcomes[index] = True
+                if source is None or (
+                    document.get("content_hash") == source.content_hash
+                ):
+                    continue
+                data = self._source_fields(source)
+                operations.append(UpdateOne(query, {"$set": data}))
+            indexes.append(index)
+            if self.snapshot is not None:
+                key = self._snapshot_key(query)
+                previous[index] = key, self.snapshot.get(key)
+                self.snapshot[key] = self._snapshot_entry(
+                    {**(document or {}), **data}
+                )
+        if not operations:
+            return
+
+        failed = await self._add_batch_changes(changes)
+        try:
+            failed = await self._bulk_write(operations, failed)
+        except Exception:
+            # Nothing is known to be written
+            self._restore_snapshot(list(previous.values()))
+            raise
+        for position, index in enumerate(indexes):
+            outcomes[index] = position not in failed
+        self._restore_snapshot([
+            previous[indexes[position]]
+            for position in failed
+            if indexes[position] in previous
+        ])
+        self.log.info(
+            "Data set for %s entries in a bulk write", len(operations)
+        )
+
+    async def _bulk_write(
+        self,
+        operations: List[Union[InsertOne[Dict[str, Any]], UpdateOne]],
+        skipped: Set[int],
+    ) -> Set[int]:
+        """
+        Write the operations but the skipped ones with an unordered bulk
+        write. Returns the positions of the operations not written
+        """
+        failed = set(skipped)
+        positions = [
+            position
+            for position in range(len(operations))
+            if position not in skipped
+        ]
+        if not positions:
+            return failed
+        try:
+            with self.metrics.timer("write"):
+                await self.get_collection().bulk_write(
+                    [operations[position] for position in positions],
+                    ordered=False,
+                )
+        except BulkWriteError as err:
+            failed.update(
+                positions[error["index"]]
+                for error in err.details["writeErrors"]
+            )
+            self.log.error(
+                "Failed to write %s of %s entries: %s",
+                len(failed),
+                len(operations),
+                err.details["writeErrors"],
+            )
+        return failed
+
+    async def _add_batch_changes(
+        self, changes: Dict[int, List[ChangeDocumentType]]
+    ) -> Set[int]:
+        """
+        Append the changes of the entries of a batch to the change history.
+        Returns the positions of the entries whose changes couldn't be
+        appended, which are not written
+        """
+        try:
+            await self.changes.add_changes([
+                change
+                for entry_changes in changes.values()
+                for change in entry_changes
+            ])
+        except PyMongoError as err:
+            self.log.error(
+                "Failed to append the changes of %s entries: %s",
+                len(changes),
+                err,
+            )
+            return set(changes)
+        return set()
+
+    async def _find_batch_entries(
+        self, queries: List[Dict[str, str]]
+    ) -> Dict[Tuple[str, ...], DocumentType]:
+        """
+        Existing entries of a batch keyed by their query values, from the
+        snapshot if loaded or else from the database
+        """
+        if self.snapshot is not None:
+            documents: Dict[Tuple[str, ...], DocumentType] = {}
+            for query in queries:
+                document = self.snapshot.get(self._snapshot_key(query))
+                # An entry whose name or registration date changed is a
+                # different entry, like in the query
+                if (
+                    document is not None
+                    and self._entry_query(document) == query
+                ):
+                    documents[tuple(query.values())] = document
+            return documents
+        return {
+            tuple(self._entry_query(document).values()): document
+            async for document in self.get_collection().find(
+                {"$or": queries}, {"_id": 0}
+            )
+        }
+
+    def _snapshot_key(
+        self, document: Union[DocumentType, Dict[str, Any]]
+    ) -> SnapshotKey:
+        """Key of an entry in the snapshot"""
+        return document["numero_registro"], document["isin"]
+
+    def _snapshot_entry(self, fields: Dict[str, Any]) -> DocumentType:
+        """Comparable fields of an entry to keep in the snapshot"""
+        entry: DocumentType = {  # type: ignore
+            field: fields[field] for field in SNAPSHOT_FIELDS if field in fields
+        }
+        return entry
+
+    def _restore_snapshot(
+        self, entries: List[Tuple[SnapshotKey, Optional[DocumentType]]]
+    ) -> None:
+        """Restore the snapshot entries replaced by writes that failed"""
+        if self.snapshot is None:
+            return
+        for key, document in entries:
+            if document is None:
+                self.snapshot.pop(key, None)
+            else:
+                self.snapshot[key] = document
+
+    def _entry_query(
+        self, result: Union[DataTypes, DocumentType]
+    ) -> Dict[str, str]:
+        """Query identifying the document of an entry"""
+        fields = result._asdict() if isinstance(result, DataTypes) else result
+        return {
+            "nombre": fields["nombre"],
+            "numero_registro": fields["numero_registro"],
+            "fecha_registro": fields["fecha_registro"],
+            "isin": fields["isin"],
+        }
+
+    def _get_differences(
+        self, document: DocumentType, result: DataTypes
+    ) -> Dict[str, Any]:
+        """Previous value of the fields whose value changed"""
+        return {
+            field: document[field]  # type: ignore
+            for field, value in result._asdict().items()
+            if value != document[field]  # type: ignore
+        }
+
+    def _source_fields(
+        self, source: Optional[PageSource]
+    ) -> Dict[str, Union[str, datetime]]:
+        """Fields identifying the source page of an entry and its last fetch"""
+        if source is None:
+            return {}
+        return {
+            "source_url": source.url,
+            "content_hash": source.content_hash,
+            "last_fetched": datetime.now(),
+        }
+
+    def _entry_data(
+        self, result: DataTypes, source: Optional[PageSource] = None
+    ) -> Dict[str, Any]:
+        """Current values of an entry to write"""
         write_date = datetime.now()
-        data = {
+        return {
             "last_update": write_date.strftime("%Y-%m-%d"),  # ISO 8601
             "write_date": write_date,
-            "updates": {},
             **result._asdict(),
+            **self._source_fields(source),
         }
+
+    def _entry_changes(
+        self,
+        result: DataTypes,
+        differences: Dict[str, Any],
+        observed_date: str,
+    ) -> List[ChangeDocumentType]:
+        """Changes of the fields of an entry whose value changed"""
+        values = result._asdict()
+        return [
+            {
+                "isin": result.isin,
+                "field": field,
+                "observed_date": observed_date,
+                "old_value": value,
+                "new_value": values[field],
+            }
+            for field, value in differences.items()
+        ]
+
+    async def _set_new_entry(
+        self, result: DataTypes, source: Optional[PageSource] = None
+    ) -> bool:
+        """Set a new entry in the database"""
+        data = self._entry_data(result, source)
         self.log.debug("Setting data for dictionary: %s", data)
 
-        success = await self.get_collection().insert_one(data)
+        with self.metrics.timer("write"):
+            success = await self.get_collection().insert_one(data)
+        self.metrics.inc("inserts")
 
         self.log.info(
             "Data set for %s with numero_registro: %s, isin: %s and"
@@ -121,44 +707,53 @@ class MongoDataClient(MongoClientBase):
         query: Dict[str, str],
         document: DocumentType,
         result: DataTypes,
+        differences: Dict[str, Any],
+        source: Optional[PageSource] = None,
     ) -> bool:
         """
-        Update an existing entry in the database with the differences if we have
-        any differences. Otherwise, we don't update any entries.
+        Append the changes of an existing entry to the change history and
+        update it in the database if we have any differences. Otherwise, we
+        don't update any entries. The entry isn't updated if its changes
+        couldn't be appended.
         """
-        # Check the differences between the document in the database and
-        # the income document
-        differences = {
-            field: document[field]  # type: ignore
-            for field, value in result._asdict().items()
-            if value != document[field]  # type: ignore
-        }
         if not differences:
+            self.metrics.inc("unchanged")
+            # The page changed without changing the data, only keep its hash
+            # so we can skip it next time
+            if source is not None and (
+                document.get("content_hash") != source.content_hash
+            ):
+                with self.metrics.timer("write"):
+                    success = await self.get_collection().update_one(
+                        query, {"$set": self._source_fields(source)}
+                    )
+                return bool(success.acknowledged)
             return True
 
-        # Store the differences in the updates dict in the document
-        for field, value in differences.items():
-            update = {document["last_update"]: value}
-            if field in document["updates"]:
-                document["updates"][field].update(update.copy())
-                continue
-            document["updates"][field] = update.copy()
-
         # Prepare to write in the database
-        write_date = datetime.now()
-
-        data = {
-            "last_update": write_date.strftime("%Y-%m-%d"),  # ISO 8601
-            "write_date": write_date,
-            "updates": document["updates"],
-            **result._asdict(),
-        }
+        data = self._entry_data(result, source)
 
         self.log.debug("Setting data for dictionary: %s", data)
 
-        success = await self.get_collection().update_one(
-            query, {"$set": data}, upsert=True
-        )
+        with self.metrics.timer("write"):
+            try:
+                await self.changes.add_changes(
+                    self._entry_changes(
+                        result, differences, data["last_update"]
+                    )
+                )
+            except PyMongoError as err:
+                self.log.error(
+                    "Failed to append the changes of the entry with isin %s:"
+                    " %s",
+                    result.isin,
+                    err,
+                )
+                return False
+            success = await self.get_collection().update_one(
+                query, {"$set": data}, upsert=True
+            )
+        self.metrics.inc("updates")
 
         self.log.info(
             "Data set for %s with numero_registro: %s, isin: %s and"
@@ -167,7 +762,7 @@ class MongoDataClient(MongoClientBase):
             result.numero_registro,
             result.isin,
             result.fecha_registro,
-            data["updates"],
+            differences,
         )
 
         return success.acknowledged
@@ -0,0 +1,243 @@
+"""Mongo Client used as a work queue shared by the crawler processes"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Unpack
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.operations import IndexModel
+
+from config import QUEUE_MAX_ATTEMPTS
+from data_classes import QueueItemType
+
+from .mongo_client_base import ClientParams, MongoClientBase
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+# Id of the document holding the current generation of the queue
+GENERATION = "generation"
+
+
+class MongoQueueClient(MongoClientBase):
+    """
+    Work queue of urls with leases. A worker claims an item for a while and
+    extends its lease with heartbeats, items whose lease expired are queued
+    again so another worker can claim them.
+
+    Each crawl is a generation of the queue: the coordinator starts a new
+    one and activates it once seeded, workers join the active generation and
+    only see its items
+    """
+
+    def __init__(self, **kwargs: Unpack[ClientParams]) -> None:
+        """Initialise a mongo work queue client"""
+        super().__init__(**kwargs)
+        if self.collection is None:
+            self.collection = "crawl_queue"  # Set a default
+        self.generation: Optional[int] = None
+        self.log = logging.getLogger(__name__)
+
+    async def set_index(self) -> List[str]:
+        """Set indexes in mongo collection"""
+        indexes = [
+            IndexModel([("url", ASCENDING)], unique=True),
+            IndexModel([
+                ("generation", ASCENDING),
+                ("status", ASCENDING),
+                ("priority", ASCENDING),
+            ]),
+            IndexModel([("status", ASCENDING), ("lease_expires", ASCENDING)]),
+        ]
+        result = await self.get_collection().create_indexes(indexes)
+        if isinstance(result, list):
+            self.log.debug("Set indexes")
+            return result
+        msg = f"Couldn't set indexes, got the following result: {result}"
+        self.log.error(msg)
+        raise ValueError(msg)
+
+    async def start(self) -> int:
+        """
+        Start a new generation of the queue, inactive until it is seeded, and
+        delete the items of the previous ones
+        """
+        document = await self.get_collection().find_one_and_update(
+            {"_id": GENERATION},
+            {"$inc": {"current": 1}, "$set": {"active": False}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.generation = int(document["current"])
+        await self.delete_docs(
+            {"_id": {"$ne": GENERATION}, "generation": {"$ne": self.generation}}
+        )
+        self.log.info("Started generation %s of the queue", self.generation)
+        return self.generation
+
+    async def activate(self, active: bool = True) -> bool:
+        """Let the workers join the generation of the queue, or stop them"""
+        result = await self.get_collection().update_one(
+            {"_id": GENERATION, "current": self.generation},
+            {"$set": {"active": active}},
+        )
+        return bool(result.matched_count)
+
+    async def join(self) -> Optional[int]:
+        """Join the active generation of the queue, if any"""
+        document = await self.get_collection().find_one(
+            {"_id": GENERATION, "active": True}
+        )
+        if document is None:
+            return None
+        self.generation = int(document["current"])
+        return self.generation
+
+    async def enqueue(self, kind: str, urls: List[str], priority: int) -> int:
+        """
+        Queue urls of a kind of work, urls already in the queue are ignored.
+        Items with a lower priority are claimed first
+        """
+        if not urls:
+            return 0
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {"url": url},
+                {
+                    "$setOnInsert": {
+                        "url": url,
+                        "generation": self.generation,
+                        "kind": kind,
+                        "priority": priority,
+                        "status": QUEUED,
+                        "owner": None,
+                        "lease_expires": None,
+                        "attempts": 0,
+                        "created": now,
+                    }
+                },
+                upsert=True,
+            )
+            for url in urls
+        ]
+        result = await self.get_collection().bulk_write(
+            operations, ordered=False
+        )
+        return int(result.upserted_count)
+
+    async def claim(
+        self, owner: str, lease_seconds: float
+    ) -> Optional[QueueItemType]:
+        """Lease the next queued item to the owner, if any"""
+        document = await self.get_collection().find_one_and_update(
+            {"generation": self.generation, "status": QUEUED},
+            {
+                "$set": {
+                    "status": LEASED,
+                    "owner": owner,
+                    "lease_expires": datetime.now() + timedelta(
+                        seconds=lease_seconds
+                    ),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            return None
+        document.pop("_id", None)
+        item: QueueItemType = document
+        return item
+
+    async def heartbeat(
+        self, owner: str, urls: List[str], lease_seconds: float
+    ) -> int:
+        """Extend the leases the owner still holds on the urls"""
+        if not urls:
+            return 0
+        result = await self.get_collection().update_many(
+            {"url": {"$in": urls}, "owner": owner, "status": LEASED},
+            {
+                "$set": {
+                    "lease_expires": datetime.now() + timedelta(
+                        seconds=lease_seconds
+                    )
+                }
+            },
+        )
+        # Leases renewed within the same millisecond are left unmodified
+        return int(result.matched_count)
+
+    async def complete(self, owner: str, url: str) -> bool:
+        """Mark an item leased by the owner as done"""
+        result = await self.get_collection().update_one(
+            {"url": url, "owner": owner, "status": LEASED},
+            {"$set": {"status": DONE, "lease_expires": None}},
+        )
+        return bool(result.modified_count)
+
+    async def fail(self, owner: str, url: str, max_attempts: int) -> bool:
+        """
+        Queue again an item leased by the owner that failed, or mark it as
+        failed after max_attempts
+        """
+        retry = await self.get_collection().update_one(
+            {
+                "url": url,
+                "owner": owner,
+                "status": LEASED,
+                "attempts": {"$lt": max_attempts},
+            },
+            {"$set": {"status": QUEUED, "owner": None, "lease_expires": None}},
+        )
+        if retry.modified_count:
+            return True
+        result = await self.get_collection().update_one(
+            {"url": url, "owner": owner, "status": LEASED},
+            {"$set": {"status": FAILED, "lease_expires": None}},
+        )
+        return bool(result.modified_count)
+
+    async def requeue_expired(
+        self, max_attempts: int = QUEUE_MAX_ATTEMPTS
+    ) -> int:
+        """
+        Queue again the items whose lease expired, or mark them as failed
+        after max_attempts, so an item that hangs or kills its workers
+        doesn't keep the generation from draining
+        """
+        retry = {"$lt": ["$attempts", max_attempts]}
+        result = await self.get_collection().update_many(
+            {
+                "generation": self.generation,
+                "status": LEASED,
+                "lease_expires": {"$lt": datetime.now()},
+            },
+            [{
+                "$set": {
+                    "status": {"$cond": [retry, QUEUED, FAILED]},
+                    "owner": {"$cond": [retry, None, "$owner"]},
+                    "lease_expires": None,
+                }
+            }],
+        )
+        if result.modified_count:
+            self.log.warning(
+                "Queued again or failed %s items with expired leases",
+                result.modified_count,
+            )
+        return int(result.modified_count)
+
+    async def count_by_status(self) -> Dict[str, int]:
+        """Number of items of the generation with each status"""
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"generation": self.generation}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ]
+        async for group in self.get_collection().aggregate(pipeline):
+            counts[group["_id"]] = group["count"]
+        return counts
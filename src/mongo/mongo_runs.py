@@ -0,0 +1,119 @@
+"""Mongo Client used to checkpoint the crawl runs"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Unpack
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.operations import IndexModel
+
+from data_classes import CrawlRunType
+
+from .mongo_client_base import ClientParams, MongoClientBase
+
+RUNNING = "running"
+FINISHED = "finished"
+ABANDONED = "abandoned"
+
+
+class MongoRunsClient(MongoClientBase):
+    """Read and write the crawl run records"""
+
+    def __init__(self, **kwargs: Unpack[ClientParams]) -> None:
+        """Initialise a mongo crawl runs client"""
+        super().__init__(**kwargs)
+        if self.collection is None:
+            self.collection = "crawl_runs"  # Set a default
+        self.log = logging.getLogger(__name__)
+
+    async def set_index(self) -> List[str]:
+        """Set indexes in mongo collection"""
+        indexes = [
+            IndexModel([("run_id", ASCENDING)], unique=True),
+            IndexModel([("status", ASCENDING), ("started", DESCENDING)]),
+        ]
+        result = await self.get_collection().create_indexes(indexes)
+        if isinstance(result, list):
+            self.log.debug("Set indexes")
+            return result
+        msg = f"Couldn't set indexes, got the following result: {result}"
+        self.log.error(msg)
+        raise ValueError(msg)
+
+    async def start_run(
+        self, listing_url: str, mode: str = "full"
+    ) -> CrawlRunType:
+        """
+        Start a new run from the listing page. Runs left unfinished are
+        abandoned, so they can't be resumed anymore
+        """
+        abandoned = await self.get_collection().update_many(
+            {"status": RUNNING}, {"$set": {"status": ABANDONED}}
+        )
+        if abandoned.modified_count:
+            self.log.info("Abandoned %s runs", abandoned.modified_count)
+        now = datetime.now()
+        run: CrawlRunType = {
+            "run_id": uuid.uuid4().hex,
+            "mode": mode,
+            "status": RUNNING,
+            "started": now,
+            "updated": now,
+            "listing_url": listing_url,
+            "completed": [],
+            "stats": {},
+        }
+        # Insert a copy, insert_one adds the _id to the document
+        await self.get_collection().insert_one(dict(run))
+        self.log.info("Started crawl run %s", run["run_id"])
+        return run
+
+    async def find_unfinished_run(self) -> Optional[CrawlRunType]:
+        """Find the last run that didn't finish, if any"""
+        run: Optional[CrawlRunType] = await self.get_collection().find_one(
+            {"status": RUNNING}, {"_id": 0}, sort=[("started", DESCENDING)]
+        )
+        return run
+
+    async def find_last_finished_run(
+        self, mode: str = "full"
+    ) -> Optional[CrawlRunType]:
+        """Find the last run of the mode that finished, if any"""
+        run: Optional[CrawlRunType] = await self.get_collection().find_one(
+            {"status": FINISHED, "mode": mode},
+            {"_id": 0},
+            sort=[("started", DESCENDING)],
+        )
+        return run
+
+    async def save_checkpoint(
+        self, run_id: str, listing_url: str, completed: List[str]
+    ) -> bool:
+        """
+        Save the listing page the run should resume from and add a batch of
+        completed entry pages
+        """
+        success = await self.get_collection().update_one(
+            {"run_id": run_id},
+            {
+                "$set": {"listing_url": listing_url, "updated": datetime.now()},
+                "$addToSet": {"completed": {"$each": completed}},
+            },
+        )
+        return bool(success.acknowledged)
+
+    async def finish_run(self, run_id: str, stats: Dict[str, int]) -> bool:
+        """Mark the run as finished with its counters"""
+        success = await self.get_collection().update_one(
+            {"run_id": run_id},
+            {
+                "$set": {
+                    "status": FINISHED,
+                    "updated": datetime.now(),
+                    "stats": stats,
+                }
+            },
+        )
+        self.log.info("Finished crawl run %s", run_id)
+        return bool(success.acknowledged)
@@ -2,14 +2,28 @@
 A local testing script to run the crawler and save the data in MONGO
 """
 
+import argparse
 import asyncio
 import logging
 import sys
 from datetime import datetime
 from typing import no_type_check
 
-from crawler import MAPPING, CNMVCrawler, DataPipeline
-from mongo import DataClient
+from config import (
+    CRAWL_MODE,
+    CRAWL_PROCESSES,
+    HTTP_CACHE_ENABLED,
+    REQUESTS_PER_SECOND,
+)
+from crawler import MAPPING, CNMVCrawler, DataPipeline, HttpCache
+from crawler.distributed import QueueCoordinator, QueueWorker
+from crawler.incremental import CRAWL_MODES
+from crawler.scheduler import RequestScheduler
+from mongo import DataClient, QueueClient, RunsClient
+
+STANDALONE = "standalone"
+COORDINATOR = "coordinator"
+WORKER = "worker"
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,15 +41,91 @@ logging.basicConfig(
 )
 
 
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments"""
+    parser = argparse.ArgumentParser(description="Crawl the CNMV SICAVs")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the last interrupted crawl run from its checkpoint",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=CRAWL_MODES,
+        default=CRAWL_MODE,
+        help=(
+            "Crawl every entry page (full) or only the new ones and either a"
+            " rotating slice of the known ones (incremental) or the ones most"
+            " likely to have changed (priority)"
+        ),
+    )
+    parser.add_argument(
+        "--role",
+        choices=[STANDALONE, COORDINATOR, WORKER],
+        default=STANDALONE,
+        help=(
+            "Crawl in a single process (standalone), or seed the shared work"
+            " queue (coordinator) and process it with CRAWL_PROCESSES"
+            " processes (worker)"
+        ),
+    )
+    parser.add_argument(
+        "--migrate-updates",
+        action="store_true",
+        help=(
+            "Move the updates of the entries written by previous versions to"
+            " the change history and exit, once before the first crawl"
+        ),
+    )
+    return parser.parse_args()
+
+
 @no_type_check
 def main() -> None:
     """Main method"""
+    args = parse_args()
+    loop = asyncio.get_event_loop()
+    if args.migrate_updates:
+        data_client = DataClient(db_name="CNMV")
+        loop.run_until_complete(data_client.set_index())
+        loop.run_until_complete(data_client.migrate_updates())
+        loop.close()
+        return
+
+    if args.role == COORDINATOR:
+        data_client = DataClient(db_name="CNMV")
+        loop.run_until_complete(data_client.set_index())
+        queue_client = QueueClient(db_name="CNMV")
+        loop.run_until_complete(queue_client.set_index())
+        loop.run_until_complete(QueueCoordinator(queue_client).run())
+        loop.close()
+        return
+
     data_client = DataClient(db_name="CNMV")
+    runs_client = RunsClient(db_name="CNMV")
     data_pipeline = DataPipeline(MAPPING)
-    crawler = CNMVCrawler(mongo_client=data_client, data_pipeline=data_pipeline)
-    loop = asyncio.get_event_loop()
+    http_cache = HttpCache() if HTTP_CACHE_ENABLED else None
+    # Workers share the request rate
+    scheduler = RequestScheduler(
+        requests_per_second=REQUESTS_PER_SECOND
+        / (CRAWL_PROCESSES if args.role == WORKER else 1)
+    )
+    crawler = CNMVCrawler(
+        mongo_client=data_client,
+        data_pipeline=data_pipeline,
+        scheduler=scheduler,
+        http_cache=http_cache,
+        runs_client=runs_client,
+    )
     loop.run_until_complete(data_client.set_index())
-    loop.run_until_complete(crawler.crawl_and_save())
+    if args.role == WORKER:
+        queue_client = QueueClient(db_name="CNMV")
+        loop.run_until_complete(QueueWorker(crawler, queue_client).run())
+    else:
+        loop.run_until_complete(runs_client.set_index())
+        loop.run_until_complete(
+            crawler.crawl_and_save(resume=args.resume, mode=args.mode)
+        )
     loop.close()
 
 
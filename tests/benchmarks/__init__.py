@@ -0,0 +1,6 @@
+"""Simplify src and test imports"""
+
+import sys
+
+sys.path.append("src/")
+sys.path.append("tests/")
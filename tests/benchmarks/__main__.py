@@ -0,0 +1,102 @@
+"""
+Run the benchmarks and write their results as JSON, along with the commit
+they were measured at, so the results of two commits can be compared. The
+benchmarks are kept out of the test run, pytest only collects *_test.py.
+
+Run every benchmark, or the given ones, from the repository root with:
+    python -m tests.benchmarks --output benchmarks.json [pipeline mongo ...]
+"""
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Benchmarks without external services first, the last three need MongoDB
+BENCHMARKS = [
+    "pipeline",
+    "table_extraction",
+    "number_parsing",
+    "date_normalization",
+    "connection_pool",
+    "mongo",
+    "service",
+    "crawl",
+]
+
+
+def current_commit() -> Optional[str]:
+    """Commit of the working tree, None outside a git repository"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(name: str) -> Dict[str, Any]:
+    """Run a benchmark, reporting its results and how long it took"""
+    benchmark = importlib.import_module(f"tests.benchmarks.{name}_bench").main
+    start = time.perf_counter()
+    results = (
+        asyncio.run(benchmark())
+        if inspect.iscoroutinefunction(benchmark)
+        else benchmark()
+    )
+    return {"seconds": time.perf_counter() - start, "results": results}
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Run the benchmarks and write their results as JSON"
+    )
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help=f"Benchmarks to run, all of them by default: {BENCHMARKS}",
+    )
+    parser.add_argument(
+        "--output", help="JSON file for the results, stdout by default"
+    )
+    parsed = parser.parse_args()
+    unknown = set(parsed.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks {sorted(unknown)}")
+    return parsed
+
+
+def main(names: List[str]) -> Dict[str, Any]:
+    """Run the benchmarks and describe where they ran"""
+    report: Dict[str, Any] = {
+        "commit": current_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": {},
+    }
+    for name in names:
+        print(f"Running {name}", file=sys.stderr)
+        report["benchmarks"][name] = run(name)
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = json.dumps(main(args.benchmarks or BENCHMARKS), indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
@@ -0,0 +1,114 @@
+"""Helpers shared by the benchmarks"""
+
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from aiohttp import web
+
+# pylint: disable=import-error
+from data_classes import DataTypes
+
+# Database written by the benchmarks, its collections are emptied on each run
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "CNMV_BENCH")
+
+
+def self_signed_context() -> ssl.SSLContext:
+    """
+    Create a server SSL context with a throwaway self-signed certificate for
+    localhost. It requires the openssl command line tool
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        cert = Path(folder) / "cert.pem"
+        key = Path(folder) / "key.pem"
+        subprocess.run(
+            [
+                "openssl",
+                "req",
+                "-x509",
+                "-newkey",
+                "rsa:2048",
+                "-nodes",
+                "-days",
+                "1",
+                "-subj",
+                "/CN=localhost",
+                "-keyout",
+                str(key),
+                "-out",
+                str(cert),
+            ],
+            check=True,
+            capture_output=True,
+        )
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+    return context
+
+
+@asynccontextmanager
+async def serve(
+    app: web.Application, ssl_context: Optional[ssl.SSLContext] = None
+) -> AsyncIterator[str]:
+    """Serve the application on a free local port and yield its base url"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=ssl_context)
+    await site.start()
+    port = runner.addresses[0][1]
+    scheme = "https" if ssl_context is not None else "http"
+    try:
+        yield f"{scheme}://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+def summarise(samples: List[float]) -> Dict[str, float]:
+    """Summarise latency samples given in seconds as milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[int(len(ordered) * 0.95) - 1] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def throughput(count: int, seconds: float) -> float:
+    """Operations per second"""
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def synthetic_result(index: int, revision: int = 0) -> DataTypes:
+    """
+    Result of a synthetic SICAV, the revision changes its capitals so it is
+    stored as an update
+    """
+    capital = 2_400_000.0 + index * 1_000 + revision
+    return DataTypes(
+        f"SYNTHETIC INVERSIONES {index:06d}, SICAV S.A.",
+        str(index + 1),
+        f"2000-{1 + index % 12:02d}-{1 + index % 28:02d}",
+        f"ES0{index:08d}{index % 10}",
+        f"Calle Sintética, {index % 200 + 1}",
+        capital,
+        capital * 10,
+        "2023-01-01",
+    )
+
+
+def synthetic_document(index: int) -> Dict[str, Any]:
+    """Document of a synthetic SICAV as stored by the data client"""
+    write_date = datetime.now()
+    return {
+        "last_update": write_date.strftime("%Y-%m-%d"),
+        "write_date": write_date,
+        **synthetic_result(index)._asdict(),
+    }
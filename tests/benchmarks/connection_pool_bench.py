@@ -0,0 +1,70 @@
+"""
+Benchmark the per-request latency of the crawler session against a local HTTPS
+stand-in, with the keep-alive connection pool and without it.
+
+Run it from the repository root with:
+    python -m tests.benchmarks.connection_pool_bench
+"""
+
+import asyncio
+import json
+import ssl
+import time
+from typing import Dict, List
+
+from aiohttp import web
+
+from src.crawler.session import PoolConfig, build_session
+from tests.benchmarks.bench_utils import self_signed_context, serve, summarise
+from tests.test_utils import SAMPLE_FILES
+
+REQUESTS = 300
+CONCURRENCY = 8
+
+
+async def entry_page(request: web.Request) -> web.Response:
+    # pylint: disable=unused-argument
+    """Serve an entry page like the CNMV detail pages"""
+    return web.Response(
+        text=SAMPLE_FILES["success_entry1"], content_type="text/html"
+    )
+
+
+async def measure(base_url: str, pool: PoolConfig) -> List[float]:
+    """Measure the latency of each request performed with the session"""
+    client_ssl = ssl.create_default_context()
+    client_ssl.check_hostname = False
+    client_ssl.verify_mode = ssl.CERT_NONE
+    samples: List[float] = []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async with build_session(pool) as session:
+
+        async def request(index: int) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                url = f"{base_url}/entry/{index}"
+                async with session.get(url, ssl=client_ssl) as response:
+                    await response.text()
+                samples.append(time.perf_counter() - start)
+
+        await asyncio.gather(*[request(i) for i in range(REQUESTS)])
+    return samples
+
+
+async def main() -> Dict[str, Dict[str, float]]:
+    """Run the benchmark with and without the connection pool"""
+    app = web.Application()
+    app.router.add_get("/entry/{index}", entry_page)
+    results = {}
+    async with serve(app, self_signed_context()) as base_url:
+        for name, keep_alive in [("no_pool", False), ("pool", True)]:
+            pool = PoolConfig(
+                keep_alive=keep_alive, connections_per_host=CONCURRENCY
+            )
+            results[name] = summarise(await measure(base_url, pool))
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main()), indent=2))
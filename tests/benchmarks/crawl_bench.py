@@ -0,0 +1,75 @@
+"""
+Benchmark a whole crawl, CNMVCrawler -> staged pipeline -> Mongo, against the
+local CNMV stand-in: a first crawl storing every SICAV and a second one where
+every page is unchanged.
+
+It needs a MongoDB server (MONGO_HOST and MONGO_PORT). Run it from the
+repository root with:
+    python -m tests.benchmarks.crawl_bench
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict
+
+from src.crawler import MAPPING, CNMVCrawler, DataPipeline
+from src.crawler.scheduler import RequestScheduler
+from src.mongo import DataClient
+from tests.benchmarks.bench_utils import BENCH_DB_NAME, serve, throughput
+from tests.benchmarks.fake_cnmv import (
+    STATS_KEY,
+    FakeConfig,
+    build_app,
+    listing_url,
+)
+
+SIZES = [1000, 5000]
+# Latency of the stand-in, so the concurrency of the crawler matters
+LATENCY = 0.02
+
+
+async def crawl(crawler: CNMVCrawler, pages: int) -> Dict[str, float]:
+    """Run a crawl, reporting the entry pages per second and its counters"""
+    start = time.perf_counter()
+    await crawler.crawl_and_save()
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "pages_per_s": throughput(pages, elapsed),
+        **crawler.stats,
+    }
+
+
+async def main() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Run the benchmark for every size of the registry. The rate limit is
+    disabled, only the concurrency cap of the scheduler applies
+    """
+    client = DataClient(db_name=BENCH_DB_NAME, collection="bench_crawl")
+    await client.set_index()
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for size in SIZES:
+        await client.delete_docs()
+        app = build_app(FakeConfig(sicavs=size, latency=LATENCY))
+        async with serve(app) as base_url:
+            crawler = CNMVCrawler(
+                client,
+                DataPipeline(MAPPING),
+                listing_url(base_url),
+                scheduler=RequestScheduler(requests_per_second=0),
+            )
+            first = await crawl(crawler, size)
+            second = await crawl(crawler, size)
+        assert first["saved"] == size
+        results[str(size)] = {
+            "first": first,
+            "unchanged": second,
+            "server": dict(app[STATS_KEY]),
+        }
+    await client.delete_docs()
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main()), indent=2))
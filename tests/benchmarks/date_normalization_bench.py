@@ -0,0 +1,60 @@
+"""
+Benchmark the normalisation of the dates of the entry pages: strptime and
+strftime, as the pipeline used to do, against normalize_date, without and
+with its cache. The synthetic dates are drawn from the last twenty years, so
+they repeat as the CNMV registration dates do.
+
+Run it from the repository root with:
+    python -m tests.benchmarks.date_normalization_bench
+"""
+
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List
+
+from src.crawler.normalizers import normalize_date
+
+VALUES = 1_000_000
+DAYS = 20 * 365
+SEED = 20231018
+
+
+def strptime_date(value: str) -> str:
+    """Previous normalisation with strptime and strftime"""
+    return datetime.strptime(value, r"%d/%m/%Y").strftime("%Y-%m-%d")
+
+
+def dates() -> List[str]:
+    """Dates in the CNMV format (DD/MM/YYYY)"""
+    rng = random.Random(SEED)
+    first = date(2004, 1, 1)
+    return [
+        (first + timedelta(days=rng.randrange(DAYS))).strftime(r"%d/%m/%Y")
+        for _ in range(VALUES)
+    ]
+
+
+def measure(normalise: Callable[[str], str], values: List[str]) -> float:
+    """Normalised dates per second"""
+    start = time.perf_counter()
+    for value in values:
+        normalise(value)
+    return len(values) / (time.perf_counter() - start)
+
+
+def main() -> Dict[str, float]:
+    """Run the benchmark, reporting the dates normalised per second"""
+    values = dates()
+    results = {
+        "strptime": measure(strptime_date, values),
+        "normalize_date_uncached": measure(normalize_date.__wrapped__, values),
+    }
+    normalize_date.cache_clear()
+    results["normalize_date_cached"] = measure(normalize_date, values)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
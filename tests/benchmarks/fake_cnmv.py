@@ -0,0 +1,264 @@
+"""
+Local stand-in for the CNMV portal. It serves the listing and entry pages of a
+synthetic registry of SICAVs with the markup of the real ones, generated on
+the fly, and injects latency, 5xx responses and slow pages.
+
+Run it from the repository root and point the crawler at it with:
+    python -m tests.benchmarks.fake_cnmv --sicavs 10000 --port 8080
+    INITIAL_URL="http://127.0.0.1:8080/Portal/Consultas/MostrarListados.aspx?id=18"
+"""
+
+import argparse
+import asyncio
+import random
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from aiohttp import web
+
+LISTING_PATH = "/Portal/Consultas/MostrarListados.aspx"
+ENTRY_PATH = "/Portal/Consultas/SociedadIIC.aspx"
+LISTING_ID = "18"
+
+# Keys of the application state
+CONFIG_KEY = "config"
+RANDOM_KEY = "random"
+STATS_KEY = "stats"
+
+
+class FakeConfig(NamedTuple):
+    """Named tuple with the size of the registry and the injected faults"""
+
+    sicavs: int = 1000
+    page_size: int = 50
+    # Seconds added to every response
+    latency: float = 0.0
+    # Fraction of the requests answered with a 503
+    error_rate: float = 0.0
+    # Fraction of the requests delayed by slow_seconds
+    slow_rate: float = 0.0
+    slow_seconds: float = 1.0
+    seed: int = 0
+
+    @property
+    def pages(self) -> int:
+        """Number of listing pages"""
+        return max((self.sicavs + self.page_size - 1) // self.page_size, 1)
+
+
+def sicav_name(index: int) -> str:
+    """Name of a SICAV of the registry"""
+    return f"SYNTHETIC INVERSIONES {index:06d}, SICAV S.A."
+
+
+def sicav_nif(index: int) -> str:
+    """NIF identifying a SICAV of the registry in its entry page url"""
+    return f"A-{10000000 + index:08d}"
+
+
+def listing_item(index: int, position: int) -> str:
+    """Element of a listing page linking to the entry page of a SICAV"""
+    prefix = f"ctl00_ContentPrincipal_wucRelacionRegistros_MF_repListaPrincipal_ctl{position:02d}"
+    return f"""
+                            <li id="{prefix}_elementoPrimerNivel" class="blocks-single">
+                                <ul id="{prefix}_sublistaIzquierda" class="col-11 col-sm-11 single">
+                                    <li id="{prefix}_liTituloCabecera">
+                                        <a id="{prefix}_hlTituloCabecera"
+                                            href="SociedadIIC.aspx?nif={sicav_nif(index)}&amp;vista=0"
+                                            title="{sicav_name(index)}" target="_self"><span
+                                                id="{prefix}_spanTituloCabecera"
+                                                class="tit-small">{sicav_name(index)}</span></a>
+                                    </li>
+                                    <li class="padding-r resumen">
+                                        Official registration number and date: {index + 1} - 28/12/2000
+                                    </li>
+                                </ul>
+                            </li>"""
+
+
+def listing_page(config: FakeConfig, page: int) -> str:
+    """Listing page with its pagination and the SICAVs on it"""
+    base = f"{LISTING_PATH}?id={LISTING_ID}&amp;page="
+    links = [
+        (
+            f'<li><a class="submit" href="{base}0"'
+            ' title="Ir a la primera p&#225;gina ">«</a></li>'
+        ),
+        f'<li><span class="active">{page + 1}</span></li>',
+    ]
+    if page + 1 < config.pages:
+        links.append(
+            f'<li><a class="submit" href="{base}{page + 1}"'
+            f' title="Ir a p&#225;gina {page + 2} ">{page + 2}</a></li>'
+        )
+    links.append(
+        f'<li><a class="submit" href="{base}{config.pages - 1}"'
+        ' title="Ir a la &#250;ltima p&#225;gina ">»</a></li>'
+    )
+    first = page * config.page_size
+    last = min(first + config.page_size, config.sicavs)
+    items = "".join(
+        listing_item(index, index - first + 1) for index in range(first, last)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<body id="page-top">
+    <form name="aspnetForm" method="post" action="./MostrarListados.aspx?id={LISTING_ID}&amp;page={page}" id="aspnetForm">
+        <div class="container-lg content-primary">
+            <section id="maincontent" class="col-12 col-md-10 col-right-content" role="main">
+                <article class="block-content-pdf block-content">
+                    <div class="paginador" role="region" aria-label="Results pages">
+                        <div>
+                            <ul class="pagination">
+                                {"".join(links)}
+                            </ul>
+                        </div>
+                        <span class="PagActivaTXT">Page {page + 1} out of {config.pages}</span>
+                    </div>
+                    <ul id="listaElementosPrimernivel">{items}
+                    </ul>
+                </article>
+            </section>
+        </div>
+    </form>
+</body>
+</html>"""
+
+
+def entry_page(index: int) -> str:
+    """Entry page with the data of a SICAV"""
+    capital = 2_400_000 + index * 1_000
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<body id="page-top">
+    <form name="aspnetForm" method="post" action="./SociedadIIC.aspx?nif={sicav_nif(index)}" id="aspnetForm">
+        <section id="maincontent" class="col-12 col-md-10 col-right-content" role="main">
+            <p id="ctl00_p_subtitulo" class="titcont">
+                <span id="ctl00_ContentPrincipal_lblSubtitulo">{sicav_name(index)}</span>
+            </p>
+            <div class="div_tablaDatos">
+                <table class="tabla-scroll" border="0" id="ctl00_ContentPrincipal_gridDatos">
+                    <tbody>
+                        <tr>
+                            <td data-th="Nº Registro oficial">{index + 1}</td>
+                            <td data-th="Fecha registro oficial">{1 + index % 28:02d}/{1 + index % 12:02d}/2000</td>
+                            <td class="Izquierda" data-th="Domicilio">Calle Sintética, {index % 200 + 1}</td>
+                            <td class="Derecha" data-th="Capital social inicial">{capital:,.2f}</td>
+                            <td class="Derecha" data-th="Capital máximo estatutario">{capital * 10:,.2f}</td>
+                            <td data-th="ISIN">
+                                <a href="../../ANCV/ISIN.ASPX?isin=ES0{index:08d}{index % 10}"
+                                    title="Ir a informaci&#243;n del c&#243;digo ISIN">ES0{index:08d}{index % 10}</a>
+                            </td>
+                            <td data-th="Fecha último folleto">01/01/2023</td>
+                        </tr>
+                    </tbody>
+                </table>
+            </div>
+        </section>
+    </form>
+</body>
+</html>"""
+
+
+async def inject_faults(request: web.Request) -> Optional[web.Response]:
+    """Delay the response and answer some requests with a 503"""
+    config: FakeConfig = request.app[CONFIG_KEY]
+    rng: random.Random = request.app[RANDOM_KEY]
+    stats: Counter[str] = request.app[STATS_KEY]
+    stats["requests"] += 1
+    delay = config.latency
+    if rng.random() < config.slow_rate:
+        stats["slow"] += 1
+        delay += config.slow_seconds
+    if delay > 0:
+        await asyncio.sleep(delay)
+    if rng.random() < config.error_rate:
+        stats["errors"] += 1
+        return web.Response(status=503, text="Service Unavailable")
+    return None
+
+
+async def listing_handler(request: web.Request) -> web.Response:
+    """Serve a listing page, the first one if the page is missing"""
+    error = await inject_faults(request)
+    if error is not None:
+        return error
+    config: FakeConfig = request.app[CONFIG_KEY]
+    page = request.query.get("page", "0")
+    if not page.isdigit() or int(page) >= config.pages:
+        raise web.HTTPNotFound()
+    request.app[STATS_KEY]["listing"] += 1
+    return web.Response(
+        text=listing_page(config, int(page)), content_type="text/html"
+    )
+
+
+async def entry_handler(request: web.Request) -> web.Response:
+    """Serve the entry page of a SICAV given its NIF"""
+    error = await inject_faults(request)
+    if error is not None:
+        return error
+    config: FakeConfig = request.app[CONFIG_KEY]
+    nif = request.query.get("nif", "")
+    number = nif[2:]
+    if not nif.startswith("A-") or not number.isdigit():
+        raise web.HTTPNotFound()
+    index = int(number) - 10000000
+    if not 0 <= index < config.sicavs:
+        raise web.HTTPNotFound()
+    request.app[STATS_KEY]["entry"] += 1
+    return web.Response(text=entry_page(index), content_type="text/html")
+
+
+def build_app(config: Optional[FakeConfig] = None) -> web.Application:
+    """Build the application serving the synthetic registry"""
+    config = config if config is not None else FakeConfig()
+    app = web.Application()
+    app[CONFIG_KEY] = config
+    app[RANDOM_KEY] = random.Random(config.seed)
+    app[STATS_KEY] = Counter()
+    app.router.add_get(LISTING_PATH, listing_handler)
+    app.router.add_get(ENTRY_PATH, entry_handler)
+    return app
+
+
+def listing_url(base_url: str) -> str:
+    """Url of the first listing page, to be used as INITIAL_URL"""
+    return f"{base_url}{LISTING_PATH}?id={LISTING_ID}"
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments"""
+    defaults = FakeConfig()
+    parser = argparse.ArgumentParser(
+        description="Serve a synthetic registry of SICAVs like the CNMV"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--sicavs", type=int, default=defaults.sicavs)
+    parser.add_argument("--page-size", type=int, default=defaults.page_size)
+    parser.add_argument("--latency", type=float, default=defaults.latency)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--slow-rate", type=float, default=defaults.slow_rate)
+    parser.add_argument(
+        "--slow-seconds", type=float, default=defaults.slow_seconds
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    fake_config = FakeConfig(
+        args.sicavs,
+        args.page_size,
+        args.latency,
+        args.error_rate,
+        args.slow_rate,
+        args.slow_seconds,
+        args.seed,
+    )
+    print(f"INITIAL_URL={listing_url(f'http://{args.host}:{args.port}')}")
+    web.run_app(
+        build_app(fake_config), host=args.host, port=args.port, print=None
+    )
@@ -0,0 +1,93 @@
+"""
+Benchmark the writes of the data client: inserting new entries, updating
+entries whose data changed and checking unchanged entries. Entries are
+written one by one with set_data, with as many concurrent writes as the
+writers of the result sink, and in batches of the size of the sink with
+set_data_bulk.
+
+It needs a MongoDB server (MONGO_HOST and MONGO_PORT). Run it from the
+repository root with:
+    python -m tests.benchmarks.mongo_bench
+"""
+
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List
+
+# pylint: disable=import-error
+from data_classes import DataTypes
+from src.config import PERSIST_BATCH_SIZE, PERSIST_WORKERS
+from src.mongo import DataClient
+from tests.benchmarks.bench_utils import (
+    BENCH_DB_NAME,
+    synthetic_result,
+    throughput,
+)
+
+SIZES = [1000, 10000]
+
+
+async def write_all(client: DataClient, results: List[DataTypes]) -> float:
+    """Seconds to set the data of every result"""
+    semaphore = asyncio.Semaphore(PERSIST_WORKERS)
+
+    async def write(result: DataTypes) -> None:
+        async with semaphore:
+            assert await client.set_data(result)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[write(result) for result in results])
+    return time.perf_counter() - start
+
+
+async def write_bulk(client: DataClient, results: List[DataTypes]) -> float:
+    """Seconds to set the data of every result in batches"""
+    semaphore = asyncio.Semaphore(PERSIST_WORKERS)
+
+    async def write(batch: List[DataTypes]) -> None:
+        async with semaphore:
+            assert all(await client.set_data_bulk(batch))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        write(results[index : index + PERSIST_BATCH_SIZE])
+        for index in range(0, len(results), PERSIST_BATCH_SIZE)
+    ])
+    return time.perf_counter() - start
+
+
+# Prefix of the results of each way of writing
+WRITERS: Dict[
+    str, Callable[[DataClient, List[DataTypes]], Awaitable[float]]
+] = {"": write_all, "bulk_": write_bulk}
+
+
+async def main() -> Dict[str, Dict[str, float]]:
+    """Run the benchmark for every size, reporting writes per second"""
+    client = DataClient(db_name=BENCH_DB_NAME, collection="bench_data")
+    await client.set_index()
+    results: Dict[str, Dict[str, float]] = {}
+    for size in SIZES:
+        inserts = [synthetic_result(index) for index in range(size)]
+        updates = [synthetic_result(index, 1) for index in range(size)]
+        results[str(size)] = {}
+        for prefix, write in WRITERS.items():
+            await client.delete_docs()
+            results[str(size)].update({
+                f"{prefix}insert_per_s": throughput(
+                    size, await write(client, inserts)
+                ),
+                f"{prefix}update_per_s": throughput(
+                    size, await write(client, updates)
+                ),
+                f"{prefix}unchanged_per_s": throughput(
+                    size, await write(client, updates)
+                ),
+            })
+    await client.delete_docs()
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main()), indent=2))
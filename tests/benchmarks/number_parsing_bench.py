@@ -0,0 +1,71 @@
+"""
+Benchmark the parsing of the capital fields: the locale based parser
+process_capital used to be against the locale-free parse_number, without and
+with its cache.
+
+Run it from the repository root with:
+    python -m tests.benchmarks.number_parsing_bench
+"""
+
+import json
+import locale
+import random
+import time
+from typing import Callable, Dict, List
+
+from src.crawler.normalizers import parse_number
+
+VALUES = 100_000
+DISTINCT = 2_000
+SEED = 20231018
+
+
+def locale_capital(capital: str) -> float:
+    """Previous parser, switching the process locale"""
+    try:
+        locale.setlocale(locale.LC_NUMERIC, "en_US.utf8")
+        return locale.atof(capital)
+    except ValueError:
+        locale.setlocale(locale.LC_NUMERIC, "es_ES.utf8")
+        return locale.atof(capital)
+
+
+def capitals() -> List[str]:
+    """
+    Capitals in the Spanish format of CNMV, drawn from a small set of
+    distinct amounts since many SICAVs share round figures
+    """
+    rng = random.Random(SEED)
+    amounts = [
+        f"{rng.randrange(1, 100_000) * 1200:,.2f}" for _ in range(DISTINCT)
+    ]
+    return [
+        amount.translate(str.maketrans(",.", ".,"))
+        for amount in rng.choices(amounts, k=VALUES)
+    ]
+
+
+def measure(parse: Callable[[str], float], values: List[str]) -> float:
+    """Parsed values per second"""
+    start = time.perf_counter()
+    for value in values:
+        parse(value)
+    return len(values) / (time.perf_counter() - start)
+
+
+def main() -> Dict[str, float]:
+    """Run the benchmark, reporting the values parsed per second"""
+    values = capitals()
+    results: Dict[str, float] = {}
+    try:
+        results["locale_atof"] = measure(locale_capital, values)
+    except locale.Error:
+        pass
+    results["parse_number_uncached"] = measure(parse_number.__wrapped__, values)
+    parse_number.cache_clear()
+    results["parse_number_cached"] = measure(parse_number, values)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
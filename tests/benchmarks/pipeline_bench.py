@@ -0,0 +1,50 @@
+"""
+Benchmark the parse and the extraction of the entry pages with the data
+pipeline, per parser backend, parsing the whole page or only its fragments.
+
+Run it from the repository root with:
+    python -m tests.benchmarks.pipeline_bench
+"""
+
+import json
+import time
+from typing import Dict
+
+from src.crawler import MAPPING, DataPipeline
+from src.crawler.parsers import PARSER_BACKENDS, resolve_backend
+from tests.benchmarks.fake_cnmv import entry_page
+
+PAGES = 1000
+
+
+def main() -> Dict[str, Dict[str, float]]:
+    """
+    Run the benchmark with every installed parser backend, reporting the
+    time per page in microseconds
+    """
+    pages = [(f"entry/{index}", entry_page(index)) for index in range(PAGES)]
+    results: Dict[str, Dict[str, float]] = {}
+    for backend in PARSER_BACKENDS:
+        if resolve_backend(backend) != backend:
+            continue
+        for partial_parse in [False, True]:
+            pipeline = DataPipeline(
+                MAPPING, parser=backend, partial_parse=partial_parse
+            )
+            start = time.perf_counter()
+            roots = [(url, pipeline.parse(html)) for url, html in pages]
+            parsed = time.perf_counter()
+            extracted = [pipeline.extract(url, root) for url, root in roots]
+            end = time.perf_counter()
+            assert all(result is not None for result in extracted)
+            name = f"{backend}_{'partial' if partial_parse else 'full'}"
+            results[name] = {
+                "parse_us": (parsed - start) / PAGES * 1e6,
+                "extract_us": (end - parsed) / PAGES * 1e6,
+                "pages_per_s": PAGES / (end - start),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
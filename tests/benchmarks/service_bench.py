@@ -0,0 +1,93 @@
+"""
+Benchmark the latency of the service handlers, SearchHandler and
+InfoHandler, for several sizes of the collection. Handlers are called
+directly, so the figures include the query and the JSON response but not
+the HTTP server.
+
+It needs a MongoDB server (MONGO_HOST and MONGO_PORT). Run it from the
+repository root with:
+    python -m tests.benchmarks.service_bench
+"""
+
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+from src.handlers import InfoHandler, SearchHandler
+from src.mongo import DataClient
+from tests.benchmarks.bench_utils import (
+    BENCH_DB_NAME,
+    summarise,
+    synthetic_document,
+    synthetic_result,
+)
+
+SIZES = [1000, 10000, 100000]
+REQUESTS = 200
+BATCH = 5000
+
+
+async def seed(client: DataClient, size: int) -> None:
+    """Fill the collection with size synthetic SICAVs"""
+    await client.delete_docs()
+    for start in range(0, size, BATCH):
+        await client.get_collection().insert_many([
+            synthetic_document(index)
+            for index in range(start, min(start + BATCH, size))
+        ])
+
+
+async def measure(
+    get: Callable[[Any], Any], queries: List[Dict[str, Any]]
+) -> Dict[str, float]:
+    """Latency of the handler for each query"""
+    samples: List[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        await get(SimpleNamespace(json=query))
+        samples.append(time.perf_counter() - start)
+    return summarise(samples)
+
+
+async def main() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Run the benchmark for every size of the collection"""
+    client = DataClient(db_name=BENCH_DB_NAME, collection="bench_service")
+    await client.set_index()
+    SearchHandler.mongo_client = client
+    InfoHandler.mongo_client = client
+    search, info = SearchHandler(), InfoHandler()
+    rng = random.Random(0)
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for size in SIZES:
+        await seed(client, size)
+        picked = [
+            synthetic_result(rng.randrange(size)) for _ in range(REQUESTS)
+        ]
+        results[str(size)] = {
+            "info_isin": await measure(
+                info.get, [{"isin": result.isin} for result in picked]
+            ),
+            "search_isin": await measure(
+                search.get, [{"isin": result.isin} for result in picked]
+            ),
+            "search_nombre": await measure(
+                search.get, [{"nombre": result.nombre} for result in picked]
+            ),
+            # Registration numbers are strings, so ranges are lexicographic
+            "search_numero_registro_range": await measure(
+                search.get,
+                [
+                    {"numero_registro": ["100", "101"]}
+                    for _ in range(REQUESTS // 10)
+                ],
+            ),
+        }
+    await client.delete_docs()
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main()), indent=2))
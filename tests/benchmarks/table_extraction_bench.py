@@ -0,0 +1,89 @@
+"""
+Benchmark the extraction of the data table of the entry pages: one find per
+field, as get_data_table_elements used to do, against the single pass over
+the td[data-th] cells.
+
+Run it from the repository root with:
+    python -m tests.benchmarks.table_extraction_bench
+"""
+
+import json
+import time
+from typing import Callable, Dict, Optional, Union
+
+from src.crawler import MAPPING, DataPipeline
+from src.crawler.parsers import PARSER_BACKENDS, HtmlNode, resolve_backend
+from src.crawler.pipelines import THS
+from tests.test_utils import SAMPLE_FILES
+
+ROUNDS = 2000
+PAGES = ["success_entry1", "success_entry2"]
+
+
+def find_per_field(
+    pipeline: DataPipeline, table: HtmlNode
+) -> Dict[str, Optional[Union[str, float]]]:
+    """Previous extraction, scanning the table once per field"""
+    result: Dict[str, Optional[Union[str, float]]] = {}
+    for field, th_class in THS.items():
+        element = table.find("td", {"data-th": th_class})
+        if element is None:
+            result[field] = None
+            continue
+        if field == "isin":
+            isin = element.select_one("a")
+            if isin is not None:
+                result[field] = pipeline.mapping_functions[field](isin.text)
+            continue
+        result[field] = pipeline.mapping_functions[field](element.text)
+    return result
+
+
+def measure(extract: Callable[[HtmlNode], object], table: HtmlNode) -> float:
+    """Mean time in seconds to extract the table"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        extract(table)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Run the benchmark with every installed parser backend, reporting the
+    extraction time per page in microseconds
+    """
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for backend in PARSER_BACKENDS:
+        if resolve_backend(backend) != backend:
+            continue
+        pipeline = DataPipeline(MAPPING, parser=backend)
+        results[backend] = {}
+        for page in PAGES:
+            table = pipeline.parse(SAMPLE_FILES[page]).find(
+                "div", {"class": "div_tablaDatos"}
+            )
+            assert table is not None
+            # Both extractions must agree before comparing them
+            assert find_per_field(pipeline, table) == (
+                pipeline.get_data_table_elements(page, table)
+            )
+            before = measure(
+                lambda node, pipeline=pipeline: find_per_field(pipeline, node),
+                table,
+            )
+            after = measure(
+                lambda node, pipeline=pipeline, page=page: (
+                    pipeline.get_data_table_elements(page, node)
+                ),
+                table,
+            )
+            results[backend][page] = {
+                "find_per_field_us": before * 1e6,
+                "single_pass_us": after * 1e6,
+                "speedup": before / after,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
@@ -1,11 +1,12 @@
 """Global tests configuration and fixtures"""
 
 import asyncio
+from pathlib import Path
 from typing import Generator
 
 import pytest
 
-from src.mongo import DataClient
+from src.mongo import DataClient, QueueClient, RunsClient
 from src.mongo.mongo_conn import MongoConnector
 from tests.test_utils import DB_NAME, MONGO_HOST, MONGO_PORT
 
@@ -18,6 +19,13 @@ def event_loop() -> Generator:
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def metrics_dir(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """Write the metrics of the crawl runs in a temporary folder"""
+    monkeypatch.setattr("src.crawler.cnmv.METRICS_DIR", str(tmp_path))
+    return tmp_path
+
+
 @pytest.fixture(scope="session")
 def mongo_connector() -> MongoConnector:
     """Make a connector fixture"""
@@ -33,3 +41,23 @@ def data_client(mongo_connector: MongoConnector) -> DataClient:
     loop.run_until_complete(client.delete_docs())
     loop.run_until_complete(client.set_index())
     return client
+
+
+@pytest.fixture(scope="session")
+def runs_client(mongo_connector: MongoConnector) -> RunsClient:
+    """Make a RunsClient fixture"""
+    client = RunsClient(db_name=DB_NAME, connector=mongo_connector)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(client.delete_docs())
+    loop.run_until_complete(client.set_index())
+    return client
+
+
+@pytest.fixture(scope="session")
+def queue_client(mongo_connector: MongoConnector) -> QueueClient:
+    """Make a QueueClient fixture"""
+    client = QueueClient(db_name=DB_NAME, connector=mongo_connector)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(client.delete_docs())
+    loop.run_until_complete(client.set_index())
+    return client
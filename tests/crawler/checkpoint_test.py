@@ -0,0 +1,105 @@
+"""Test the checkpoints of the crawl runs"""
+
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from src.crawler.checkpoint import CrawlCheckpoint
+from src.mongo import RunsClient
+
+LISTING_URL = "https://localhost/test_url/listing"
+
+
+@pytest.mark.asyncio
+async def test_checkpoint(
+    runs_client: RunsClient, mocker: MockerFixture
+) -> None:
+    """Test the cursor and the batched writes of the checkpoint"""
+    await runs_client.delete_docs()
+    save = mocker.spy(runs_client, "save_checkpoint")
+    checkpoint = await CrawlCheckpoint.open(runs_client, LISTING_URL)
+    checkpoint.batch_size = 2
+    checkpoint.interval = 3600
+    assert checkpoint.cursor == LISTING_URL
+
+    # The cursor stays at the oldest listing page in progress
+    assert checkpoint.listed(LISTING_URL, ["a", "b"]) == ["a", "b"]
+    assert checkpoint.listed(f"{LISTING_URL}/2", ["c"]) == ["c"]
+    await checkpoint.done("a")
+    await checkpoint.done("c")
+    assert checkpoint.cursor == LISTING_URL
+    # Failed pages are done but not completed
+    await checkpoint.done("b", completed=False)
+    assert checkpoint.cursor == f"{LISTING_URL}/2"
+
+    # Completed pages are written in batches
+    assert save.call_count == 1
+    run = await runs_client.find_unfinished_run()
+    assert run["completed"] == ["a", "c"]
+    assert run["listing_url"] == LISTING_URL
+
+    # Resuming skips the completed pages
+    await checkpoint.flush()
+    resumed = await CrawlCheckpoint.open(runs_client, LISTING_URL, True)
+    assert resumed.run_id == checkpoint.run_id
+    assert resumed.cursor == f"{LISTING_URL}/2"
+    assert resumed.listed(f"{LISTING_URL}/2", ["c", "d"]) == ["d"]
+
+    # Finished runs are not resumed
+    await resumed.finish({})
+    new = await CrawlCheckpoint.open(runs_client, LISTING_URL, True)
+    assert new.run_id != checkpoint.run_id
+    assert new.cursor == LISTING_URL
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_expected_pages(runs_client: RunsClient) -> None:
+    """Test the cursor with listing pages fetched concurrently"""
+    await runs_client.delete_docs()
+    checkpoint = await CrawlCheckpoint.open(runs_client, LISTING_URL)
+    checkpoint.listed(LISTING_URL, ["a"])
+    checkpoint.expect([f"{LISTING_URL}/2", f"{LISTING_URL}/3"])
+    await checkpoint.done("a")
+    # Scheduled pages not listed yet hold the cursor, in pagination order
+    checkpoint.listed(f"{LISTING_URL}/3", ["c"])
+    assert checkpoint.cursor == f"{LISTING_URL}/2"
+    checkpoint.listed(f"{LISTING_URL}/2", [])
+    assert checkpoint.cursor == f"{LISTING_URL}/3"
+    await checkpoint.done("c")
+    assert checkpoint.cursor == f"{LISTING_URL}/3"
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_failed_listing(runs_client: RunsClient) -> None:
+    """Test a listing page that failed holds the cursor"""
+    await runs_client.delete_docs()
+    checkpoint = await CrawlCheckpoint.open(runs_client, LISTING_URL)
+    checkpoint.listed(LISTING_URL, ["a"])
+    checkpoint.expect([f"{LISTING_URL}/2", f"{LISTING_URL}/3"])
+    checkpoint.failed(f"{LISTING_URL}/2")
+    checkpoint.listed(f"{LISTING_URL}/3", [])
+    await checkpoint.done("a")
+    assert checkpoint.cursor == f"{LISTING_URL}/2"
+    assert not checkpoint.complete
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_concurrent_done(
+    runs_client: RunsClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test pages done while a checkpoint is written are batched once"""
+    await runs_client.delete_docs()
+    checkpoint = await CrawlCheckpoint.open(runs_client, LISTING_URL)
+    checkpoint.batch_size = 2
+    checkpoint.interval = 3600
+    batches = []
+
+    async def save_checkpoint(run_id, listing_url, completed):
+        # pylint: disable=unused-argument
+        batches.append(completed)
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(runs_client, "save_checkpoint", save_checkpoint)
+    await asyncio.gather(*[checkpoint.done(url) for url in "abcde"])
+    assert batches == [["a", "b"], ["c", "d"]]
@@ -1,14 +1,25 @@
 """Test the CNMVCrawler methods"""
 
+import asyncio
+import json
+import time
 from contextlib import asynccontextmanager
-from typing import List
+from datetime import date
+from pathlib import Path
 
 import aiohttp
 import pytest
+from aiohttp import web
 from bs4 import BeautifulSoup
 
 from src.crawler.cnmv import CNMVCrawler
-from src.data_classes import ContentTypes, DataTypes
+from src.crawler.http_cache import HttpCache
+from src.crawler.incremental import url_slice
+from src.crawler.retry import RetryPolicy
+from src.crawler.session import PoolConfig, build_session
+from src.data_classes import ContentTypes
+from src.mongo import RunsClient
+from tests.benchmarks.bench_utils import serve
 from tests.test_utils import (
     ATTEMPTS,
     ENTRY_PAGE1,
@@ -23,10 +34,13 @@ class MockResponse:
     # pylint: disable=too-few-public-methods
     """MockResponse class to mock a response from a page"""
 
-    def __init__(self, content: str, status: int = 200) -> None:
+    def __init__(
+        self, content: str, status: int = 200, headers: dict = None
+    ) -> None:
         """Initialise the relevant response parameters"""
         self.content = content
         self.status = status
+        self.headers = headers if headers is not None else {}
 
     async def text(self):
         """
@@ -49,6 +63,16 @@ async def mock_entry_page_request_fail(*args, **kwargs):
     yield MockResponse(SAMPLE_FILES["success_entry1"], status=404)
 
 
+@asynccontextmanager
+async def mock_entry_page_request_cached(*args, headers=None, **kwargs):
+    # pylint: disable=unused-argument
+    """Mock a server answering 304 when the validators are sent"""
+    if headers and headers.get("If-None-Match") == '"v1"':
+        yield MockResponse("", status=304)
+        return
+    yield MockResponse(SAMPLE_FILES["success_entry1"], headers={"ETag": '"v1"'})
+
+
 @asynccontextmanager
 async def mock_listing_request_fail(*args, **kwargs):
     # pylint: disable=unused-argument
@@ -60,7 +84,7 @@ async def mock_listing_request_fail(*args, **kwargs):
 async def mock_listing_request_empty(*args, **kwargs):
     # pylint: disable=unused-argument
     """Mock a successful request to an empty listing page"""
-    yield MockResponse(SAMPLE_FILES["empty_list_page"], status=404)
+    yield MockResponse(SAMPLE_FILES["empty_list_page"])
 
 
 @asynccontextmanager
@@ -70,11 +94,11 @@ async def mock_listing_request(*args, **kwargs):
     yield MockResponse(SAMPLE_FILES["success_list_page"])
 
 
-async def mock_get_list_content(*args, **kwargs):
+async def mock_get_last_list_content(*args, **kwargs):
     # pylint: disable=unused-argument
-    """Mock the behaviour of the _get_list_content page"""
+    """Mock the behaviour of the _get_list_content for the last page"""
     return ContentTypes(
-        "Next Page",
+        "",
         [
             "https://localhost/test_url/process_page1",
             "https://localhost/test_url/process_page2",
@@ -82,16 +106,12 @@ async def mock_get_list_content(*args, **kwargs):
     )
 
 
-async def mock_transformed_results(*args, **kwargs):
+async def mock_fetch_page(url, *args, **kwargs):
     # pylint: disable=unused-argument
-    """Mock the behaviour of the _get_list_content page"""
-    return [ENTRY_PAGE1, ENTRY_PAGE1]
-
-
-async def mock_crawl_and_transform(*args, **kwargs):
-    # pylint: disable=unused-argument
-    """Mock the behaviour of the crawl_and_transform method"""
-    return [ENTRY_PAGE1, ENTRY_PAGE2], ContentTypes()
+    """Mock the behaviour of the _fetch_page method"""
+    if url.endswith("process_page1"):
+        return SAMPLE_FILES["success_entry1"]
+    return SAMPLE_FILES["success_entry2"]
 
 
 def test_get_next_page(cnmv_crawler: CNMVCrawler) -> None:
@@ -124,6 +144,41 @@ def test_get_next_page(cnmv_crawler: CNMVCrawler) -> None:
     assert next_page == "Next Page"
 
 
+def test_get_page_range(cnmv_crawler: CNMVCrawler) -> None:
+    """Test the _get_page_range method"""
+    listing_url = "https://www.cnmv.es/Portal/Consultas/MostrarListados.aspx"
+
+    # Test a listing page without the maincontent section
+    soup = BeautifulSoup(SAMPLE_FILES["empty_list_page"], "html.parser")
+    assert cnmv_crawler._get_page_range(soup, INITIAL_URL) == []
+
+    # Test a listing page without the text below the pagination
+    soup = BeautifulSoup(SAMPLE_FILES["no_pagination_list_page"], "html.parser")
+    assert cnmv_crawler._get_page_range(soup, INITIAL_URL) == []
+
+    # The range comes from the text below the pagination
+    soup = BeautifulSoup(SAMPLE_FILES["success_list_page"], "html.parser")
+    pages = cnmv_crawler._get_page_range(soup, INITIAL_URL)
+    assert len(pages) == 27
+    assert pages[0] == f"{listing_url}?id=18&page=1"
+    assert pages[-1] == f"{listing_url}?id=18&page=27"
+
+    # Or from the link to the last page
+    soup = BeautifulSoup(
+        '<section id="maincontent"><ul class="pagination">'
+        '<li><span class="active">3</span></li>'
+        f'<li><a href="{listing_url}?id=18&amp;page=5"'
+        ' title="Ir a la última página">»</a></li></ul></section>',
+        "html.parser",
+    )
+    pages = cnmv_crawler._get_page_range(soup, f"{listing_url}?id=18&page=2")
+    assert pages == [
+        f"{listing_url}?id=18&page=3",
+        f"{listing_url}?id=18&page=4",
+        f"{listing_url}?id=18&page=5",
+    ]
+
+
 def test_get_all_urls(cnmv_crawler: CNMVCrawler) -> None:
     """Test the _get_next_page method"""
     # Test a listing page without the maincontent section
@@ -177,11 +232,10 @@ async def test_get_list_content(
     async with aiohttp.ClientSession() as session:
         # Mock request with response.status != 200
         monkeypatch.setattr(session, "get", mock_listing_request_fail)
-        content: ContentTypes = await cnmv_crawler._get_list_content(
+        content = await cnmv_crawler._get_list_content(
             INITIAL_URL, session, attempts=int(ATTEMPTS)
         )
-        assert content.next_page == ""
-        assert content.urls == []
+        assert content is None
 
         # Mock a request with empty html
         monkeypatch.setattr(session, "get", mock_listing_request_empty)
@@ -201,69 +255,431 @@ async def test_get_list_content(
             "https://localhost/test_url/process_page1",
             "https://localhost/test_url/process_page2",
         ]
+        assert len(content.pages) == 27
 
 
 @pytest.mark.asyncio
-async def test_get_transformed_results(
+async def test_fetch_and_parse_stages(
     monkeypatch: pytest.MonkeyPatch, cnmv_crawler: CNMVCrawler
 ) -> None:
-    """Test the _get_transformed_results method inside the crawler"""
-    monkeypatch.setenv("ATTEMPT_WAIT", "0")
+    """Test the fetch and parse stages of the crawling pipeline"""
+    url = "https://localhost/test_url/process_page1"
+    emitted = []
+
+    async def emit(item, stage_name=None):
+        # pylint: disable=unused-argument
+        emitted.append(item)
+
     async with aiohttp.ClientSession() as session:
-        urls = [
-            "https://localhost/test_url/process_page1",
-            "https://localhost/test_url/process_page2",
-        ]
-        # Getting a failed response from the _get_transformed_results method
+        # Failed requests emit nothing
         monkeypatch.setattr(session, "get", mock_entry_page_request_fail)
-        results: List[DataTypes] = await cnmv_crawler._get_transformed_results(
-            urls, session
-        )
-        assert len(results) == 0
+        await cnmv_crawler._fetch_stage(session, url, emit)
+        assert not emitted
 
-        # Getting a successful response from the _get_transformed_results method
         monkeypatch.setattr(session, "get", mock_entry_page_request)
-        results: List[DataTypes] = await cnmv_crawler._get_transformed_results(
-            urls, session
-        )
-        assert len(results) == 2
-        assert results[0] == results[1] == ENTRY_PAGE1
+        await cnmv_crawler._fetch_stage(session, url, emit)
+        assert emitted == [(url, SAMPLE_FILES["success_entry1"])]
+
+    # The transformed result is emitted along with its source page
+    await cnmv_crawler._parse_stage(emitted.pop(), emit)
+    assert len(emitted) == 1
+    page_url, result, source = emitted[0]
+    assert page_url == source.url == url
+    assert result == ENTRY_PAGE1
+
+
+def mock_flaky_request(failures):
+    """Mock a server failing with the given statuses or errors first"""
+    failures = list(failures)
+
+    @asynccontextmanager
+    async def request(*args, **kwargs):
+        # pylint: disable=unused-argument
+        if failures:
+            failure = failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            yield MockResponse("", status=failure, headers={"Retry-After": "0"})
+            return
+        yield MockResponse(SAMPLE_FILES["success_entry1"])
+
+    return request
 
 
 @pytest.mark.asyncio
-async def test_crawl_and_transform(
+async def test_request_retries(
     monkeypatch: pytest.MonkeyPatch, cnmv_crawler: CNMVCrawler
 ) -> None:
-    """Test the crawl_and_transform method inside the crawler"""
+    """Test the _request method following the retry policy"""
+    cnmv_crawler.retry_policy = RetryPolicy(attempts=3, base_wait=0)
+    cnmv_crawler.metrics.reset()
+    url = "https://localhost/test_url/process_page1"
     async with aiohttp.ClientSession() as session:
-        # Mock a successful request with next page and urls
-        monkeypatch.setattr(
-            cnmv_crawler, "_get_list_content", mock_get_list_content
+        # Server errors and connection errors are retried
+        failures = [503, aiohttp.ServerDisconnectedError()]
+        monkeypatch.setattr(session, "get", mock_flaky_request(failures))
+        page = await cnmv_crawler._request(url, session)
+        assert page.status == 200
+        assert page.text == SAMPLE_FILES["success_entry1"]
+
+        # We give up after the last attempt
+        failures = [503, asyncio.TimeoutError(), 502]
+        monkeypatch.setattr(session, "get", mock_flaky_request(failures))
+        assert await cnmv_crawler._request(url, session) is None
+
+        # Client errors are not retried
+        monkeypatch.setattr(session, "get", mock_flaky_request([404]))
+        assert await cnmv_crawler._request(url, session) is None
+
+        # Unexpected errors are raised
+        failures = [ValueError("Unexpected")]
+        monkeypatch.setattr(session, "get", mock_flaky_request(failures))
+        with pytest.raises(ValueError):
+            await cnmv_crawler._request(url, session)
+
+        # No attempt is made after the deadline
+        cnmv_crawler.retry_policy = RetryPolicy(base_wait=1, deadline=0.5)
+        monkeypatch.setattr(session, "get", mock_flaky_request([503]))
+        assert await cnmv_crawler._request(url, session) is None
+    assert cnmv_crawler.stats["retries"] == 4
+    assert cnmv_crawler.metrics.counters["retries"] == 4
+
+
+@pytest.mark.asyncio
+async def test_request_read_timeout(cnmv_crawler: CNMVCrawler) -> None:
+    """Test a slow read times out at the read timeout of the session"""
+
+    async def slow_page(request: web.Request) -> web.Response:
+        # pylint: disable=unused-argument
+        await asyncio.sleep(2)
+        return web.Response(text=SAMPLE_FILES["success_entry1"])
+
+    app = web.Application()
+    app.router.add_get("/slow", slow_page)
+    cnmv_crawler.retry_policy = RetryPolicy(attempts=1, deadline=30)
+    async with serve(app) as base_url, build_session(
+        PoolConfig(read_timeout=0.1)
+    ) as session:
+        start = time.perf_counter()
+        assert await cnmv_crawler._request(f"{base_url}/slow", session) is None
+        assert time.perf_counter() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_cached(
+    monkeypatch: pytest.MonkeyPatch, cnmv_crawler: CNMVCrawler, tmp_path: Path
+) -> None:
+    """Test the _fetch_page method with conditional requests"""
+    cnmv_crawler.http_cache = HttpCache(tmp_path)
+    cnmv_crawler.metrics.reset()
+    url = "https://localhost/test_url/process_page1"
+    async with aiohttp.ClientSession() as session:
+        monkeypatch.setattr(session, "get", mock_entry_page_request_cached)
+        # The first request fills the cache, the second one gets a 304
+        for _ in range(2):
+            html = await cnmv_crawler._fetch_page(url, session)
+            assert html == SAMPLE_FILES["success_entry1"]
+        # Servers ignoring the validators send the same body again
+        monkeypatch.setattr(session, "get", mock_entry_page_request)
+        html = await cnmv_crawler._fetch_page(url, session)
+        assert html == SAMPLE_FILES["success_entry1"]
+    assert cnmv_crawler.http_cache.stats == {
+        "misses": 1,
+        "not_modified": 1,
+        "unchanged": 1,
+    }
+    assert cnmv_crawler.metrics.counters["pages_not_modified"] == 2
+
+
+@pytest.mark.asyncio
+async def test_write_results(
+    monkeypatch: pytest.MonkeyPatch, cnmv_crawler: CNMVCrawler
+) -> None:
+    """Test the _write_results method saving a batch of results"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    items = [
+        ("https://localhost/test_url/process_page1", ENTRY_PAGE1, None),
+        ("https://localhost/test_url/process_page2", ENTRY_PAGE2, None),
+    ]
+    assert await cnmv_crawler._write_results(items) is True
+    assert cnmv_crawler.stats == {"saved": 2}
+    assert await cnmv_crawler.mongo_client.get_n_docs() == 2
+
+    # Results that couldn't be saved are reported
+    async def set_data_bulk(*args, **kwargs):
+        # pylint: disable=unused-argument
+        raise ValueError("Unavailable")
+
+    monkeypatch.setattr(
+        cnmv_crawler.mongo_client, "set_data_bulk", set_data_bulk
+    )
+    assert await cnmv_crawler._write_results(items) is False
+    assert cnmv_crawler.stats == {"saved": 2, "save_failures": 2}
+
+
+@pytest.mark.asyncio
+async def test_crawl_and_save(
+    monkeypatch: pytest.MonkeyPatch, cnmv_crawler: CNMVCrawler
+) -> None:
+    """Test the crawl_and_save method inside the crawler"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    monkeypatch.setattr(
+        cnmv_crawler, "_get_list_content", mock_get_last_list_content
+    )
+    monkeypatch.setattr(cnmv_crawler, "_fetch_page", mock_fetch_page)
+    await cnmv_crawler.crawl_and_save()
+
+    # Both entries went through the fetch, parse and persist stages
+    assert await cnmv_crawler.mongo_client.get_n_docs() == 2
+    for entry in [ENTRY_PAGE1, ENTRY_PAGE2]:
+        document = await cnmv_crawler.mongo_client.find_entry(
+            {"isin": entry.isin}
         )
-        monkeypatch.setattr(
-            cnmv_crawler, "_get_transformed_results", mock_transformed_results
+        assert document["nombre"] == entry.nombre
+        assert document["content_hash"]
+    assert cnmv_crawler.stats == {"saved": 2}
+
+    # Unchanged pages are only counted as seen the next time
+    await cnmv_crawler.crawl_and_save()
+    assert cnmv_crawler.stats == {"seen": 2}
+
+
+@pytest.mark.asyncio
+async def test_crawl_and_save_metrics(
+    monkeypatch: pytest.MonkeyPatch,
+    cnmv_crawler: CNMVCrawler,
+    metrics_dir: Path,
+) -> None:
+    """Test the metrics written at the end of a run"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    monkeypatch.setattr(
+        cnmv_crawler, "_get_list_content", mock_get_last_list_content
+    )
+    monkeypatch.setattr(cnmv_crawler, "_fetch_page", mock_fetch_page)
+    await cnmv_crawler.crawl_and_save()
+
+    summary = json.loads((metrics_dir / "cnmv_crawler.json").read_text())
+    assert summary["counters"] == {"inserts": 2}
+    for name in ["parse", "diff", "write"]:
+        assert summary["histograms"][name]["count"] == 2
+    text = (metrics_dir / "cnmv_crawler.prom").read_text()
+    assert "cnmv_inserts_total 2" in text
+
+    # The pages whose hash didn't change are counted without parsing them
+    await cnmv_crawler.crawl_and_save()
+    summary = json.loads((metrics_dir / "cnmv_crawler.json").read_text())
+    assert summary["counters"] == {"unchanged": 2}
+    assert "parse" not in summary["histograms"]
+
+
+@pytest.mark.asyncio
+async def test_run_context(
+    cnmv_crawler: CNMVCrawler, metrics_dir: Path
+) -> None:
+    """Test a run starts from a clean state and is wrapped up if it fails"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    url = "https://localhost/test_url/process_page1"
+    cnmv_crawler.stats["saved"] = 1
+    cnmv_crawler.seen_urls = [url]
+    with pytest.raises(ValueError):
+        async with cnmv_crawler.run_context("run") as session:
+            assert isinstance(session, aiohttp.ClientSession)
+            assert not cnmv_crawler.stats
+            assert not cnmv_crawler.seen_urls
+            cnmv_crawler.stats["seen"] += 1
+            raise ValueError("Interrupted")
+    assert cnmv_crawler.mongo_client.snapshot is None
+    summary = json.loads((metrics_dir / "run.json").read_text())
+    assert not summary["counters"]
+
+
+@pytest.mark.asyncio
+async def test_crawl_and_save_pagination(
+    monkeypatch: pytest.MonkeyPatch, cnmv_crawler: CNMVCrawler
+) -> None:
+    """Test every listing page of a known range is fetched once"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    pages = [f"{INITIAL_URL}?page={index}" for index in range(1, 4)]
+    listed = []
+
+    async def get_list_content(url, *args, **kwargs):
+        # pylint: disable=unused-argument
+        listed.append(url)
+        if url not in pages:
+            return ContentTypes(
+                pages[0], [f"{INITIAL_URL}process_page1"], pages
+            )
+        # Every page knows the range, and the last one has no next page
+        index = pages.index(url)
+        return ContentTypes(
+            pages[index + 1] if index + 1 < len(pages) else "",
+            [f"{INITIAL_URL}process_page2"] if index == 0 else [],
+            pages[index + 1 :],
         )
-        transformed, content = await cnmv_crawler.crawl_and_transform(
-            INITIAL_URL, session
+
+    monkeypatch.setattr(cnmv_crawler, "_get_list_content", get_list_content)
+    monkeypatch.setattr(cnmv_crawler, "_fetch_page", mock_fetch_page)
+    await cnmv_crawler.crawl_and_save()
+    assert sorted(listed[1:]) == pages
+    assert cnmv_crawler.stats == {"saved": 2}
+
+
+@pytest.mark.asyncio
+async def test_crawl_and_save_resume(
+    monkeypatch: pytest.MonkeyPatch,
+    cnmv_crawler: CNMVCrawler,
+    runs_client: RunsClient,
+) -> None:
+    """Test resuming an interrupted run from its checkpoint"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    await runs_client.delete_docs()
+    cnmv_crawler.runs_client = runs_client
+    fetched = []
+
+    async def fetch_page(url, *args, **kwargs):
+        fetched.append(url)
+        return await mock_fetch_page(url, *args, **kwargs)
+
+    monkeypatch.setattr(
+        cnmv_crawler, "_get_list_content", mock_get_last_list_content
+    )
+    monkeypatch.setattr(cnmv_crawler, "_fetch_page", fetch_page)
+
+    # A previous run was interrupted after completing the first page
+    run = await runs_client.start_run(INITIAL_URL)
+    completed = ["https://localhost/test_url/process_page1"]
+    await runs_client.save_checkpoint(run["run_id"], INITIAL_URL, completed)
+
+    await cnmv_crawler.crawl_and_save(resume=True)
+    assert fetched == ["https://localhost/test_url/process_page2"]
+    assert cnmv_crawler.stats == {"saved": 1}
+    assert await runs_client.find_unfinished_run() is None
+    run = await runs_client.get_collection().find_one({})
+    assert run["status"] == "finished"
+    assert sorted(run["completed"]) == [
+        "https://localhost/test_url/process_page1",
+        "https://localhost/test_url/process_page2",
+    ]
+
+    # Without resume a new run crawls every page
+    fetched.clear()
+    await cnmv_crawler.crawl_and_save()
+    assert len(fetched) == 2
+
+
+@pytest.mark.asyncio
+async def test_crawl_and_save_resume_listing_failure(
+    monkeypatch: pytest.MonkeyPatch,
+    cnmv_crawler: CNMVCrawler,
+    runs_client: RunsClient,
+) -> None:
+    """Test a run with a listing page that failed is resumed from it"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    await runs_client.delete_docs()
+    cnmv_crawler.runs_client = runs_client
+    second_page = f"{INITIAL_URL}?page=1"
+    failing = [second_page]
+    fetched = []
+
+    async def get_list_content(url, *args, **kwargs):
+        # pylint: disable=unused-argument
+        if url in failing:
+            return None
+        if url == second_page:
+            return ContentTypes("", [f"{INITIAL_URL}process_page2"])
+        return ContentTypes(
+            second_page, [f"{INITIAL_URL}process_page1"], [second_page]
         )
 
-        assert transformed == await mock_transformed_results()
-        assert content == await mock_get_list_content()
+    async def fetch_page(url, *args, **kwargs):
+        fetched.append(url)
+        return await mock_fetch_page(url, *args, **kwargs)
+
+    monkeypatch.setattr(cnmv_crawler, "_get_list_content", get_list_content)
+    monkeypatch.setattr(cnmv_crawler, "_fetch_page", fetch_page)
+
+    # The run isn't finished and its cursor stays at the failed page
+    await cnmv_crawler.crawl_and_save()
+    assert fetched == [f"{INITIAL_URL}process_page1"]
+    assert cnmv_crawler.stats == {"saved": 1, "listing_failures": 1}
+    run = await runs_client.find_unfinished_run()
+    assert run["listing_url"] == second_page
+
+    # Resuming retries the failed page and finishes the run
+    failing.clear()
+    fetched.clear()
+    await cnmv_crawler.crawl_and_save(resume=True)
+    assert fetched == [f"{INITIAL_URL}process_page2"]
+    assert await runs_client.find_unfinished_run() is None
 
 
 @pytest.mark.asyncio
-async def test_save_results(cnmv_crawler: CNMVCrawler) -> None:
-    """Test the save_results method inside the crawler"""
-    saved = await cnmv_crawler.save_results([ENTRY_PAGE1, ENTRY_PAGE2])
-    assert saved is True
+async def test_crawl_and_save_incremental(
+    monkeypatch: pytest.MonkeyPatch,
+    cnmv_crawler: CNMVCrawler,
+    runs_client: RunsClient,
+) -> None:
+    """Test incremental crawls only fetch new pages and the daily slice"""
+    await cnmv_crawler.mongo_client.delete_docs()
+    await runs_client.delete_docs()
+    urls = (await mock_get_last_list_content()).urls
+    fetched = []
+
+    async def fetch_page(url, *args, **kwargs):
+        fetched.append(url)
+        return await mock_fetch_page(url, *args, **kwargs)
+
+    monkeypatch.setattr(
+        cnmv_crawler, "_get_list_content", mock_get_last_list_content
+    )
+    monkeypatch.setattr(cnmv_crawler, "_fetch_page", fetch_page)
+
+    # Every page is new the first time
+    await cnmv_crawler.crawl_and_save(mode="incremental")
+    assert sorted(fetched) == urls
+
+    # Then only the known pages in the slice of the day are fetched
+    fetched.clear()
+    await cnmv_crawler.crawl_and_save(mode="incremental")
+    slices = cnmv_crawler.selector.slices
+    expected = [
+        url
+        for url in urls
+        if url_slice(url, slices) == date.today().toordinal() % slices
+    ]
+    assert sorted(fetched) == expected
+    assert cnmv_crawler.stats["skipped"] == len(urls) - len(expected)
+
+    # Incremental crawls are full until a full crawl finished recently
+    cnmv_crawler.runs_client = runs_client
+    fetched.clear()
+    await cnmv_crawler.crawl_and_save(mode="incremental")
+    assert sorted(fetched) == urls
+    run = await runs_client.find_last_finished_run("full")
+    assert run is not None
+    fetched.clear()
+    await cnmv_crawler.crawl_and_save(mode="incremental")
+    assert sorted(fetched) == expected
 
 
 @pytest.mark.asyncio
-async def test_crawl_and_save(
+async def test_crawl_and_save_priority(
     monkeypatch: pytest.MonkeyPatch, cnmv_crawler: CNMVCrawler
 ) -> None:
-    """Test the crawl_and_save method inside the crawler"""
+    """Test priority crawls and the last fetch of unchanged pages"""
+    await cnmv_crawler.mongo_client.delete_docs()
     monkeypatch.setattr(
-        cnmv_crawler, "crawl_and_transform", mock_crawl_and_transform
+        cnmv_crawler, "_get_list_content", mock_get_last_list_content
     )
+    monkeypatch.setattr(cnmv_crawler, "_fetch_page", mock_fetch_page)
     await cnmv_crawler.crawl_and_save()
+    history = await cnmv_crawler.mongo_client.find_refresh_history()
+    fetched = {entry["source_url"]: entry["last_fetched"] for entry in history}
+
+    # Both pages fit in the budget, and their last fetch is updated although
+    # they didn't change
+    await cnmv_crawler.crawl_and_save(mode="priority")
+    assert cnmv_crawler.stats == {"seen": 2}
+    history = await cnmv_crawler.mongo_client.find_refresh_history()
+    for entry in history:
+        assert entry["last_fetched"] > fetched[entry["source_url"]]
@@ -0,0 +1,136 @@
+"""Test the distributed crawls with the work queue"""
+
+import asyncio
+
+import pytest
+
+from src.crawler import MAPPING, CNMVCrawler, DataPipeline
+from src.crawler.distributed import ENTRY, QueueCoordinator, QueueWorker
+from src.data_classes import ContentTypes
+from src.mongo import DataClient, QueueClient
+from tests.test_utils import INITIAL_URL, SAMPLE_FILES
+
+PAGES = {
+    INITIAL_URL: ContentTypes(
+        f"{INITIAL_URL}?page=1",
+        [f"{INITIAL_URL}process_page1", f"{INITIAL_URL}process_page2"],
+    ),
+    f"{INITIAL_URL}?page=1": ContentTypes(
+        "",
+        [
+            f"{INITIAL_URL}process_page2",
+            f"{INITIAL_URL}process_page3",
+            f"{INITIAL_URL}process_page4",
+        ],
+    ),
+}
+
+
+@pytest.mark.asyncio
+async def test_distributed_crawl(
+    monkeypatch: pytest.MonkeyPatch,
+    data_client: DataClient,
+    queue_client: QueueClient,
+) -> None:
+    """Test a coordinator and two workers crawl every page once"""
+    await data_client.delete_docs()
+    fetched = []
+    listed = []
+
+    async def get_list_content(url, *args, **kwargs):
+        # pylint: disable=unused-argument
+        listed.append(url)
+        # The second listing page fails the first time
+        if url != INITIAL_URL and listed.count(url) == 1:
+            return None
+        return PAGES[url]
+
+    async def fetch_page(url, *args, **kwargs):
+        # pylint: disable=unused-argument
+        fetched.append(url)
+        if url.endswith("process_page1"):
+            return SAMPLE_FILES["success_entry1"]
+        if url.endswith("process_page3"):
+            return None
+        if url.endswith("process_page4"):
+            return SAMPLE_FILES["empty_entry1"]
+        return SAMPLE_FILES["success_entry2"]
+
+    workers = []
+    for worker_id in ["worker1", "worker2"]:
+        crawler = CNMVCrawler(data_client, DataPipeline(MAPPING), INITIAL_URL)
+        monkeypatch.setattr(crawler, "_get_list_content", get_list_content)
+        monkeypatch.setattr(crawler, "_fetch_page", fetch_page)
+        workers.append(
+            QueueWorker(
+                crawler,
+                queue_client,
+                worker_id,
+                concurrency=2,
+                max_attempts=2,
+                poll_seconds=0.01,
+            )
+        )
+    coordinator = QueueCoordinator(queue_client, INITIAL_URL, 0.01)
+
+    counts, *_ = await asyncio.gather(
+        coordinator.run(), *[worker.run() for worker in workers]
+    )
+    assert counts == {"queued": 0, "leased": 0, "done": 4, "failed": 2}
+    # Pages failing to be fetched or transformed are retried, the others are
+    # fetched once
+    assert sorted(listed) == [INITIAL_URL] + [f"{INITIAL_URL}?page=1"] * 2
+    assert sorted(fetched) == [
+        f"{INITIAL_URL}process_page1",
+        f"{INITIAL_URL}process_page2",
+        f"{INITIAL_URL}process_page3",
+        f"{INITIAL_URL}process_page3",
+        f"{INITIAL_URL}process_page4",
+        f"{INITIAL_URL}process_page4",
+    ]
+    assert await data_client.get_n_docs() == 2
+    saved = sum(worker.crawler.stats["saved"] for worker in workers)
+    assert saved == 2
+
+
+@pytest.mark.asyncio
+async def test_distributed_crawl_next_generation(
+    monkeypatch: pytest.MonkeyPatch,
+    data_client: DataClient,
+    queue_client: QueueClient,
+) -> None:
+    """Test a worker started before the coordinator waits for its crawl"""
+    await data_client.delete_docs()
+    # Items processed by a previous crawl
+    await queue_client.start()
+    await queue_client.enqueue(ENTRY, [f"{INITIAL_URL}process_page1"], 1)
+    await queue_client.complete(
+        "worker1", (await queue_client.claim("worker1", 60))["url"]
+    )
+    await queue_client.activate(False)
+
+    async def get_list_content(url, *args, **kwargs):
+        # pylint: disable=unused-argument
+        return (
+            PAGES[INITIAL_URL] if url == INITIAL_URL else ContentTypes("", [])
+        )
+
+    async def fetch_page(url, *args, **kwargs):
+        # pylint: disable=unused-argument
+        return SAMPLE_FILES["success_entry1"]
+
+    crawler = CNMVCrawler(data_client, DataPipeline(MAPPING), INITIAL_URL)
+    monkeypatch.setattr(crawler, "_get_list_content", get_list_content)
+    monkeypatch.setattr(crawler, "_fetch_page", fetch_page)
+    worker = asyncio.create_task(
+        QueueWorker(crawler, queue_client, "worker1", poll_seconds=0.01).run()
+    )
+    await asyncio.sleep(0.05)
+    assert not worker.done()
+
+    coordinator = QueueCoordinator(queue_client, INITIAL_URL, 0.01)
+    counts = await coordinator.run()
+    await worker
+    assert counts == {"queued": 0, "leased": 0, "done": 4, "failed": 0}
+    # The entry page done in the previous crawl is processed again
+    assert crawler.stats["saved"] == 2
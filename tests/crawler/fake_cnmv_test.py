@@ -0,0 +1,42 @@
+"""Test the CNMV stand-in with the crawler"""
+
+import pytest
+
+from src.crawler import MAPPING, CNMVCrawler, DataPipeline
+from src.crawler.retry import RetryPolicy
+from src.crawler.scheduler import RequestScheduler
+from src.mongo import DataClient
+from tests.benchmarks.bench_utils import serve
+from tests.benchmarks.fake_cnmv import (
+    STATS_KEY,
+    FakeConfig,
+    build_app,
+    listing_url,
+)
+
+
+@pytest.mark.asyncio
+async def test_crawl_fake_cnmv(data_client: DataClient) -> None:
+    """Test a crawl of the stand-in stores every SICAV despite the faults"""
+    await data_client.delete_docs()
+    app = build_app(FakeConfig(sicavs=25, page_size=10, error_rate=0.1))
+    async with serve(app) as base_url:
+        crawler = CNMVCrawler(
+            data_client,
+            DataPipeline(MAPPING),
+            listing_url(base_url),
+            scheduler=RequestScheduler(requests_per_second=0),
+            retry_policy=RetryPolicy(attempts=10, base_wait=0),
+        )
+        await crawler.crawl_and_save()
+
+    assert app[STATS_KEY]["listing"] == 3
+    assert app[STATS_KEY]["entry"] == 25
+    assert app[STATS_KEY]["errors"] > 0
+    assert crawler.stats["saved"] == 25
+    assert crawler.metrics.counters["pages_fetched"] == 25
+    assert crawler.metrics.counters["retries"] == app[STATS_KEY]["errors"]
+    assert crawler.metrics.histograms["fetch"].count == 25
+    assert await data_client.get_n_docs() == 25
+    document = await data_client.find_entry({"isin": "ES0000000244"})
+    assert document["nombre"] == "SYNTHETIC INVERSIONES 000024, SICAV S.A."
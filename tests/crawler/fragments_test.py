@@ -0,0 +1,42 @@
+"""Test the html fragment extraction methods"""
+
+from src.crawler.fragments import (
+    ENTRY_ELEMENTS,
+    content_hash,
+    extract_fragments,
+    find_element,
+)
+from tests.test_utils import SAMPLE_FILES
+
+
+def test_find_element() -> None:
+    """Test the find_element method"""
+    html = '<div id="a"><div class="x y"><div>1</div><br/></div></div><div>'
+    # Nested elements with the same tag are balanced
+    start, end = find_element(html, "div", "class", "y")
+    assert html[start:end] == '<div class="x y"><div>1</div><br/></div>'
+    # Missing elements
+    assert find_element(html, "div", "class", "z") is None
+    assert find_element(html, "p", "class", "y") is None
+    # Elements never closed end with the document
+    start, end = find_element(html, "div", "id", "a", start=1) or (0, 0)
+    assert (start, end) == (0, 0)
+    assert find_element("<p class='t'>text", "p", "class", "t") == (0, 17)
+
+
+def test_content_hash() -> None:
+    """Test the content_hash and extract_fragments methods"""
+    html = SAMPLE_FILES["success_entry1"]
+    fragments = extract_fragments(html, ENTRY_ELEMENTS)
+    assert fragments[0].startswith('<p id="ctl00_p_subtitulo"')
+    assert fragments[1].endswith("</div>")
+
+    # Formatting and content outside the fragments don't change the hash
+    page_hash = content_hash(html)
+    assert page_hash == content_hash(html.replace("    ", "\t"))
+    assert page_hash == content_hash(html.replace("aspnetForm", "form"))
+    # The content of the fragments does
+    assert page_hash != content_hash(SAMPLE_FILES["success_entry2"])
+    # Pages missing a fragment have no hash
+    assert content_hash(SAMPLE_FILES["no_titcont_entry1"]) is None
+    assert content_hash(SAMPLE_FILES["empty_entry1"]) is None
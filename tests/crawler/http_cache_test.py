@@ -0,0 +1,63 @@
+"""Test the HttpCache methods"""
+
+from pathlib import Path
+
+import pytest
+
+from src.crawler.http_cache import HttpCache, hash_body
+from tests.test_utils import SAMPLE_FILES
+
+
+@pytest.mark.asyncio
+async def test_store_and_get(tmp_path: Path) -> None:
+    """Test storing pages and sending their validators"""
+    cache = HttpCache(tmp_path)
+    url = "https://localhost/test_url/process_page1"
+    body = SAMPLE_FILES["success_entry1"]
+    assert await cache.get(url) is None
+    assert not cache.conditional_headers(None)
+
+    # First time we see the page
+    headers = {"ETag": '"v1"', "Last-Modified": "Mon, 02 Oct 2023 10:00:00"}
+    assert await cache.store(url, body, headers) is False
+    entry = await cache.get(url)
+    assert entry.body == body
+    assert entry.body_hash == hash_body(body)
+    assert cache.conditional_headers(entry) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 02 Oct 2023 10:00:00",
+    }
+    assert cache.revalidated(entry) == body
+
+    # The cache survives a restart
+    assert await HttpCache(tmp_path).get(url) == entry
+
+    # Servers ignoring the validators are covered by the body hash
+    assert await cache.store(url, body, {}, await cache.get(url)) is True
+    assert await cache.store(url, body + " ", {}, await cache.get(url)) is False
+    assert cache.stats == {
+        "misses": 1,
+        "not_modified": 1,
+        "unchanged": 1,
+        "changed": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_evict(tmp_path: Path) -> None:
+    """Test the least recently used pages are evicted first"""
+    body = SAMPLE_FILES["success_entry1"]
+    cache = HttpCache(tmp_path)
+    for index in range(3):
+        await cache.store(f"https://localhost/{index}", body, {})
+    # Only three pages fit in the cache
+    cache.max_bytes = cache.size
+    # Use the first page so the second one is the least recently used
+    assert await cache.get("https://localhost/0") is not None
+    await cache.store("https://localhost/3", body, {})
+
+    assert cache.size <= cache.max_bytes
+    assert await cache.get("https://localhost/1") is None
+    assert await cache.get("https://localhost/0") is not None
+    assert await cache.get("https://localhost/3") is not None
+    assert len(list(tmp_path.glob("*.json"))) == len(cache.index)
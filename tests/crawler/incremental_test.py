@@ -0,0 +1,42 @@
+"""Test the selection of the entry pages of incremental crawls"""
+
+import pytest
+
+from src.crawler.incremental import (
+    FULL,
+    INCREMENTAL,
+    IncrementalSelector,
+    url_slice,
+    validate_mode,
+)
+
+URLS = [f"https://localhost/test_url/process_page{i}" for i in range(100)]
+
+
+def test_validate_mode() -> None:
+    """Test the validate_mode method"""
+    assert validate_mode(FULL) == FULL
+    assert validate_mode(INCREMENTAL) == INCREMENTAL
+    with pytest.raises(ValueError):
+        validate_mode("partial")
+
+
+def test_incremental_selector() -> None:
+    """Test every known page is refreshed once over all the slices"""
+    known = set(URLS[:90])
+    refreshed = []
+    for slice_index in range(7):
+        selector = IncrementalSelector(known, slice_index, slices=7)
+        selected = selector.select(URLS)
+        # New pages are always selected
+        assert set(URLS[90:]) <= set(selected)
+        refreshed.extend(url for url in selected if url in known)
+        assert all(url_slice(url, 7) == slice_index for url in refreshed[-1:])
+    assert sorted(refreshed) == sorted(known)
+
+    # Slices are stable and the index wraps around
+    assert IncrementalSelector(known, 9, slices=7).select(URLS) == (
+        IncrementalSelector(known, 2, slices=7).select(URLS)
+    )
+    with pytest.raises(ValueError):
+        IncrementalSelector(known, 0, slices=0)
@@ -0,0 +1,160 @@
+"""Test the locale-free normalisers"""
+
+import locale
+import random
+from datetime import datetime
+from typing import Iterator, Tuple
+
+import pytest
+
+from src.crawler.normalizers import normalize_date, parse_number
+
+SEED = 20231018
+SAMPLES = 2000
+
+
+def random_numbers() -> Iterator[Tuple[float, str, str]]:
+    """
+    Random amounts with their English and Spanish representations, with and
+    without decimals
+    """
+    rng = random.Random(SEED)
+    for _ in range(SAMPLES):
+        digits = rng.choice([0, 2])
+        value = round(rng.uniform(0, 10 ** rng.randint(1, 12)), digits)
+        english = f"{value:,.{digits}f}"
+        spanish = english.translate(str.maketrans(",.", ".,"))
+        yield float(english.replace(",", "")), english, spanish
+
+
+def locale_atof(name: str, value: str) -> float:
+    """Parse the value with locale.atof under the given numeric locale"""
+    previous = locale.setlocale(locale.LC_NUMERIC)
+    try:
+        locale.setlocale(locale.LC_NUMERIC, name)
+        return locale.atof(value)
+    finally:
+        locale.setlocale(locale.LC_NUMERIC, previous)
+
+
+def locales_available() -> bool:
+    """Check whether the English and Spanish locales are installed"""
+    try:
+        locale_atof("en_US.utf8", "1")
+        locale_atof("es_ES.utf8", "1")
+    except locale.Error:
+        return False
+    return True
+
+
+def test_parse_number() -> None:
+    """Test the parse_number method"""
+    assert parse_number("18,045,092.98") == 18045092.98
+    assert parse_number("18.045.092,98") == 18045092.98
+    assert parse_number(" 2.400.000,00 ") == 2400000.0
+    assert parse_number("2.400.000") == 2400000.0
+    assert parse_number("2,400,000") == 2400000.0
+    assert parse_number("2,400") == 2400.0
+    assert parse_number("2.400") == 2.4
+    assert parse_number("123,45") == 123.45
+    assert parse_number("12") == 12.0
+    with pytest.raises(ValueError):
+        parse_number("")
+    with pytest.raises(ValueError):
+        parse_number("1.234,56,78")
+
+
+def test_parse_number_random() -> None:
+    """Test parse_number with random amounts in both formats"""
+    for value, english, spanish in random_numbers():
+        assert parse_number(english) == value, english
+        # A single dot is always decimal, as locale.atof in English
+        if spanish.count(".") == 1 and "," not in spanish:
+            continue
+        assert parse_number(spanish) == value, spanish
+
+
+@pytest.mark.skipif(not locales_available(), reason="locales not installed")
+def test_parse_number_locale() -> None:
+    """Test parse_number gives the results of locale.atof"""
+    for _, english, spanish in random_numbers():
+        assert parse_number(english) == locale_atof("en_US.utf8", english)
+        # A single dot is read as English, as process_capital used to do
+        if spanish.count(".") == 1 and "," not in spanish:
+            expected = locale_atof("en_US.utf8", spanish)
+        else:
+            expected = locale_atof("es_ES.utf8", spanish)
+        assert parse_number(spanish) == expected, spanish
+
+
+# Capitals as written in CNMV entry pages
+CNMV_CAPITALS = [
+    "1,000,000.00",
+    "10,000,000.00",
+    "18,045,092.98",
+    "1.000.000,00",
+    "10.000.000,00",
+    "2.400.000,00",
+    "18.045.092,98",
+    "240.000,00",
+    "1.234,56",
+]
+
+# Spanish amounts with a single thousands separator were read as English by
+# process_capital, so their dot was taken as the decimal separator
+PROCESS_CAPITAL_FIXES = {"240.000,00": 240.0, "1.234,56": 1.23456}
+
+
+def process_capital(capital: str) -> float:
+    """The locale based parser of the capitals used by previous versions"""
+    try:
+        return locale_atof("en_US.utf8", capital)
+    except ValueError:
+        return locale_atof("es_ES.utf8", capital)
+
+
+@pytest.mark.skipif(not locales_available(), reason="locales not installed")
+def test_parse_number_process_capital() -> None:
+    """Test parse_number against process_capital with CNMV capitals"""
+    for capital in CNMV_CAPITALS:
+        previous = process_capital(capital)
+        if capital in PROCESS_CAPITAL_FIXES:
+            assert previous == PROCESS_CAPITAL_FIXES[capital], capital
+            assert parse_number(capital) == float(
+                capital.replace(".", "").replace(",", ".")
+            )
+        else:
+            assert parse_number(capital) == previous, capital
+
+
+def strptime_date(date: str) -> str:
+    """Convert the date with strptime, returning the error type if it fails"""
+    try:
+        return datetime.strptime(date, r"%d/%m/%Y").strftime("%Y-%m-%d")
+    except ValueError as err:
+        return type(err).__name__
+
+
+def test_normalize_date() -> None:
+    """Test the normalize_date method"""
+    assert normalize_date("03/11/2005") == "2005-11-03"
+    assert normalize_date("29/02/2000") == "2000-02-29"
+    assert normalize_date("3/1/2005") == "2005-01-03"
+    for date in ["29/02/1900", "31/04/2020", "00/01/2020", "01/13/2020", ""]:
+        with pytest.raises(ValueError):
+            normalize_date(date)
+
+
+def test_normalize_date_random() -> None:
+    """Test normalize_date gives the results of strptime"""
+    rng = random.Random(SEED)
+    for _ in range(SAMPLES):
+        date = (
+            f"{rng.randint(0, 32):02d}/{rng.randint(0, 13):02d}"
+            f"/{rng.randint(1, 2100):04d}"
+        )
+        try:
+            result = normalize_date(date)
+        except ValueError as err:
+            result = type(err).__name__
+        assert result == strptime_date(date), date
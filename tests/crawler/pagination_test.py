@@ -0,0 +1,37 @@
+"""Test the range of the pagination"""
+
+from src.crawler.pagination import (
+    page_index,
+    page_range,
+    page_url,
+    parse_page_info,
+)
+
+LISTING_URL = "https://www.cnmv.es/Portal/Consultas/MostrarListados.aspx?id=18"
+
+
+def test_page_index() -> None:
+    """Test the index of the listing pages"""
+    assert page_index(f"{LISTING_URL}&page=0") == 0
+    assert page_index(f"{LISTING_URL}&page=27") == 27
+    assert page_index(LISTING_URL) is None
+    assert page_index(f"{LISTING_URL}&page=last") is None
+
+
+def test_page_url() -> None:
+    """Test the urls of the listing pages"""
+    assert page_url(LISTING_URL, 1) == f"{LISTING_URL}&page=1"
+    assert page_url(f"{LISTING_URL}&page=0", 3) == f"{LISTING_URL}&page=3"
+    assert page_range(LISTING_URL, 0, 2) == [
+        f"{LISTING_URL}&page=1",
+        f"{LISTING_URL}&page=2",
+    ]
+    assert page_range(LISTING_URL, 2, 2) == []
+
+
+def test_parse_page_info() -> None:
+    """Test the text below the pagination"""
+    assert parse_page_info("Page 1 out of 28") == (1, 28)
+    assert parse_page_info(" Página 3 de 28 ") == (3, 28)
+    assert parse_page_info("Page 29 out of 28") is None
+    assert parse_page_info("Results") is None
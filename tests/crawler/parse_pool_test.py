@@ -0,0 +1,31 @@
+"""Test the ParsePool methods"""
+
+import asyncio
+
+import pytest
+
+from src.crawler import MAPPING, DataPipeline
+from src.crawler.parse_pool import ParsePool
+from tests.test_utils import ENTRY_PAGE1, ENTRY_PAGE2, SAMPLE_FILES
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+@pytest.mark.asyncio
+async def test_transform(processes: int) -> None:
+    """Test the transform method in the event loop and in worker processes"""
+    pool = ParsePool(DataPipeline(MAPPING), processes=processes)
+    pages = [
+        SAMPLE_FILES["success_entry1"],
+        SAMPLE_FILES["success_entry2"],
+        SAMPLE_FILES["no_titcont_entry1"],
+        SAMPLE_FILES["empty_entry1"],
+    ]
+    try:
+        results = await asyncio.gather(
+            *[pool.transform("url", html) for html in pages]
+        )
+    finally:
+        pool.shutdown()
+    # Pages missing key fields are ignored
+    assert results == [ENTRY_PAGE1, ENTRY_PAGE2, None, None]
+    assert pool.executor is None
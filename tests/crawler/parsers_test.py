@@ -0,0 +1,99 @@
+"""Test the parser backends give identical extraction results"""
+
+import importlib.util
+
+import pytest
+
+from src.crawler import MAPPING, DataPipeline
+from src.crawler.cnmv import CNMVCrawler
+from src.crawler.fragments import LISTING_ELEMENTS
+from src.crawler.parsers import (
+    HTML_PARSER,
+    PARSER_BACKENDS,
+    parse_html,
+    parse_partial,
+    resolve_backend,
+)
+from tests.test_utils import SAMPLE_FILES
+
+BACKENDS = [
+    pytest.param(
+        backend,
+        marks=pytest.mark.skipif(
+            module is not None and importlib.util.find_spec(module) is None,
+            reason=f"{backend} is not installed",
+        ),
+    )
+    for backend, module in PARSER_BACKENDS.items()
+]
+
+
+async def extract(pipeline: DataPipeline, html: str):
+    """Extract an entry page, returning the error type if it fails"""
+    try:
+        return await pipeline.extract_and_transform("url", pipeline.parse(html))
+    except ValueError as err:
+        return type(err)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.asyncio
+async def test_backends_entry_pages(backend: str) -> None:
+    """Test every backend extracts the same data from the entry pages"""
+    reference = DataPipeline(MAPPING, parser=HTML_PARSER)
+    pipeline = DataPipeline(MAPPING, parser=backend)
+    for name, html in SAMPLE_FILES.items():
+        if "entry" in name:
+            expected = await extract(reference, html)
+            assert await extract(pipeline, html) == expected, name
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_listing_pages(
+    backend: str, cnmv_crawler: CNMVCrawler
+) -> None:
+    """Test every backend extracts the same urls from the listing pages"""
+    # pylint: disable=protected-access
+    for name, html in SAMPLE_FILES.items():
+        if "list_page" in name:
+            reference = parse_html(html, HTML_PARSER)
+            root = parse_html(html, backend)
+            assert cnmv_crawler._get_next_page(
+                root
+            ) == cnmv_crawler._get_next_page(reference), name
+            assert cnmv_crawler._get_all_urls(
+                root
+            ) == cnmv_crawler._get_all_urls(reference), name
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.asyncio
+async def test_partial_parse(backend: str, cnmv_crawler: CNMVCrawler) -> None:
+    """Test parsing only the fragments gives the results of the whole page"""
+    # pylint: disable=protected-access
+    reference = DataPipeline(MAPPING, parser=HTML_PARSER, partial_parse=False)
+    pipeline = DataPipeline(MAPPING, parser=backend, partial_parse=True)
+    for name, html in SAMPLE_FILES.items():
+        if "entry" in name:
+            expected = await extract(reference, html)
+            assert await extract(pipeline, html) == expected, name
+        else:
+            reference_root = parse_html(html, HTML_PARSER)
+            root = parse_partial(html, LISTING_ELEMENTS, backend)
+            assert cnmv_crawler._get_next_page(
+                root
+            ) == cnmv_crawler._get_next_page(reference_root), name
+            assert cnmv_crawler._get_all_urls(
+                root
+            ) == cnmv_crawler._get_all_urls(reference_root), name
+
+
+def test_resolve_backend(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the resolve_backend method"""
+    assert resolve_backend(HTML_PARSER) == HTML_PARSER
+    with pytest.raises(ValueError):
+        resolve_backend("unknown")
+
+    # Backends not installed fall back to html.parser
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    assert resolve_backend("selectolax") == HTML_PARSER
@@ -96,3 +96,19 @@ async def test_get_data_table_elements(
     expected = ENTRY_PAGE1._asdict()
     expected.pop("nombre")
     assert result == expected
+
+
+def test_get_data_table_cells(data_pipeline: MongoDataPipeLine) -> None:
+    """Test the get_data_table_cells method inside the pipeline"""
+    html = (
+        '<div class="div_tablaDatos"><table><tr>'
+        '<td data-th="ISIN"><a>ES0</a></td><td data-th="ISIN">ES1</td>'
+        "<td>no label</td><td data-th='Domicilio'>Madrid</td>"
+        "</tr></table></div>"
+    )
+    cells = data_pipeline.get_data_table_cells(
+        BeautifulSoup(html, "html.parser")
+    )
+    assert list(cells) == ["ISIN", "Domicilio"]
+    assert cells["ISIN"].text == "ES0"
+    assert cells["Domicilio"].text == "Madrid"
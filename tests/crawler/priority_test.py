@@ -0,0 +1,52 @@
+"""Test the selection of the entry pages of priority crawls"""
+
+from datetime import date, datetime, timedelta
+
+from src.crawler.priority import PrioritySelector, change_dates, change_score
+
+NOW = datetime(2023, 10, 1)
+
+
+def document(url: str, dates: list, fetched_days_ago: float) -> dict:
+    """Document of an entry extracted from the url, changed on the dates"""
+    return {
+        "source_url": url,
+        "last_update": "2023-09-01",
+        "changes": [{"observed_date": observed} for observed in dates],
+        "last_fetched": NOW - timedelta(days=fetched_days_ago),
+    }
+
+
+def test_change_score() -> None:
+    """Test the change_dates and change_score methods"""
+    # Two fields changed on 2023-09-01 count as a single change
+    entry = document("a", ["2023-06-01", "2023-09-01", "2023-09-01"], 0)
+    assert change_dates(entry) == [date(2023, 6, 1), date(2023, 9, 1)]
+    assert change_score(entry, date(2023, 9, 1), 92) == 1.5
+    assert change_score(document("b", [], 0), date(2023, 9, 1)) == 0
+
+
+def test_priority_selector() -> None:
+    """Test the pages are selected by age first and then by volatility"""
+    often = [f"2023-0{month}-01" for month in range(2, 10)]
+    once = ["2023-09-01"]
+    documents = [
+        document("stable", [], 1),
+        document("volatile", often, 1),
+        document("changed", once, 1),
+        document("old", [], 30),
+        {"nombre": "no source page"},
+    ]
+    selector = PrioritySelector(
+        documents, budget=3, max_age_days=14, half_life_days=90, now=NOW
+    )
+    assert selector.known_urls == {"stable", "volatile", "changed", "old"}
+    urls = ["stable", "new", "changed", "old", "volatile"]
+    assert selector.select(urls) == ["new", "old", "volatile", "changed"]
+
+    # The budget grows so every page can be fetched within the maximum age
+    selector = PrioritySelector(
+        documents, budget=1, max_age_days=2, half_life_days=90, now=NOW
+    )
+    assert selector.budget == 2
+    assert selector.select(urls) == ["new", "old", "volatile"]
@@ -0,0 +1,89 @@
+"""Test the RetryPolicy methods"""
+
+import asyncio
+from dataclasses import dataclass
+from email.utils import formatdate
+from typing import Optional
+
+import aiohttp
+import pytest
+
+from src.crawler.retry import RetryPolicy, parse_retry_after
+
+
+def test_parse_retry_after() -> None:
+    """Test the parse_retry_after method"""
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("invalid") is None
+    assert parse_retry_after(" 7 ") == 7
+    # HTTP dates are converted to the seconds left
+    assert parse_retry_after(formatdate(0, usegmt=True)) == 0
+    wait = parse_retry_after(formatdate(usegmt=True, timeval=None))
+    assert 0 <= wait <= 1
+
+
+def test_backoff() -> None:
+    """Test the backoff method of the policy"""
+    policy = RetryPolicy(base_wait=1, max_wait=5, jitter=0)
+    assert [policy.backoff(attempt) for attempt in range(1, 6)] == [
+        1,
+        2,
+        4,
+        5,
+        5,
+    ]
+
+    # The jitter removes up to a fraction of the wait
+    policy = RetryPolicy(base_wait=4, max_wait=60, jitter=0.5)
+    waits = [policy.backoff(1) for _ in range(100)]
+    assert all(2 <= wait <= 4 for wait in waits)
+    assert len(set(waits)) > 1
+
+    # Retry-After is honoured up to the maximum wait
+    assert policy.backoff(1, "30") == 30
+    assert policy.backoff(1, "3600") == 60
+
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+    with pytest.raises(ValueError):
+        RetryPolicy(jitter=2)
+
+
+def test_classification() -> None:
+    """Test which statuses and errors are retried"""
+    policy = RetryPolicy()
+    assert all(policy.is_retryable_status(code) for code in [429, 500, 503])
+    assert not any(policy.is_retryable_status(code) for code in [400, 404])
+    assert policy.is_retryable_error(asyncio.TimeoutError())
+    assert policy.is_retryable_error(aiohttp.ServerDisconnectedError())
+    assert not policy.is_retryable_error(ValueError())
+
+
+def test_timeout() -> None:
+    """Test the timeout of an attempt keeps the timeouts of the session"""
+    policy = RetryPolicy()
+    base = aiohttp.ClientTimeout(sock_connect=3, sock_read=7)
+    timeout = policy.timeout(base, 20)
+    assert timeout.total == 20
+    assert timeout.sock_connect == 3
+    assert timeout.sock_read == 7
+    assert policy.timeout(aiohttp.ClientTimeout(total=5), 20).total == 5
+
+
+@dataclass(frozen=True)
+class LegacyClientTimeout:
+    """The ClientTimeout of aiohttp 3.8, the version pinned by poetry.lock"""
+
+    total: Optional[float] = None
+    connect: Optional[float] = None
+    sock_read: Optional[float] = None
+    sock_connect: Optional[float] = None
+
+
+def test_timeout_legacy(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the timeout of an attempt with the fields of aiohttp 3.8"""
+    monkeypatch.setattr(aiohttp, "ClientTimeout", LegacyClientTimeout)
+    base = LegacyClientTimeout(connect=1, sock_connect=3, sock_read=7)
+    timeout = RetryPolicy().timeout(base, 20)
+    assert timeout == LegacyClientTimeout(20, 1, 7, 3)
@@ -0,0 +1,57 @@
+"""Test the RequestScheduler and TokenBucket methods"""
+
+import asyncio
+
+import pytest
+
+from src.crawler.scheduler import RequestScheduler, TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_token_bucket() -> None:
+    """Test the acquire method of the token bucket"""
+    loop = asyncio.get_running_loop()
+    bucket = TokenBucket(rate=50, burst=2)
+
+    # The burst is served immediately, the rest at the bucket rate
+    start = loop.time()
+    for _ in range(5):
+        await bucket.acquire()
+    assert loop.time() - start >= 3 / 50 * 0.9
+
+    # Invalid rates are not accepted
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=1)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_slot() -> None:
+    """Test the concurrency cap and the per-host buckets of the scheduler"""
+    scheduler = RequestScheduler(
+        max_concurrency=2, requests_per_second=1000, burst=10
+    )
+    in_flight = 0
+    max_in_flight = 0
+
+    async def request(url: str) -> None:
+        nonlocal in_flight, max_in_flight
+        async with scheduler.slot(url):
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(
+        *[request(f"https://localhost/page{i}") for i in range(6)],
+        request("https://127.0.0.1/page"),
+    )
+    assert max_in_flight == 2
+    assert set(scheduler.buckets) == {"localhost", "127.0.0.1"}
+
+    # The rate limit can be disabled
+    scheduler = RequestScheduler(max_concurrency=1, requests_per_second=0)
+    async with scheduler.slot("https://localhost/page"):
+        assert not scheduler.buckets
+
+    with pytest.raises(ValueError):
+        RequestScheduler(max_concurrency=0)
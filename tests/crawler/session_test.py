@@ -0,0 +1,20 @@
+"""Test the HTTP session factory"""
+
+import pytest
+
+from src.crawler.session import PoolConfig, build_session
+
+
+@pytest.mark.asyncio
+async def test_build_session() -> None:
+    """Test the connection pool configuration of the session"""
+    # Sessions with keep-alive reuse connections
+    pool = PoolConfig(keep_alive=True, connections_per_host=3, read_timeout=7)
+    async with build_session(pool) as session:
+        assert session.connector.force_close is False
+        assert session.connector.limit_per_host == 3
+        assert session.timeout.sock_read == 7
+
+    # Sessions without keep-alive close connections after each response
+    async with build_session(PoolConfig(keep_alive=False)) as session:
+        assert session.connector.force_close is True
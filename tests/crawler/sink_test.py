@@ -0,0 +1,67 @@
+"""Test the ResultSink methods"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from src.crawler.sink import ResultSink
+
+
+@pytest.mark.asyncio
+async def test_sink_batches() -> None:
+    """Test results are written by batch size, time window and on close"""
+    batches: List[List[int]] = []
+
+    async def write(items: List[int]) -> None:
+        batches.append(items)
+
+    async with ResultSink(write, 3, 0.05, 10, 1) as sink:
+        for item in range(4):
+            await sink.put(item)
+        # A full batch is written right away, the rest after the window
+        await asyncio.sleep(0.01)
+        assert batches == [[0, 1, 2]]
+        await asyncio.sleep(0.1)
+        assert batches == [[0, 1, 2], [3]]
+        await sink.put(4)
+    # Closing the sink writes what is left without waiting for the window
+    assert batches == [[0, 1, 2], [3], [4]]
+
+
+@pytest.mark.asyncio
+async def test_sink_backpressure() -> None:
+    """Test producers wait while the sink is full"""
+    written: List[int] = []
+    release = asyncio.Event()
+
+    async def write(items: List[int]) -> None:
+        await release.wait()
+        written.extend(items)
+
+    async with ResultSink(write, 1, 0, 2, 1) as sink:
+        # The writer holds the first item and the queue the next two
+        for item in range(3):
+            await sink.put(item)
+        blocked = asyncio.create_task(sink.put(3))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        release.set()
+        await blocked
+    assert written == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_sink_write_failure() -> None:
+    """Test a failed batch doesn't stop the writers"""
+    written: List[int] = []
+
+    async def write(items: List[int]) -> None:
+        if 0 in items:
+            raise ValueError("Failed batch")
+        written.extend(items)
+
+    async with ResultSink(write, 1, 0, 0, 2) as sink:
+        for item in range(3):
+            await sink.put(item)
+    assert sorted(written) == [1, 2]
@@ -0,0 +1,56 @@
+"""Test the StagedPipeline methods"""
+
+from typing import List
+
+import pytest
+
+from src.crawler.stages import Emit, Stage, StagedPipeline
+
+
+@pytest.mark.asyncio
+async def test_staged_pipeline() -> None:
+    """Test items flow through all the stages of the pipeline"""
+    collected: List[int] = []
+
+    async def expand(item: int, emit: Emit) -> None:
+        # Feed the first stage again until we reach the third item
+        for value in range(item * 10, item * 10 + 3):
+            await emit(value, None)
+        if item < 3:
+            await emit(item + 1, "expand")
+
+    async def double(item: int, emit: Emit) -> None:
+        if item % 2:
+            raise ValueError("Odd values fail and are dropped")
+        await emit(item * 2, None)
+
+    async def collect(item: int, emit: Emit) -> None:
+        # pylint: disable=unused-argument
+        collected.append(item)
+
+    pipeline = StagedPipeline([
+        Stage("expand", expand, 1, 1),
+        Stage("double", double, 3, 2),
+        Stage("collect", collect, 2, 2),
+    ])
+    await pipeline.run([1])
+    assert sorted(collected) == [20, 24, 40, 44, 60, 64]
+
+    # A pipeline cannot be created without stages
+    with pytest.raises(ValueError):
+        StagedPipeline([])
+
+
+@pytest.mark.asyncio
+async def test_staged_pipeline_sink() -> None:
+    """Test the items emitted by the last stage go to the sink"""
+    received: List[int] = []
+
+    async def square(item: int, emit: Emit) -> None:
+        await emit(item * item, None)
+
+    async def sink(item: int) -> None:
+        received.append(item)
+
+    await StagedPipeline([Stage("square", square, 2)], sink).run([1, 2, 3])
+    assert sorted(received) == [1, 4, 9]
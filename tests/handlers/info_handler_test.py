@@ -0,0 +1,46 @@
+"""Test the InfoHandler methods"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src.data_classes import PageSource
+from src.handlers import InfoHandler
+from src.mongo import DataClient
+from tests.test_utils import ENTRY_PAGE1, ENTRY_PAGE1_UPDATE1
+
+
+@pytest.mark.asyncio
+async def test_info_handler(
+    data_client: DataClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the entries written by the crawler are listed as JSON"""
+    await data_client.delete_docs()
+    monkeypatch.setattr(InfoHandler, "mongo_client", data_client)
+    url = "https://localhost/test_url/process_page1"
+    assert await data_client.set_data(ENTRY_PAGE1, PageSource(url, "a"))
+    request = SimpleNamespace(json={"isin": ENTRY_PAGE1.isin})
+
+    entry = json.loads((await InfoHandler().get(request)).body)
+    assert entry["nombre"] == ENTRY_PAGE1.nombre
+    assert entry["changes"] == []
+
+    # The changes are listed along with the current values, the fields of
+    # the source page are not
+    assert await data_client.set_data(ENTRY_PAGE1_UPDATE1, PageSource(url, "b"))
+    entry = json.loads((await InfoHandler().get(request)).body)
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert entry == {
+        **ENTRY_PAGE1_UPDATE1._asdict(),
+        "last_update": today,
+        "write_date": entry["write_date"],
+        "changes": [{
+            "isin": ENTRY_PAGE1.isin,
+            "field": "domicilio",
+            "observed_date": today,
+            "old_value": ENTRY_PAGE1.domicilio,
+            "new_value": ENTRY_PAGE1_UPDATE1.domicilio,
+        }],
+    }
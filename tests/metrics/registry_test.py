@@ -0,0 +1,54 @@
+"""Test the metrics registry"""
+
+import json
+from pathlib import Path
+
+from src.metrics import Histogram, MetricsRegistry
+
+
+def test_histogram() -> None:
+    """Test the buckets and the quantiles of the histogram"""
+    histogram = Histogram((0.1, 1.0))
+    assert histogram.quantile(0.5) == 0.0
+    for value in [0.05, 0.05, 0.5, 3.0]:
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1) == 3.0
+    summary = histogram.summary()
+    assert summary["count"] == 4
+    assert summary["mean"] == 0.9
+    assert summary["max"] == 3.0
+
+
+def test_registry(tmp_path: Path) -> None:
+    """Test the counters, the timers and the exported files"""
+    metrics = MetricsRegistry()
+    metrics.inc("inserts")
+    metrics.inc("inserts", 2)
+    with metrics.timer("write"):
+        pass
+    metrics.observe("fetch", 20)
+
+    text = metrics.to_prometheus()
+    assert "# TYPE cnmv_inserts_total counter\ncnmv_inserts_total 3\n" in text
+    assert "# TYPE cnmv_write_seconds histogram" in text
+    assert 'cnmv_write_seconds_bucket{le="0.001"} 1' in text
+    assert 'cnmv_fetch_seconds_bucket{le="10"} 0' in text
+    assert 'cnmv_fetch_seconds_bucket{le="+Inf"} 1' in text
+    assert "cnmv_fetch_seconds_sum 20.000000" in text
+    assert "cnmv_fetch_seconds_count 1" in text
+
+    metrics.write(str(tmp_path / "metrics"), "run")
+    summary = json.loads((tmp_path / "metrics" / "run.json").read_text())
+    assert summary["counters"] == {"inserts": 3}
+    assert summary["histograms"]["fetch"]["p95"] == 20
+    assert (tmp_path / "metrics" / "run.prom").read_text() == text
+    assert sorted(path.name for path in (tmp_path / "metrics").iterdir()) == [
+        "run.json",
+        "run.prom",
+    ]
+
+    metrics.reset()
+    assert not metrics.to_json()["counters"]
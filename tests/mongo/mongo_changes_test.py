@@ -0,0 +1,86 @@
+"""Test the MongoChangesClient methods"""
+
+import pytest
+
+from src.mongo import DataClient
+from src.mongo.mongo_changes import legacy_changes
+from tests.test_utils import (
+    ENTRY_PAGE1,
+    ENTRY_PAGE1_UPDATE1,
+    ENTRY_PAGE1_UPDATE2,
+)
+
+# Entry written on 2023-01-01, 2023-02-01 and 2023-03-01 by previous versions
+LEGACY_DOCUMENT = {
+    **ENTRY_PAGE1_UPDATE2._asdict(),
+    "last_update": "2023-03-01",
+    "updates": {
+        "domicilio": {
+            "2023-01-01": ENTRY_PAGE1.domicilio,
+            "2023-02-01": ENTRY_PAGE1_UPDATE1.domicilio,
+        },
+        "capital_inicial": {"2023-02-01": ENTRY_PAGE1.capital_inicial},
+    },
+}
+
+LEGACY_CHANGES = [
+    {
+        "isin": ENTRY_PAGE1.isin,
+        "field": "domicilio",
+        "observed_date": "2023-02-01",
+        "old_value": ENTRY_PAGE1.domicilio,
+        "new_value": ENTRY_PAGE1_UPDATE1.domicilio,
+    },
+    {
+        "isin": ENTRY_PAGE1.isin,
+        "field": "domicilio",
+        "observed_date": "2023-03-01",
+        "old_value": ENTRY_PAGE1_UPDATE1.domicilio,
+        "new_value": ENTRY_PAGE1_UPDATE2.domicilio,
+    },
+    {
+        "isin": ENTRY_PAGE1.isin,
+        "field": "capital_inicial",
+        "observed_date": "2023-03-01",
+        "old_value": ENTRY_PAGE1.capital_inicial,
+        "new_value": ENTRY_PAGE1_UPDATE2.capital_inicial,
+    },
+]
+
+
+def test_legacy_changes() -> None:
+    """Test the nested updates dicts are converted to changes"""
+    assert legacy_changes(LEGACY_DOCUMENT) == LEGACY_CHANGES
+    assert legacy_changes({**LEGACY_DOCUMENT, "updates": {}}) == []
+
+
+@pytest.mark.asyncio
+async def test_changes(data_client: DataClient) -> None:
+    """Test the add_changes and find_changes methods"""
+    await data_client.delete_docs()
+    changes_client = data_client.changes
+    assert await changes_client.add_changes([]) == 0
+    assert await changes_client.add_changes(LEGACY_CHANGES[1:]) == 2
+    assert await changes_client.add_changes(LEGACY_CHANGES[:1]) == 1
+    # Changes already in the history are not added again
+    assert await changes_client.add_changes(LEGACY_CHANGES) == 0
+    assert await changes_client.find_changes(ENTRY_PAGE1.isin) == LEGACY_CHANGES
+    assert await changes_client.find_changes("ES0000000001") == []
+    await changes_client.delete_docs()
+
+
+@pytest.mark.asyncio
+async def test_migrate_updates(data_client: DataClient) -> None:
+    """Test the updates of the entries are moved to the change history"""
+    await data_client.delete_docs()
+    await data_client.get_collection().insert_one(dict(LEGACY_DOCUMENT))
+    assert await data_client.migrate_updates() == 1
+    assert await data_client.migrate_updates() == 0
+    document = await data_client.find_entry({"isin": ENTRY_PAGE1.isin})
+    assert "updates" not in document
+    changes = await data_client.changes.find_changes(ENTRY_PAGE1.isin)
+    assert changes == LEGACY_CHANGES
+
+    # Deleting the entries deletes their changes
+    await data_client.delete_docs()
+    assert await data_client.changes.find_changes(ENTRY_PAGE1.isin) == []
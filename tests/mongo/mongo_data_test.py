@@ -1,11 +1,17 @@
 """Test the CNMVCrawler methods"""
 
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 import pytest
+from pymongo.errors import PyMongoError
 
-from src.mongo import DataClient
+from src.data_classes import PageSource
+from src.mongo import ChangesClient, DataClient
+from src.mongo.mongo_conn import MongoConnector
+from src.mongo.mongo_data import PIPELINE, READ, SNAPSHOT
 from tests.test_utils import (
+    DB_NAME,
     ENTRY_PAGE1,
     ENTRY_PAGE1_UPDATE1,
     ENTRY_PAGE1_UPDATE2,
@@ -38,7 +44,6 @@ async def test_set_data(data_client: DataClient) -> None:
     document.pop("write_date")
     expected = ENTRY_PAGE1._asdict()
     expected["last_update"] = today
-    expected["updates"] = {}
     assert document == expected
 
     # Insert second document
@@ -55,7 +60,6 @@ async def test_set_data(data_client: DataClient) -> None:
     document.pop("write_date")
     expected = ENTRY_PAGE2._asdict()
     expected["last_update"] = today
-    expected["updates"] = {}
     assert document == expected
 
     # Insert first document update
@@ -72,8 +76,14 @@ async def test_set_data(data_client: DataClient) -> None:
     document.pop("write_date")
     expected = ENTRY_PAGE1_UPDATE1._asdict()
     expected["last_update"] = today
-    expected["updates"] = {"domicilio": {today: ENTRY_PAGE1.domicilio}}
     assert document == expected
+    assert await data_client.changes.find_changes(ENTRY_PAGE1.isin) == [{
+        "isin": ENTRY_PAGE1.isin,
+        "field": "domicilio",
+        "observed_date": today,
+        "old_value": ENTRY_PAGE1.domicilio,
+        "new_value": ENTRY_PAGE1_UPDATE1.domicilio,
+    }]
 
     # Insert first document second update
     assert await data_client.set_data(ENTRY_PAGE1_UPDATE2) is True
@@ -89,12 +99,401 @@ async def test_set_data(data_client: DataClient) -> None:
     document.pop("write_date")
     expected = ENTRY_PAGE1_UPDATE2._asdict()
     expected["last_update"] = today
-    expected["updates"] = {
-        "domicilio": {today: ENTRY_PAGE1_UPDATE1.domicilio},
-        "capital_inicial": {today: ENTRY_PAGE1.capital_inicial},
-        "capital_maximo": {today: ENTRY_PAGE1.capital_maximo},
-        "fecha_ultimo_folleto": {
-            today: ENTRY_PAGE1_UPDATE1.fecha_ultimo_folleto
-        },
-    }
     assert document == expected
+
+    # The changes are appended to the history of the entry
+    changes = await data_client.changes.find_changes(ENTRY_PAGE1.isin)
+    assert {change["observed_date"] for change in changes} == {today}
+    assert [
+        (change["field"], change["old_value"], change["new_value"])
+        for change in changes[1:]
+    ] == [
+        (field, getattr(ENTRY_PAGE1_UPDATE1, field), value)
+        for field, value in ENTRY_PAGE1_UPDATE2._asdict().items()
+        if getattr(ENTRY_PAGE1_UPDATE1, field) != value
+    ]
+    assert await data_client.changes.find_changes(ENTRY_PAGE2.isin) == []
+
+
+@pytest.mark.asyncio
+async def test_set_data_source(data_client: DataClient) -> None:
+    """Test the set_data method storing the source page of the entries"""
+    await data_client.delete_docs()
+    url = "https://localhost/test_url/process_page1"
+    query = {"isin": ENTRY_PAGE1.isin}
+
+    # Entries without a source page have no content hash
+    assert await data_client.set_data(ENTRY_PAGE2) is True
+    assert await data_client.find_content_hashes() == {}
+
+    # New entry with its source page
+    assert await data_client.set_data(ENTRY_PAGE1, PageSource(url, "a")) is True
+    assert await data_client.find_content_hashes() == {url: "a"}
+
+    # The page changed but not the data, only the hash is updated
+    document = await data_client.find_entry(query)
+    assert await data_client.set_data(ENTRY_PAGE1, PageSource(url, "b")) is True
+    assert await data_client.find_content_hashes() == {url: "b"}
+    updated = await data_client.find_entry(query)
+    assert updated["write_date"] == document["write_date"]
+    assert "updates" not in updated
+    assert await data_client.changes.find_changes(ENTRY_PAGE1.isin) == []
+
+    # The data changed as well
+    source = PageSource(url, "c")
+    assert await data_client.set_data(ENTRY_PAGE1_UPDATE1, source) is True
+    assert await data_client.find_content_hashes() == {url: "c"}
+    updated = await data_client.find_entry(query)
+    assert updated["domicilio"] == ENTRY_PAGE1_UPDATE1.domicilio
+
+
+@pytest.mark.asyncio
+async def test_refresh_history(data_client: DataClient) -> None:
+    """Test the find_refresh_history and set_last_fetched methods"""
+    await data_client.delete_docs()
+    url = "https://localhost/test_url/process_page1"
+    assert await data_client.set_data(ENTRY_PAGE2) is True
+    assert await data_client.set_data(ENTRY_PAGE1, PageSource(url, "a")) is True
+    assert await data_client.set_data(ENTRY_PAGE1_UPDATE1, PageSource(url, "b"))
+
+    # Only the entries with a source page are returned
+    history = await data_client.find_refresh_history()
+    assert len(history) == 1
+    assert history[0]["source_url"] == url
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert history[0]["changes"] == [{"observed_date": today}]
+    assert isinstance(history[0]["last_fetched"], datetime)
+
+    fetched = datetime(2023, 1, 1)
+    assert await data_client.set_last_fetched([]) == 0
+    assert await data_client.set_last_fetched([url], fetched) == 1
+    history = await data_client.find_refresh_history()
+    assert history[0]["last_fetched"] == fetched
+
+
+@pytest.mark.asyncio
+async def test_set_data_metrics(data_client: DataClient) -> None:
+    """Test the counters and the latencies recorded by set_data"""
+    await data_client.delete_docs()
+    data_client.metrics.reset()
+    assert await data_client.set_data(ENTRY_PAGE1) is True
+    assert await data_client.set_data(ENTRY_PAGE1_UPDATE1) is True
+    assert await data_client.set_data(ENTRY_PAGE1_UPDATE1) is True
+    assert data_client.metrics.counters == {
+        "inserts": 1,
+        "updates": 1,
+        "unchanged": 1,
+    }
+    assert data_client.metrics.histograms["diff"].count == 3
+    assert data_client.metrics.histograms["write"].count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write_mode", [READ, SNAPSHOT])
+async def test_set_data_bulk(
+    data_client: DataClient, mongo_connector: MongoConnector, write_mode: str
+) -> None:
+    """Test the set_data_bulk method writes what set_data would"""
+    # pylint: disable=too-many-locals
+    await data_client.delete_docs()
+    bulk_client = DataClient(
+        db_name=DB_NAME, collection="cnmv_data_bulk", connector=mongo_connector
+    )
+    bulk_client.changes = ChangesClient(
+        db_name=DB_NAME,
+        collection="sicav_changes_bulk",
+        connector=mongo_connector,
+    )
+    await bulk_client.delete_docs()
+    bulk_client.write_mode = write_mode
+    assert await bulk_client.load_snapshot() == 0
+    url = "https://localhost/test_url/process_page1"
+    results = [
+        ENTRY_PAGE1,
+        ENTRY_PAGE2,
+        "",
+        ENTRY_PAGE1_UPDATE1,
+        ENTRY_PAGE2,
+        ENTRY_PAGE1_UPDATE2,
+        ENTRY_PAGE2,
+    ]
+    sources = [None, None, None, None, None, None, PageSource(url, "a")]
+    expected = [True, True, False, True, True, True, True]
+    for result, source, outcome in zip(results, sources, expected):
+        assert await data_client.set_data(result, source) is outcome
+
+    # Entries appearing twice are written in separate batches
+    data_client.metrics.reset()
+    assert await bulk_client.set_data_bulk(results, sources, 3) == expected
+    assert bulk_client.metrics.counters == {
+        "inserts": 2,
+        "updates": 2,
+        "unchanged": 2,
+    }
+    assert bulk_client.metrics.histograms["write"].count == 3
+    for entry in [ENTRY_PAGE1, ENTRY_PAGE2]:
+        query = {"isin": entry.isin}
+        document = await data_client.find_entry(query)
+        bulk_document = await bulk_client.find_entry(query)
+        for fields in [document, bulk_document]:
+            fields.pop("write_date")
+            fields.pop("last_fetched", None)
+        assert bulk_document == document
+        assert await bulk_client.changes.find_changes(
+            entry.isin
+        ) == await data_client.changes.find_changes(entry.isin)
+    await bulk_client.delete_docs()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write_mode", [READ, SNAPSHOT])
+async def test_set_data_changes_failure(
+    monkeypatch: pytest.MonkeyPatch, data_client: DataClient, write_mode: str
+) -> None:
+    """Test entries whose changes can't be appended are not updated"""
+    await data_client.delete_docs()
+    monkeypatch.setattr(data_client, "write_mode", write_mode)
+    assert await data_client.set_data(ENTRY_PAGE1) is True
+    await data_client.load_snapshot()
+    add_changes = data_client.changes.add_changes
+
+    async def fail_changes(changes):
+        # pylint: disable=unused-argument
+        raise PyMongoError("Connection lost")
+
+    monkeypatch.setattr(data_client.changes, "add_changes", fail_changes)
+    if write_mode == READ:
+        assert await data_client.set_data(ENTRY_PAGE1_UPDATE1) is False
+    results = [ENTRY_PAGE1_UPDATE1, ENTRY_PAGE2]
+    assert await data_client.set_data_bulk(results) == [False, True]
+    document = await data_client.find_entry({"isin": ENTRY_PAGE1.isin})
+    assert document["domicilio"] == ENTRY_PAGE1.domicilio
+
+    # The entry is written when retried, with its changes added once
+    monkeypatch.setattr(data_client.changes, "add_changes", add_changes)
+    assert await data_client.set_data_bulk(results[:1]) == [True]
+    document = await data_client.find_entry({"isin": ENTRY_PAGE1.isin})
+    assert document["domicilio"] == ENTRY_PAGE1_UPDATE1.domicilio
+    changes = await data_client.changes.find_changes(ENTRY_PAGE1.isin)
+    assert len(changes) == 1
+    assert await data_client.changes.add_changes(changes) == 0
+    data_client.clear_snapshot()
+
+
+@pytest.mark.asyncio
+async def test_load_snapshot(data_client: DataClient) -> None:
+    """Test the entries are diffed against the snapshot without reading them"""
+    await data_client.delete_docs()
+    url = "https://localhost/test_url/process_page1"
+    assert await data_client.set_data(ENTRY_PAGE1, PageSource(url, "a"))
+    assert await data_client.set_data(ENTRY_PAGE2)
+
+    # Nothing is loaded in the read mode
+    data_client.write_mode = READ
+    assert await data_client.load_snapshot() == 0
+    assert data_client.snapshot is None
+
+    data_client.write_mode = SNAPSHOT
+    assert await data_client.load_snapshot() == 2
+    key = (ENTRY_PAGE1.numero_registro, ENTRY_PAGE1.isin)
+    assert data_client.snapshot[key] == {
+        **ENTRY_PAGE1._asdict(),
+        "last_update": datetime.now().strftime("%Y-%m-%d"),
+        "content_hash": "a",
+    }
+
+    # Unchanged entries are not written, nor read
+    await data_client.delete_docs({"isin": ENTRY_PAGE2.isin})
+    data_client.metrics.reset()
+    results = [ENTRY_PAGE2, ENTRY_PAGE1_UPDATE1]
+    assert await data_client.set_data_bulk(results) == [True, True]
+    assert data_client.metrics.counters == {"unchanged": 1, "updates": 1}
+    assert await data_client.get_n_docs() == 1
+    assert (
+        data_client.snapshot[key]["domicilio"] == ENTRY_PAGE1_UPDATE1.domicilio
+    )
+
+    data_client.clear_snapshot()
+    assert data_client.snapshot is None
+
+
+def test_pipeline_update(data_client: DataClient) -> None:
+    """Test the aggregation pipeline built for the pipeline write mode"""
+    # pylint: disable=protected-access
+    write_date = datetime(2023, 10, 2, 10)
+    pipeline = data_client._pipeline_update(ENTRY_PAGE1, write_date)
+    assert len(pipeline) == 1
+    fields = pipeline[0]["$set"]
+    for field, value in ENTRY_PAGE1._asdict().items():
+        assert fields[field] == {"$literal": value}
+    # The entry is written when it is new or any field changed
+    written, date, previous = fields["last_update"]["$cond"]
+    assert written["$or"] == [
+        {"$eq": [{"$type": "$last_update"}, "missing"]},
+        *[
+            {"$ne": [f"${field}", {"$literal": value}]}
+            for field, value in ENTRY_PAGE1._asdict().items()
+        ],
+    ]
+    assert (date, previous) == ("2023-10-02", "$last_update")
+    assert fields["write_date"]["$cond"] == [
+        written,
+        {"$literal": write_date},
+        "$write_date",
+    ]
+    assert not set(fields) & {"source_url", "content_hash", "last_fetched"}
+
+    # The last fetch is also set when only the page changed
+    url = "https://localhost/test_url/process_page1"
+    pipeline = data_client._pipeline_update(
+        ENTRY_PAGE1, write_date, PageSource(url, "a")
+    )
+    fields = pipeline[0]["$set"]
+    assert fields["source_url"] == {"$literal": url}
+    assert fields["content_hash"] == {"$literal": "a"}
+    assert fields["last_fetched"]["$cond"] == [
+        {"$or": [written, {"$ne": ["$content_hash", {"$literal": "a"}]}]},
+        {"$literal": write_date},
+        "$last_fetched",
+    ]
+
+
+async def pipeline_updates_supported(client: DataClient) -> bool:
+    """
+    Check whether the server applies aggregation pipeline updates, which
+    need MongoDB 4.2 or later and aren't supported by every mock
+    """
+    collection = client.connector.get_db(DB_NAME)["pipeline_probe"]
+    try:
+        await collection.update_one(
+            {"_id": "probe"},
+            [{"$set": {"new": {"$eq": [{"$type": "$new"}, "missing"]}}}],
+            upsert=True,
+        )
+        document = await collection.find_one_and_delete({"_id": "probe"})
+    except PyMongoError:
+        return False
+    return document is not None and document.get("new") is True
+
+
+@pytest.mark.asyncio
+async def test_set_data_pipeline(
+    data_client: DataClient, mongo_connector: MongoConnector
+) -> None:
+    """Test the pipeline write mode writes what set_data would"""
+    if not await pipeline_updates_supported(data_client):
+        pytest.skip("The server doesn't support pipeline updates")
+    await data_client.delete_docs()
+    pipeline_client = DataClient(
+        db_name=DB_NAME,
+        collection="cnmv_data_pipeline",
+        connector=mongo_connector,
+    )
+    pipeline_client.changes = ChangesClient(
+        db_name=DB_NAME,
+        collection="sicav_changes_pipeline",
+        connector=mongo_connector,
+    )
+    await pipeline_client.delete_docs()
+    pipeline_client.write_mode = PIPELINE
+    url = "https://localhost/test_url/process_page1"
+    results = [
+        ENTRY_PAGE1,
+        ENTRY_PAGE2,
+        ENTRY_PAGE1_UPDATE1,
+        ENTRY_PAGE2,
+        ENTRY_PAGE1_UPDATE2,
+    ]
+    for result in results:
+        assert await data_client.set_data(result) is True
+        assert await pipeline_client.set_data(result) is True
+    for entry in [ENTRY_PAGE1, ENTRY_PAGE2]:
+        query = {"isin": entry.isin}
+        document = await data_client.find_entry(query)
+        pipeline_document = await pipeline_client.find_entry(query)
+        document.pop("write_date")
+        pipeline_document.pop("write_date")
+        assert pipeline_document == document
+        assert await pipeline_client.changes.find_changes(
+            entry.isin
+        ) == await data_client.changes.find_changes(entry.isin)
+
+    # Unchanged entries keep their write date, only the hash of a page that
+    # changed is set
+    documents = [
+        await pipeline_client.find_entry({"isin": entry.isin})
+        for entry in [ENTRY_PAGE2, ENTRY_PAGE1]
+    ]
+    pipeline_client.metrics.reset()
+    sources = [None, PageSource(url, "a")]
+    assert await pipeline_client.set_data_bulk(
+        [ENTRY_PAGE2, ENTRY_PAGE1_UPDATE2], sources
+    ) == [True, True]
+    assert pipeline_client.metrics.counters == {"unchanged": 2}
+    unchanged = await pipeline_client.find_entry({"isin": ENTRY_PAGE2.isin})
+    assert unchanged == documents[0]
+    updated = await pipeline_client.find_entry({"isin": ENTRY_PAGE1.isin})
+    assert updated.pop("content_hash") == "a"
+    assert updated.pop("source_url") == url
+    assert isinstance(updated.pop("last_fetched"), datetime)
+    assert updated == documents[1]
+    await pipeline_client.delete_docs()
+
+
+class PreviousCollection:
+    """Collection returning the previous documents of a pipeline update"""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, previous: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        self.previous = previous
+        self.updates: List[Dict[str, Any]] = []
+
+    async def find_one_and_update(
+        self, query: Dict[str, Any], update: Any, **kwargs: Any
+    ) -> Optional[Dict[str, Any]]:
+        """Record the update and return the previous document of the entry"""
+        self.updates.append({"query": query, "update": update, **kwargs})
+        return self.previous[query["isin"]]
+
+
+@pytest.mark.asyncio
+async def test_set_pipeline_entry(
+    monkeypatch: pytest.MonkeyPatch, data_client: DataClient
+) -> None:
+    """Test the diff, counters and changes of the pipeline write mode"""
+    await data_client.delete_docs()
+    assert await data_client.set_data(ENTRY_PAGE1) is True
+    previous = await data_client.find_entry({"isin": ENTRY_PAGE1.isin})
+    collection = PreviousCollection(
+        {ENTRY_PAGE1.isin: previous, ENTRY_PAGE2.isin: None}
+    )
+    monkeypatch.setattr(data_client, "get_collection", lambda: collection)
+    monkeypatch.setattr(data_client, "write_mode", PIPELINE)
+    data_client.metrics.reset()
+    results = [ENTRY_PAGE2, ENTRY_PAGE1, ENTRY_PAGE1_UPDATE1]
+    assert await data_client.set_data_bulk(results) == [True, True, True]
+    assert data_client.metrics.counters == {
+        "inserts": 1,
+        "unchanged": 1,
+        "updates": 1,
+    }
+    assert len(collection.updates) == 3
+    assert all(update["upsert"] for update in collection.updates)
+    changes = await data_client.changes.find_changes(ENTRY_PAGE1.isin)
+    assert [
+        (change["field"], change["old_value"], change["new_value"])
+        for change in changes
+    ] == [("domicilio", ENTRY_PAGE1.domicilio, ENTRY_PAGE1_UPDATE1.domicilio)]
+    assert not await data_client.changes.find_changes(ENTRY_PAGE2.isin)
+
+    # Entries whose changes can't be appended are not counted as written
+    async def fail_changes(changes):
+        # pylint: disable=unused-argument
+        raise PyMongoError("Connection lost")
+
+    monkeypatch.setattr(data_client.changes, "add_changes", fail_changes)
+    results = [ENTRY_PAGE1_UPDATE2, ENTRY_PAGE2]
+    assert await data_client.set_data_bulk(results) == [False, True]
+    monkeypatch.undo()
+    await data_client.delete_docs()
@@ -0,0 +1,94 @@
+"""Test the MongoQueueClient methods"""
+
+import pytest
+
+from src.mongo import QueueClient
+
+
+@pytest.mark.asyncio
+async def test_queue(queue_client: QueueClient) -> None:
+    """Test the life cycle of the work items"""
+    await queue_client.delete_docs()
+    assert await queue_client.join() is None
+    assert await queue_client.start() == 1
+    assert await queue_client.claim("worker", 60) is None
+
+    # Urls already queued are ignored
+    assert await queue_client.enqueue("entry", ["a", "b"], 1) == 2
+    assert await queue_client.enqueue("listing", ["l", "a"], 0) == 1
+    assert await queue_client.enqueue("entry", [], 1) == 0
+
+    # Lower priorities are claimed first
+    item = await queue_client.claim("worker", 60)
+    assert item["url"] == "l"
+    assert item["kind"] == "listing"
+    assert item["attempts"] == 1
+    assert await queue_client.heartbeat("worker", ["l"], 60) == 1
+    assert await queue_client.heartbeat("other", ["l"], 60) == 0
+    assert await queue_client.complete("other", "l") is False
+    assert await queue_client.complete("worker", "l") is True
+
+    # Failed items are retried until the maximum attempts
+    item = await queue_client.claim("worker", 60)
+    assert await queue_client.fail("worker", item["url"], 2) is True
+    item = await queue_client.claim("worker", 60)
+    assert item["attempts"] == 2
+    assert await queue_client.fail("worker", item["url"], 2) is True
+    assert await queue_client.count_by_status() == {
+        "queued": 1,
+        "leased": 0,
+        "done": 1,
+        "failed": 1,
+    }
+
+    # Expired leases are queued again
+    item = await queue_client.claim("worker", -1)
+    assert await queue_client.requeue_expired() == 1
+    assert await queue_client.complete("worker", item["url"]) is False
+    assert (await queue_client.claim("other", 60))["url"] == item["url"]
+
+
+@pytest.mark.asyncio
+async def test_queue_expired_attempts(queue_client: QueueClient) -> None:
+    """Test an item whose lease keeps expiring fails after max_attempts"""
+    await queue_client.delete_docs()
+    await queue_client.start()
+    await queue_client.enqueue("entry", ["hang"], 1)
+    for attempt in range(1, 4):
+        item = await queue_client.claim(f"worker{attempt}", -1)
+        assert item["attempts"] == attempt
+        assert await queue_client.requeue_expired(3) == 1
+    assert await queue_client.claim("worker4", 60) is None
+    assert await queue_client.count_by_status() == {
+        "queued": 0,
+        "leased": 0,
+        "done": 0,
+        "failed": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_queue_generations(queue_client: QueueClient) -> None:
+    """Test the workers only see the items of the active generation"""
+    await queue_client.delete_docs()
+    previous = await queue_client.start()
+    await queue_client.enqueue("entry", ["a"], 1)
+    item = await queue_client.claim("worker", 60)
+    await queue_client.complete("worker", item["url"])
+
+    # Generations can only be joined once activated
+    generation = await queue_client.start()
+    assert generation == previous + 1
+    assert await queue_client.join() is None
+    assert await queue_client.count_by_status() == {
+        "queued": 0,
+        "leased": 0,
+        "done": 0,
+        "failed": 0,
+    }
+    await queue_client.enqueue("entry", ["a"], 1)
+    assert await queue_client.activate() is True
+    assert await queue_client.join() == generation
+    assert (await queue_client.claim("worker", 60))["generation"] == generation
+    assert await queue_client.activate(False) is True
+    assert await queue_client.join() is None
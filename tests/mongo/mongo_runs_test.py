@@ -0,0 +1,44 @@
+"""Test the MongoRunsClient methods"""
+
+import pytest
+
+from src.mongo import RunsClient
+
+LISTING_URL = "https://localhost/test_url/listing"
+
+
+@pytest.mark.asyncio
+async def test_runs(runs_client: RunsClient) -> None:
+    """Test the life cycle of a crawl run"""
+    await runs_client.delete_docs()
+    assert await runs_client.find_unfinished_run() is None
+
+    # Start a run and checkpoint it twice
+    run = await runs_client.start_run(LISTING_URL)
+    assert await runs_client.save_checkpoint(
+        run["run_id"], f"{LISTING_URL}/2", ["a", "b"]
+    )
+    assert await runs_client.save_checkpoint(
+        run["run_id"], f"{LISTING_URL}/3", ["b", "c"]
+    )
+    unfinished = await runs_client.find_unfinished_run()
+    assert unfinished["run_id"] == run["run_id"]
+    assert unfinished["listing_url"] == f"{LISTING_URL}/3"
+    assert unfinished["completed"] == ["a", "b", "c"]
+
+    # Starting a new run abandons the unfinished one
+    new_run = await runs_client.start_run(LISTING_URL)
+    unfinished = await runs_client.find_unfinished_run()
+    assert unfinished["run_id"] == new_run["run_id"]
+    assert unfinished["completed"] == []
+
+    # Finished runs can't be resumed
+    assert await runs_client.finish_run(new_run["run_id"], {"saved": 2})
+    assert await runs_client.find_unfinished_run() is None
+    assert await runs_client.get_n_docs({"status": "abandoned"}) == 1
+
+    # Last finished run of each mode
+    assert await runs_client.find_last_finished_run("incremental") is None
+    last = await runs_client.find_last_finished_run("full")
+    assert last["run_id"] == new_run["run_id"]
+    assert last["stats"] == {"saved": 2}